@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
+import logging
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 # Use relative imports for models, services, and db dependency
@@ -10,8 +14,18 @@ from ..models.game_models import (
     MakeChoiceResponse, # New response model
     ErrorResponse
 )
+from ..core import json_codec
 from ..services import game_service 
-from ..db.database import get_db # Import DB dependency function
+from ..services.ai_scheduler import ai_scheduler, AIOverloadedError
+from ..db.database import get_db, SessionLocal, run_db # Import DB dependency function
+
+logger = logging.getLogger(__name__)
+
+OVERLOADED_MESSAGE = "Sunucu şu anda çok yoğun. Lütfen birkaç saniye sonra tekrar deneyin."
+
+def _overloaded_exception(error: AIOverloadedError) -> HTTPException:
+    """503 with a Retry-After hint; the client can resend the same request (same idempotency_key)."""
+    return HTTPException(status_code=503, detail=OVERLOADED_MESSAGE, headers={"Retry-After": error.retry_after_header})
 
 router = APIRouter()
 
@@ -24,32 +38,35 @@ async def start_game_route(payload: StartGamePayload, db: Session = Depends(get_
     Initializes player state in the DB and returns the starting scenario and session_id.
     """
     try:
-        initial_state_data = game_service.initialize_game(db=db, payload=payload)
+        initial_state_data = await game_service.initialize_game(db=db, payload=payload)
         if not initial_state_data or "error" in initial_state_data:
              raise HTTPException(status_code=400, detail=initial_state_data.get("error", "Game initialization failed"))
         
         # Ensure the response matches the StartGameResponse model
         return StartGameResponse(**initial_state_data)
         
-    except Exception as e:
-        print(f"Error in /start_game: {e}") # Log the error
+    except Exception:
+        logger.exception("Error in /start_game")
         raise HTTPException(status_code=500, detail="Internal server error during game start")
 
 
 @router.post("/make_choice", 
              response_model=MakeChoiceResponse, 
-             responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
+             responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
 async def make_choice_route(payload: MakeChoicePayload, db: Session = Depends(get_db)):
     """
     Processes a player's choice (button click or custom action) using session_id.
     Retrieves state from DB, calls AI, updates state in DB, and returns the next game state.
     """
     try:
+        # Shed load before any work is done when the AI queue is already full
+        ai_scheduler.check_capacity()
         next_state_data = await game_service.process_player_action(
             db=db, 
             session_id=payload.session_id, 
             choice_id=payload.choice_id, 
-            choice_text=payload.choice_text
+            choice_text=payload.choice_text,
+            idempotency_key=payload.idempotency_key
         )
         
         if not next_state_data or "error" in next_state_data:
@@ -61,6 +78,62 @@ async def make_choice_route(payload: MakeChoicePayload, db: Session = Depends(ge
 
     except HTTPException as e:
         raise e 
-    except Exception as e:
-        print(f"Error in /make_choice: {e}") # Log the error
+    except AIOverloadedError as e:
+        raise _overloaded_exception(e)
+    except Exception:
+        logger.exception("Error in /make_choice")
         raise HTTPException(status_code=500, detail="Internal server error processing choice")
+
+
+def _sse_default(value):
+    # Response models are dumped like response_model routes do (by alias, e.g. "class")
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", by_alias=True)
+    return jsonable_encoder(value)
+
+
+def _format_sse(event: str, data) -> str:
+    """Formats one Server-Sent Event frame."""
+    payload = json_codec.dumps(data, default=_sse_default)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+@router.post("/make_choice/stream",
+             responses={200: {"content": {"text/event-stream": {}}}, 503: {"model": ErrorResponse}})
+async def make_choice_stream_route(payload: MakeChoicePayload):
+    """
+    Streaming variant of /make_choice using Server-Sent Events.
+    Emits 'skill_check' (if a roll happened), then 'token' events with story text as it is
+    generated, and a final 'result' event carrying the same body as /make_choice.
+    """
+    try:
+        ai_scheduler.check_capacity()
+    except AIOverloadedError as e:
+        raise _overloaded_exception(e)
+
+    async def event_stream():
+        # The session is owned by the generator because it outlives the request handler.
+        db = SessionLocal()
+        try:
+            async for item in game_service.stream_player_action(
+                db=db,
+                session_id=payload.session_id,
+                choice_id=payload.choice_id,
+                choice_text=payload.choice_text,
+                idempotency_key=payload.idempotency_key
+            ):
+                yield _format_sse(item["event"], item["data"])
+        except AIOverloadedError as e:
+            # The response has already started, so the retry hint goes into the error event
+            yield _format_sse("error", {"error": OVERLOADED_MESSAGE, "retry_after": int(e.retry_after_header)})
+        except Exception:
+            logger.exception("Error in /make_choice/stream")
+            yield _format_sse("error", {"error": "Internal server error processing choice"})
+        finally:
+            await run_db(db.close)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
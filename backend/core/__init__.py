@@ -1,2 +1,2 @@
 # This file makes 'core' a sub-package of 'backend'.
-# (Currently unused, but good practice for structure)
+# Cross-cutting infrastructure shared by the api, services and db layers (metrics, ...).
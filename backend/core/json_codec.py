@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+JSON encoding for the hot paths: SQLAlchemy JSON columns (the engine's json_serializer /
+json_deserializer), turn event payloads, Server-Sent Event frames, streamed model chunks and
+plain-dict API responses.
+
+JSON_BACKEND=auto (default) uses orjson when it is installed and the standard library otherwise;
+orjson | stdlib force one. Both write compact UTF-8 JSON without escaping non-ASCII text and read
+each other's (and older, ASCII-escaped) output, so switching needs no data migration.
+
+Routes with a response_model are not affected: FastAPI already serializes those straight to
+bytes with Pydantic, which is faster than any dict -> JSON step.
+
+Round-trip tests: backend/tests/test_json_codec.py; turn benchmark: python -m backend.tools.bench_json
+"""
+import os
+import json
+from typing import Any, Callable, Optional
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError: # Optional: standard library json only
+    orjson = None
+
+JSON_BACKEND = os.getenv("JSON_BACKEND", "auto").lower()
+if JSON_BACKEND not in ("auto", "orjson", "stdlib"):
+    raise ValueError(f"Unknown JSON_BACKEND '{JSON_BACKEND}'. Available: auto, orjson, stdlib")
+if JSON_BACKEND == "orjson" and orjson is None:
+    raise RuntimeError("JSON_BACKEND=orjson requires the 'orjson' package (pip install orjson)")
+
+# The backend actually in use
+BACKEND = "orjson" if orjson is not None and JSON_BACKEND != "stdlib" else "stdlib"
+
+if BACKEND == "orjson":
+    # Dicts with int keys (stdlib turns them into strings too) and NumPy scalars from skill_odds
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _stdlib_dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=default)
+
+
+def dumps_bytes(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """UTF-8 encoded JSON; `default` converts objects the encoder does not know, like json.dumps."""
+    if BACKEND == "orjson":
+        try:
+            return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Values orjson rejects but json accepts (integers over 64 bits); real errors are raised below
+            pass
+    return _stdlib_dumps(obj, default).encode("utf-8")
+
+
+def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """Same as dumps_bytes, as text (what SQLAlchemy's json_serializer must return)."""
+    if BACKEND == "orjson":
+        return dumps_bytes(obj, default).decode("utf-8")
+    return _stdlib_dumps(obj, default)
+
+
+def loads(data: Any) -> Any:
+    """Parses JSON from str, bytes or bytearray."""
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the configured backend; for routes that return plain dicts."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Logging for the backend: levelled, JSON (or plain text) lines, written off the request path.
+
+Modules log through `logging.getLogger(__name__)`; everything under the 'backend' logger goes
+into a bounded in-memory queue (QueueHandler) and a background thread (QueueListener) does
+the actual stdout writes. Each record carries the request_id / session_id of the request
+that produced it. Debug records logged with extra={"sampled": True} are only kept for a
+LOG_DEBUG_SAMPLE_RATE share of calls, so noisy per-turn details do not flood the output.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from typing import Optional
+
+# --- Configuration ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower() # "json" or "text"
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.05"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000")) # Records beyond this are dropped, never waited for
+
+# Correlation ids of the request/session currently being handled
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+session_id_var: ContextVar[Optional[str]] = ContextVar("session_id", default=None)
+
+# Attributes every LogRecord has; anything else on a record came from `extra=` and is emitted as a field
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "request_id", "session_id", "sampled",
+}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_dropped_records = 0
+
+
+def bind_session(session_id: Optional[str]) -> None:
+    """Tags all further log records of the current request (and tasks it starts) with session_id."""
+    session_id_var.set(session_id)
+
+
+def get_dropped_records() -> int:
+    return _dropped_records
+
+
+class _ContextFilter(logging.Filter):
+    """Adds the correlation ids. Runs in the logging caller's context, before the record is queued."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.session_id = session_id_var.get()
+        return True
+
+
+class _SamplingFilter(logging.Filter):
+    """Keeps only a sample of records logged with extra={"sampled": True}."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not getattr(record, "sampled", False) or random.random() < LOG_DEBUG_SAMPLE_RATE
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking the request."""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        global _dropped_records
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped_records += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge args and render the traceback here; the listener thread does the formatting
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, request_id, session_id and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        if getattr(record, "session_id", None):
+            entry["session_id"] = record.session_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        ids = " ".join(f"{name}={getattr(record, name)}" for name in ("request_id", "session_id") if getattr(record, name, None))
+        return f"{line} [{ids}]" if ids else line
+
+
+def configure_logging() -> None:
+    """Installs the queue-based handler on the 'backend' logger (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "text":
+        stream_handler.setFormatter(_TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        stream_handler.setFormatter(JsonFormatter())
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = _NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(_SamplingFilter())
+    queue_handler.addFilter(_ContextFilter())
+
+    backend_logger = logging.getLogger("backend")
+    backend_logger.setLevel(LOG_LEVEL)
+    backend_logger.handlers = [queue_handler]
+    backend_logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Writes out queued records and stops the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware: assigns each HTTP request a request_id (the client's X-Request-ID if it sent
+    a reasonable one) for log correlation and echoes it back in the X-Request-ID response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id" and 0 < len(value) <= 64:
+                request_id = value.decode("latin-1")
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        request_token = request_id_var.set(request_id)
+        session_token = session_id_var.set(None)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            session_id_var.reset(session_token)
+            request_id_var.reset(request_token)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Lightweight request timing and Prometheus metrics (no external dependency).
+
+- span("name") times a phase of the current request. Durations are added to the request's
+  Server-Timing header and to the rpg_phase_seconds histogram.
+- Counters and histograms below are rendered in the Prometheus text format at GET /metrics.
+
+Metrics are only updated from the event loop thread, so no locking is needed. Each
+observation is a couple of perf_counter calls and a bisect over the bucket bounds.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional, Dict, List, Tuple, Iterator
+
+# Default latency buckets (seconds): sub-millisecond DB calls up to slow model answers
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        REGISTRY.append(self)
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}"
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0.0
+        REGISTRY.append(self)
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {_format_value(self.value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], List] = {}
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[float, int]]:
+        """label values -> (sum, count) of the observations so far."""
+        return {label_values: (series[1], series[2]) for label_values, series in self._series.items()}
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for label_values, (bucket_counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names + ("le",), label_values + (bound,))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.label_names, label_values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape_label(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+REGISTRY: List = []
+
+# --- Metric definitions ---
+HTTP_REQUEST_SECONDS = Histogram("rpg_http_request_seconds", "HTTP request duration", ("method", "route", "status"))
+PHASE_SECONDS = Histogram("rpg_phase_seconds", "Duration of request phases (db, ai, parse, ...)", ("phase",))
+DB_SECONDS = Histogram("rpg_db_seconds", "DB calls via run_db, including executor queue wait")
+AI_MODEL_SECONDS = Histogram("rpg_ai_model_seconds", "Latency of single model requests", ("model", "outcome"))
+AI_FALLBACK_DEPTH = Histogram("rpg_ai_fallback_depth", "Models that failed before one answered (MODEL_PREFERENCE index of the winner)",
+                              buckets=(0, 1, 2, 3, 4, 5, 6))
+AI_FAILURES = Counter("rpg_ai_failures_total", "Turns for which no model produced a usable answer")
+AI_PARSE_FAILURES = Counter("rpg_ai_parse_failures_total", "Model answers that parsed without any choices", ("model",))
+AI_CACHE_HITS = Counter("rpg_ai_cache_hits_total", "AI responses served from the response cache")
+AI_QUEUE_DEPTH = Gauge("rpg_ai_queue_depth", "Model calls waiting for a scheduler slot or rate-limit token")
+AI_QUEUE_WAIT_SECONDS = Histogram("rpg_ai_queue_wait_seconds", "Time model calls waited in the scheduler queue")
+AI_SHED = Counter("rpg_ai_shed_total", "Requests rejected with 503 because the AI queue was full or too slow")
+AI_RATE_LIMITED = Counter("rpg_ai_rate_limited_total", "Model calls skipped because of the model's rate limit or Retry-After cooldown", ("model",))
+SKILL_CHECK_SUCCESS_CHANCE = Histogram("rpg_skill_check_success_chance", "Success chance of skill-check choices offered to players (DC balance)",
+                                       buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95))
+SESSIONS_EXPIRED = Counter("rpg_sessions_expired_total", "Idle sessions archived and deleted by the lifecycle task")
+DUPLICATE_TURNS = Counter("rpg_duplicate_turns_total", "make_choice requests answered from an in-flight or completed duplicate", ("kind",))
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Request-scoped timing ---
+
+class RequestTimings:
+    """Accumulated phase durations (seconds) of one request, in first-seen order."""
+    __slots__ = ("phases",)
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing_header(self, total: Optional[float] = None) -> str:
+        entries = [f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in self.phases.items()]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_request_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def record_phase(phase: str, seconds: float) -> None:
+    """Adds a measured duration to the phase histogram and to the current request's timings."""
+    PHASE_SECONDS.observe(seconds, phase)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+class span:
+    """
+    Times the enclosed block as `phase` of the current request: `with metrics.span("ai"): ...`
+    Works around sync and async code alike. A plain class rather than @contextmanager to keep
+    the per-span overhead to about a microsecond.
+    """
+    __slots__ = ("phase", "started")
+
+    def __init__(self, phase: str):
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_phase(self.phase, time.perf_counter() - self.started)
+        return False
+
+
+def _route_label(scope) -> str:
+    """Path template of the matched route (bounded label cardinality), e.g. '/api/v1/make_choice'."""
+    route = scope.get("route")
+    if route is None or not hasattr(route, "path"):
+        return "unmatched"
+    # route.path of an included router's route lacks the router prefix; for routes without
+    # path parameters the request path is the full template
+    return route.path if "{" in route.path else scope["path"]
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware: opens a RequestTimings scope per HTTP request, adds the Server-Timing
+    header when the response starts and records rpg_http_request_seconds.
+    For streaming responses the header only covers the phases finished before the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status = "500"
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                header = timings.server_timing_header(time.perf_counter() - started).encode("latin-1")
+                # Timing-Allow-Origin lets the (cross-origin) frontend read the breakdown in devtools/JS
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header), (b"timing-allow-origin", b"*"),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], _route_label(scope), status)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Serves the frontend from the API's own origin (no CORS preflight per turn).
+
+- Files are looked up in the build directory first (see backend/tools/build_frontend.py: content-hashed
+  script/style names, index.html pointing at them, .br/.gz variants, resized AVIF/WebP/JPEG images),
+  then in the source directory (original images, or everything when no build exists).
+- Precompressed variants are chosen from Accept-Encoding (br > gzip); responses carry Vary: Accept-Encoding.
+- Strong ETags come from the file content (a suffix per encoding); If-None-Match answers 304.
+- Content-hashed names are cached for a year as immutable; everything else is revalidated (no-cache).
+- Range requests are handled by Starlette's FileResponse.
+"""
+import os
+import re
+import stat
+import asyncio
+import hashlib
+import mimetypes
+from typing import Optional, Dict, Tuple, List
+
+from starlette.responses import FileResponse, PlainTextResponse, Response
+
+# file.<8+ hex chars>.ext, as written by the build step
+_HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+# Precompressed variant suffixes in order of preference
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _accepted_encodings(header: str) -> List[str]:
+    """Encodings from an Accept-Encoding header with a non-zero q-value."""
+    accepted = []
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            accepted.append(name.strip().lower())
+    return accepted
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison: W/"x" matches "x"
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return any((candidate[2:] if candidate.startswith("W/") else candidate) == etag for candidate in candidates)
+
+
+class FrontendFiles:
+    """ASGI app for the frontend files; mount it last so the API routes take precedence."""
+
+    def __init__(self, directories: List[str], index: str = "index.html"):
+        self.directories = [os.path.realpath(directory) for directory in directories if os.path.isdir(directory)]
+        self.index = index
+        # path -> (mtime_ns, size, content hash); a file is hashed again only when it changes
+        self._hashes: Dict[str, Tuple[int, int, str]] = {}
+
+    async def __call__(self, scope, receive, send):
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+            await response(scope, receive, send)
+            return
+        response = await self._respond(scope)
+        await response(scope, receive, send)
+
+    async def _respond(self, scope) -> Response:
+        relative_path = scope["path"][len(scope.get("root_path", "")):] if scope.get("root_path") else scope["path"]
+        relative_path = relative_path.lstrip("/") or self.index
+        found = self._find(relative_path)
+        if found is None:
+            return PlainTextResponse("Not Found", status_code=404)
+        path, stat_result = found
+
+        headers = {"Vary": "Accept-Encoding"}
+        headers["Cache-Control"] = (
+            IMMUTABLE_CACHE_CONTROL if _HASHED_NAME.search(relative_path) else REVALIDATE_CACHE_CONTROL
+        )
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+        request_headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        etag_suffix = ""
+        accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding, suffix in _ENCODINGS:
+            if encoding not in accepted:
+                continue
+            variant = self._stat(path + suffix)
+            if variant is not None:
+                path, stat_result, etag_suffix = path + suffix, variant, f"-{encoding}"
+                headers["Content-Encoding"] = encoding
+                break
+
+        etag = f'"{await self._content_hash(path, stat_result)}{etag_suffix}"'
+        headers["ETag"] = etag
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(path, stat_result=stat_result, headers=headers, media_type=media_type)
+
+    def _find(self, relative_path: str) -> Optional[Tuple[str, os.stat_result]]:
+        for directory in self.directories:
+            path = os.path.realpath(os.path.join(directory, relative_path))
+            # Reject anything that resolves outside the served directory (../, symlinks)
+            if os.path.commonpath([directory, path]) != directory:
+                return None
+            stat_result = self._stat(path)
+            if stat_result is not None:
+                return path, stat_result
+        return None
+
+    @staticmethod
+    def _stat(path: str) -> Optional[os.stat_result]:
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        return stat_result if stat.S_ISREG(stat_result.st_mode) else None
+
+    async def _content_hash(self, path: str, stat_result: os.stat_result) -> str:
+        cached = self._hashes.get(path)
+        if cached is not None and cached[:2] == (stat_result.st_mtime_ns, stat_result.st_size):
+            return cached[2]
+        # Images are a few MB; hash them off the event loop
+        digest = await asyncio.get_running_loop().run_in_executor(None, file_digest, path)
+        self._hashes[path] = (stat_result.st_mtime_ns, stat_result.st_size, digest)
+        return digest
+
+
+def file_digest(path: str, length: int = 16) -> str:
+    """Hex SHA-256 prefix of a file's content (ETags, content-hashed build names)."""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()[:length]
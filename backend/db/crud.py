@@ -1,10 +1,20 @@
 # -*- coding: utf-8 -*-
+import logging
+import datetime
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 import uuid # To generate session IDs
 
 # Use relative imports for models
 from . import models # Import the models module from the same directory
+from .database import run_db
+
+logger = logging.getLogger(__name__)
+
+# Attempts of append_turn_event when another process took the same seq first
+TURN_EVENT_INSERT_ATTEMPTS = 5
 
 def get_player_state(db: Session, session_id: str) -> Optional[models.PlayerState]:
     """Retrieve a player state from the database by session_id."""
@@ -27,13 +37,15 @@ def create_player_state(db: Session, initial_data: Dict[str, Any]) -> models.Pla
         stats=initial_data.get("stats", {}),
         inventory=initial_data.get("inventory", []),
         skills=initial_data.get("skills", []),
-        history=initial_data.get("history", [])
+        history=[] # History is stored in turn_events
         # created_at and last_updated are handled by the database defaults/triggers
     )
     db.add(db_player_state)
+    for seq, event in enumerate(initial_data.get("history", []), start=1):
+        db.add(_make_turn_event(session_id, seq, event))
     db.commit()
     db.refresh(db_player_state)
-    print(f"Created new player state with session_id: {session_id}") # Debug log
+    logger.info("Created new player state with session_id: %s", session_id)
     return db_player_state
 
 def update_player_state(db: Session, session_id: str, update_data: Dict[str, Any]) -> Optional[models.PlayerState]:
@@ -43,13 +55,13 @@ def update_player_state(db: Session, session_id: str, update_data: Dict[str, Any
     """
     db_player_state = get_player_state(db, session_id)
     if db_player_state:
-        print(f"Updating player state for session_id: {session_id}") # Debug log
+        logger.debug("Updating player state for session_id: %s", session_id, extra={"sampled": True})
         for key, value in update_data.items():
             # Only update attributes that exist in the model and are provided
             if hasattr(db_player_state, key):
                 setattr(db_player_state, key, value)
             else:
-                 print(f"Warning: Attribute '{key}' not found in PlayerState model during update.")
+                 logger.warning("Attribute '%s' not found in PlayerState model during update.", key)
                  
         # Special handling for JSON fields if needed (e.g., merging instead of replacing)
         # For now, we assume update_data provides the complete new value for JSON fields like history
@@ -57,16 +69,232 @@ def update_player_state(db: Session, session_id: str, update_data: Dict[str, Any
         db.commit()
         db.refresh(db_player_state)
         return db_player_state
-    print(f"Update failed: Player state not found for session_id: {session_id}") # Debug log
+    logger.warning("Update failed: Player state not found for session_id: %s", session_id)
     return None
 
 def delete_player_state(db: Session, session_id: str) -> bool:
-    """Delete a player state from the database."""
+    """Delete a player state (and its turn events) from the database."""
     db_player_state = get_player_state(db, session_id)
     if db_player_state:
+        db.query(models.TurnEvent).filter(models.TurnEvent.session_id == session_id).delete(synchronize_session=False)
+        db.query(models.SessionSummary).filter(models.SessionSummary.session_id == session_id).delete(synchronize_session=False)
         db.delete(db_player_state)
         db.commit()
-        print(f"Deleted player state for session_id: {session_id}") # Debug log
+        logger.info("Deleted player state for session_id: %s", session_id)
         return True
-    print(f"Delete failed: Player state not found for session_id: {session_id}") # Debug log
+    logger.warning("Delete failed: Player state not found for session_id: %s", session_id)
     return False
+
+# --- Turn Events (append-only history) ---
+
+def _make_turn_event(session_id: str, seq: int, event: Dict[str, Any]) -> models.TurnEvent:
+    payload = {k: v for k, v in event.items() if k != "event_type"}
+    return models.TurnEvent(session_id=session_id, seq=seq, event_type=event.get("event_type", "unknown"), payload=payload)
+
+def append_turn_event(db: Session, session_id: str, event: Dict[str, Any]) -> int:
+    """
+    Appends one event to a session's history and returns the seq it was stored under.
+    Inserts a single row (plus a last_updated touch) regardless of how long the session is.
+    The seq is read in the inserting transaction; if another process inserted the same seq
+    first (primary key conflict), it is read again and the insert retried, so no event is lost.
+    """
+    for attempt in range(1, TURN_EVENT_INSERT_ATTEMPTS + 1):
+        try:
+            seq = get_last_turn_seq(db, session_id) + 1
+            db.add(_make_turn_event(session_id, seq, event))
+            db.query(models.PlayerState).filter(models.PlayerState.session_id == session_id).update(
+                {models.PlayerState.last_updated: func.now()}, synchronize_session=False
+            )
+            db.commit()
+            return seq
+        except IntegrityError:
+            db.rollback()
+            if attempt == TURN_EVENT_INSERT_ATTEMPTS:
+                raise
+            logger.warning("Turn event seq %d of session %s was taken by another writer, retrying", seq, session_id)
+        except Exception:
+            db.rollback()
+            raise
+
+def get_last_turn_event(db: Session, session_id: str) -> Optional[Dict[str, Any]]:
+    """Returns the most recent history event of a session (primary key index lookup)."""
+    db_event = (
+        db.query(models.TurnEvent)
+        .filter(models.TurnEvent.session_id == session_id)
+        .order_by(models.TurnEvent.seq.desc())
+        .first()
+    )
+    return db_event.to_event() if db_event else None
+
+def get_turn_events(db: Session, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Returns a session's history events in order; with limit, only the last `limit` events."""
+    query = db.query(models.TurnEvent).filter(models.TurnEvent.session_id == session_id)
+    if limit is not None:
+        rows = query.order_by(models.TurnEvent.seq.desc()).limit(limit).all()
+        rows.reverse()
+    else:
+        rows = query.order_by(models.TurnEvent.seq).all()
+    return [row.to_event() for row in rows]
+
+def get_turn_events_with_seq(db: Session, session_id: str, after_seq: int = 0, upto_seq: Optional[int] = None,
+                             limit: Optional[int] = None) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Returns [(seq, event), ...] in order for after_seq < seq <= upto_seq.
+    With limit, only the newest `limit` events of that range.
+    """
+    query = db.query(models.TurnEvent).filter(models.TurnEvent.session_id == session_id, models.TurnEvent.seq > after_seq)
+    if upto_seq is not None:
+        query = query.filter(models.TurnEvent.seq <= upto_seq)
+    if limit is not None:
+        rows = query.order_by(models.TurnEvent.seq.desc()).limit(limit).all()
+        rows.reverse()
+    else:
+        rows = query.order_by(models.TurnEvent.seq).all()
+    return [(row.seq, row.to_event()) for row in rows]
+
+def get_last_turn_seq(db: Session, session_id: str) -> int:
+    """Returns the seq of the latest event of a session (0 if it has none)."""
+    return db.query(func.max(models.TurnEvent.seq)).filter(models.TurnEvent.session_id == session_id).scalar() or 0
+
+def append_turn_events(db: Session, events: List[Tuple[str, int, Dict[str, Any]]]) -> int:
+    """
+    Bulk-inserts already sequenced events [(session_id, seq, event), ...] in one transaction
+    and touches last_updated of the affected sessions. Used by the session cache flusher.
+    Returns the number of inserted events.
+    """
+    if not events:
+        return 0
+    try:
+        db.add_all([_make_turn_event(session_id, seq, event) for session_id, seq, event in events])
+        session_ids = {session_id for session_id, _, _ in events}
+        db.query(models.PlayerState).filter(models.PlayerState.session_id.in_(session_ids)).update(
+            {models.PlayerState.last_updated: func.now()}, synchronize_session=False
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(events)
+
+# --- Session Summaries ---
+
+def get_session_summary(db: Session, session_id: str) -> Optional[models.SessionSummary]:
+    return db.query(models.SessionSummary).filter(models.SessionSummary.session_id == session_id).first()
+
+def upsert_session_summary(db: Session, session_id: str, summary: str, covered_seq: int) -> None:
+    """Creates or replaces the rolling summary of a session."""
+    try:
+        db_summary = get_session_summary(db, session_id)
+        if db_summary is None:
+            db.add(models.SessionSummary(session_id=session_id, summary=summary, covered_seq=covered_seq))
+        else:
+            db_summary.summary = summary
+            db_summary.covered_seq = covered_seq
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def migrate_history_to_turn_events(db: Session, batch_size: int = 200) -> int:
+    """
+    One-off migration for databases created before turn_events existed:
+    moves each non-empty PlayerState.history list into turn_events rows and clears the column.
+    Safe to run on every startup; already migrated rows have an empty history.
+    Returns the number of sessions migrated.
+    """
+    migrated = 0
+    while True:
+        legacy_states = (
+            db.query(models.PlayerState)
+            .filter(models.PlayerState.history.isnot(None), func.json_array_length(models.PlayerState.history) > 0)
+            .limit(batch_size)
+            .all()
+        )
+        if not legacy_states:
+            break
+        for db_player_state in legacy_states:
+            existing = db.query(func.count(models.TurnEvent.seq)).filter(models.TurnEvent.session_id == db_player_state.session_id).scalar()
+            if not existing:
+                legacy_events = [event for event in db_player_state.history if isinstance(event, dict)]
+                for seq, event in enumerate(legacy_events, start=1):
+                    db.add(_make_turn_event(db_player_state.session_id, seq, event))
+            db_player_state.history = []
+            migrated += 1
+        db.commit()
+    if migrated:
+        logger.info("Migrated history of %d sessions to turn_events.", migrated)
+    return migrated
+
+# --- Session expiry (services/session_lifecycle.py) ---
+# These do not commit: the caller archives the rows and commits the deletion in one transaction.
+
+def get_expired_session_ids(db: Session, idle_before: datetime.datetime, limit: int) -> List[str]:
+    """Sessions whose last activity (last_updated, or created_at if never updated) is older than idle_before."""
+    last_activity = func.coalesce(models.PlayerState.last_updated, models.PlayerState.created_at)
+    rows = (
+        db.query(models.PlayerState.session_id)
+        .filter(last_activity < idle_before)
+        .order_by(last_activity)
+        .limit(limit)
+        .all()
+    )
+    return [session_id for (session_id,) in rows]
+
+def export_sessions(db: Session, session_ids: List[str]) -> List[Dict[str, Any]]:
+    """Everything stored for the given sessions, as JSON-serializable dicts (one per session)."""
+    states = db.query(models.PlayerState).filter(models.PlayerState.session_id.in_(session_ids)).all()
+    events: Dict[str, List[Dict[str, Any]]] = {}
+    for row in (
+        db.query(models.TurnEvent)
+        .filter(models.TurnEvent.session_id.in_(session_ids))
+        .order_by(models.TurnEvent.session_id, models.TurnEvent.seq)
+    ):
+        events.setdefault(row.session_id, []).append({"seq": row.seq, **row.to_event(), "created_at": _isoformat(row.created_at)})
+    summaries = {
+        row.session_id: {"summary": row.summary, "covered_seq": row.covered_seq}
+        for row in db.query(models.SessionSummary).filter(models.SessionSummary.session_id.in_(session_ids))
+    }
+    return [
+        {
+            "player_state": {
+                column.name: _isoformat(getattr(state, column.key)) for column in models.PlayerState.__table__.columns
+            },
+            "turn_events": events.get(state.session_id, []),
+            "summary": summaries.get(state.session_id),
+        }
+        for state in states
+    ]
+
+def delete_sessions(db: Session, session_ids: List[str]) -> Tuple[int, int]:
+    """Deletes sessions with their events and summaries. Returns (sessions, events) deleted."""
+    deleted_events = db.query(models.TurnEvent).filter(models.TurnEvent.session_id.in_(session_ids)).delete(synchronize_session=False)
+    db.query(models.SessionSummary).filter(models.SessionSummary.session_id.in_(session_ids)).delete(synchronize_session=False)
+    deleted_sessions = db.query(models.PlayerState).filter(models.PlayerState.session_id.in_(session_ids)).delete(synchronize_session=False)
+    return deleted_sessions, deleted_events
+
+def _isoformat(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime.datetime) else value
+
+# --- Async wrappers ---
+# Same operations, executed on the bounded DB executor so callers on the event loop never block.
+
+async def get_player_state_async(db: Session, session_id: str) -> Optional[models.PlayerState]:
+    return await run_db(get_player_state, db, session_id)
+
+async def create_player_state_async(db: Session, initial_data: Dict[str, Any]) -> models.PlayerState:
+    return await run_db(create_player_state, db, initial_data)
+
+async def update_player_state_async(db: Session, session_id: str, update_data: Dict[str, Any]) -> Optional[models.PlayerState]:
+    return await run_db(update_player_state, db, session_id, update_data)
+
+async def delete_player_state_async(db: Session, session_id: str) -> bool:
+    return await run_db(delete_player_state, db, session_id)
+
+async def append_turn_event_async(db: Session, session_id: str, event: Dict[str, Any]) -> int:
+    return await run_db(append_turn_event, db, session_id, event)
+
+async def get_last_turn_event_async(db: Session, session_id: str) -> Optional[Dict[str, Any]]:
+    return await run_db(get_last_turn_event, db, session_id)
+
+async def get_turn_events_async(db: Session, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    return await run_db(get_turn_events, db, session_id, limit)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Storage encoding of turn_events payloads.
+
+A row used to hold the event as plain JSON: verbose keys, non-ASCII escaped, and the narration
+twice (ai_raw_text and new_situation_text, which parse_narration builds from lines of the raw
+text). It is now stored as a small versioned binary record:
+
+    byte 0   FORMAT_VERSION
+    byte 1   flags (FLAG_SHORT_KEYS, FLAG_ZLIB, FLAG_ZSTD)
+    rest     compact UTF-8 JSON of the event, compressed when EVENT_COMPRESS_MIN_BYTES or larger
+
+With short keys, known fields use the one-letter codes in FIELD_CODES, choices become
+[id, text(, stat, dc)] lists and new_situation_text is replaced by the offsets of its pieces
+in ai_raw_text whenever that reproduces it exactly. Rows written before this (JSON text) still
+decode, so callers always get the original event dict back.
+
+Usage for a size comparison on the parser corpus: python -m backend.tools.bench_events
+"""
+import os
+import re
+import zlib
+from typing import Dict, Any, List, Optional
+
+from ..core import json_codec
+
+try:
+    import zstandard
+except ImportError: # Optional: zlib only
+    zstandard = None
+
+FORMAT_VERSION = 1
+FLAG_SHORT_KEYS = 0x01
+FLAG_ZLIB = 0x02
+FLAG_ZSTD = 0x04
+
+# zlib | zstd (needs the zstandard package) | none
+EVENT_COMPRESSION = os.getenv("EVENT_COMPRESSION", "zlib").lower()
+EVENT_COMPRESS_MIN_BYTES = int(os.getenv("EVENT_COMPRESS_MIN_BYTES", "128"))
+EVENT_COMPRESS_LEVEL = int(os.getenv("EVENT_COMPRESS_LEVEL", "6"))
+
+# Part of FORMAT_VERSION 1: codes may be added, never changed or reused
+FIELD_CODES = {
+    "choice_made": "c",
+    "skill_check_outcome_given_to_ai": "o",
+    "ai_raw_text": "r",
+    "new_situation_text": "n",
+    "ai_choices": "h",
+    "stat_checked": "s",
+    "dc": "d",
+    "roll": "l",
+    "modifier": "m",
+    "total_roll": "t",
+    "outcome": "u",
+    "original_situation_text": "p",
+    "world_id": "w",
+    "class": "k",
+    "text": "x",
+}
+_FIELD_NAMES = {code: name for name, code in FIELD_CODES.items()}
+# new_situation_text as flat [start, end, start, end, ...] offsets into ai_raw_text, joined with spaces
+_SPANS_CODE = "N"
+_RESERVED_CODES = set(_FIELD_NAMES) | {_SPANS_CODE}
+# Fields may be appended (older rows have fewer list items), never reordered
+_CHOICE_FIELDS = ("id", "text", "skill_check_stat", "skill_check_dc", "skill_check_mode")
+_PACKED_CHOICE_KEYS = [list(_CHOICE_FIELDS[:count]) for count in (2, 4, 5)]
+
+# Story lines as parse_narration takes them: leading spaces/tabs skipped, trailing whitespace stripped
+_STORY_LINE_RE = re.compile(r"[ \t]*(?P<line>[^\n]*)")
+
+if EVENT_COMPRESSION == "zstd" and zstandard is None:
+    raise RuntimeError("EVENT_COMPRESSION=zstd requires the 'zstandard' package (pip install zstandard)")
+if EVENT_COMPRESSION not in ("zlib", "zstd", "none"):
+    raise ValueError(f"Unknown EVENT_COMPRESSION '{EVENT_COMPRESSION}'. Available: zlib, zstd, none")
+
+
+def encode_payload(payload: Dict[str, Any]) -> bytes:
+    """Encodes the event fields (everything but event_type) into the stored record."""
+    flags = 0
+    # A field literally named like a code could not be told apart; such rows keep their own keys
+    if not _RESERVED_CODES.intersection(payload):
+        payload = _shorten(payload)
+        flags |= FLAG_SHORT_KEYS
+    body = json_codec.dumps_bytes(payload, default=str)
+    if EVENT_COMPRESSION != "none" and len(body) >= EVENT_COMPRESS_MIN_BYTES:
+        if EVENT_COMPRESSION == "zstd":
+            compressed, compressed_flag = zstandard.ZstdCompressor(level=EVENT_COMPRESS_LEVEL).compress(body), FLAG_ZSTD
+        else:
+            compressed, compressed_flag = zlib.compress(body, EVENT_COMPRESS_LEVEL), FLAG_ZLIB
+        if len(compressed) < len(body):
+            body = compressed
+            flags |= compressed_flag
+    return bytes((FORMAT_VERSION, flags)) + body
+
+
+def decode_payload(value: Any) -> Dict[str, Any]:
+    """Decodes a stored record; also accepts legacy JSON rows (text, or a dict from drivers that parse JSON)."""
+    if value is None:
+        return {}
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str):
+        return json_codec.loads(value)
+    value = bytes(value)
+    if value[:1] in (b"{", b"["): # Legacy JSON returned as bytes
+        return json_codec.loads(value)
+    version, flags, body = value[0], value[1], value[2:]
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported turn event format version {version}")
+    if flags & FLAG_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Turn event is zstd-compressed but the 'zstandard' package is not installed")
+        body = zstandard.ZstdDecompressor().decompress(body)
+    elif flags & FLAG_ZLIB:
+        body = zlib.decompress(body)
+    payload = json_codec.loads(body)
+    return _expand(payload) if flags & FLAG_SHORT_KEYS else payload
+
+
+def _shorten(payload: Dict[str, Any]) -> Dict[str, Any]:
+    short: Dict[str, Any] = {}
+    for key, value in payload.items():
+        if key == "ai_choices" and isinstance(value, list):
+            value = [_pack_choice(choice) for choice in value]
+        short[FIELD_CODES.get(key, key)] = value
+    raw, situation = payload.get("ai_raw_text"), payload.get("new_situation_text")
+    if isinstance(raw, str) and isinstance(situation, str) and situation:
+        spans = text_spans(raw, situation)
+        if spans is not None:
+            del short[FIELD_CODES["new_situation_text"]]
+            short[_SPANS_CODE] = spans
+    return short
+
+
+def _expand(short: Dict[str, Any]) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {}
+    for code, value in short.items():
+        if code == _SPANS_CODE:
+            payload["new_situation_text"] = join_spans(short[FIELD_CODES["ai_raw_text"]], value)
+            continue
+        key = _FIELD_NAMES.get(code, code)
+        if key == "ai_choices" and isinstance(value, list):
+            value = [_unpack_choice(choice) for choice in value]
+        payload[key] = value
+    return payload
+
+
+def _pack_choice(choice: Any) -> Any:
+    """{"id", "text"(, "skill_check_stat", "skill_check_dc"(, "skill_check_mode"))} -> list; anything else is kept as is."""
+    if not isinstance(choice, dict) or list(choice) not in _PACKED_CHOICE_KEYS:
+        return choice
+    return list(choice.values())
+
+
+def _unpack_choice(choice: Any) -> Any:
+    return dict(zip(_CHOICE_FIELDS, choice)) if isinstance(choice, list) else choice
+
+
+def text_spans(raw: str, text: str) -> Optional[List[int]]:
+    """
+    Offsets of `text` in `raw` as [start, end, ...] such that join_spans(raw, spans) == text,
+    or None if text is not made of raw's pieces (it is then stored as is).
+    """
+    start = raw.find(text)
+    if start >= 0:
+        return [start, start + len(text)]
+    # parse_narration output: story lines joined with single spaces
+    spans: List[int] = []
+    position = 0
+    for match in _STORY_LINE_RE.finditer(raw):
+        line = match.group("line").rstrip()
+        if not line:
+            continue
+        if text.startswith(line, position) and (position + len(line) == len(text) or text[position + len(line)] == " "):
+            spans += [match.start("line"), match.start("line") + len(line)]
+            position += len(line) + 1
+            if position >= len(text):
+                break
+    if not spans or join_spans(raw, spans) != text:
+        return None
+    return spans
+
+
+def join_spans(raw: str, spans: List[int]) -> str:
+    return " ".join(raw[spans[i]:spans[i + 1]] for i in range(0, len(spans), 2))
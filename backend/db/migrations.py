@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Versioned schema setup: an ordered list of steps, the applied version kept in SQLite's
+PRAGMA user_version so a started-up database skips all of them with one query.
+
+Runs once per deployment before the workers start (start.py --prod), from the app's startup
+when DB_INIT_ON_STARTUP is on, or by hand:
+    python -m backend.db.migrations
+Never at import time: importing the app must not touch the database.
+
+Steps must be safe to re-run (two dev processes may start at once). A new table is a new
+step calling _create_tables again; create_all only adds what is missing.
+"""
+import logging
+from typing import Callable, List, Tuple
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from . import crud, database, models
+
+logger = logging.getLogger(__name__)
+
+
+def _create_tables(engine: Engine) -> None:
+    models.Base.metadata.create_all(bind=engine)
+
+
+def _migrate_legacy_history(engine: Engine) -> None:
+    """Moves history JSON of sessions created before turn_events existed into that table."""
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        crud.migrate_history_to_turn_events(db)
+    finally:
+        db.close()
+
+
+# (version, description, step); versions are consecutive and never reused
+MIGRATIONS: List[Tuple[int, str, Callable[[Engine], None]]] = [
+    (1, "create tables", _create_tables),
+    (2, "legacy history -> turn_events", _migrate_legacy_history),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(engine: Engine) -> int:
+    """Applied migration version; 0 for a new database (or one created before versioning)."""
+    if engine.dialect.name != "sqlite":
+        return 0 # Not tracked: every step runs, which is safe since they are idempotent
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar() or 0
+
+
+def _set_schema_version(engine: Engine, version: int) -> None:
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+
+def migrate(engine: Engine = None) -> int:
+    """Applies the pending steps in order; returns the resulting schema version."""
+    engine = engine or database.engine
+    version = get_schema_version(engine)
+    for step_version, description, step in MIGRATIONS:
+        if step_version <= version:
+            continue
+        logger.info("Veritabanı şeması %d sürümüne yükseltiliyor: %s", step_version, description)
+        step(engine)
+        _set_schema_version(engine, step_version)
+        version = step_version
+    return version
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print(f"Şema sürümü: {migrate()}")
@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
-from sqlalchemy import Column, Integer, String, JSON, DateTime, func
+from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, ForeignKey, LargeBinary, func
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 import datetime
 
 # Import Base from the database setup file
 # Use relative import
 from .database import Base
+from .event_codec import encode_payload, decode_payload
 
 class PlayerState(Base):
     """Database model representing the state of a player's game session."""
@@ -31,7 +33,10 @@ class PlayerState(Base):
     stats = Column(JSON, default={}) # e.g., {"STR": 5, "AGI": 6}
     inventory = Column(JSON, default=[]) # e.g., ["sword", "potion"]
     skills = Column(JSON, default=[]) # e.g., ["Attack", "Heal"]
-    history = Column(JSON, default=[]) # List of event dictionaries
+    # Legacy: history used to be rewritten here as one JSON list every turn.
+    # Events now live in the append-only turn_events table; rows from older
+    # databases are moved over by crud.migrate_history_to_turn_events on startup.
+    history = Column(JSON, default=[])
 
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -39,3 +44,60 @@ class PlayerState(Base):
 
     def __repr__(self):
         return f"<PlayerState(session_id='{self.session_id}', name='{self.player_name}', world='{self.world_id}', class='{self.class_name}')>"
+
+
+class EventPayload(TypeDecorator):
+    """
+    Event fields stored with event_codec's compact binary encoding; reads give back the plain dict.
+    SQLite keeps whatever a row was written with, so JSON rows of older databases still load.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else encode_payload(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else decode_payload(value)
+
+
+class TurnEvent(Base):
+    """
+    One entry of a session's history (game_start, skill_check_attempt, ai_response ...).
+    Append-only: a turn inserts new rows and never rewrites older ones.
+    The (session_id, seq) primary key doubles as the index for "last event" lookups.
+    """
+
+    __tablename__ = "turn_events"
+
+    session_id = Column(String, ForeignKey("player_states.session_id", ondelete="CASCADE"), primary_key=True)
+    seq = Column(Integer, primary_key=True) # 1-based position in the session history
+    event_type = Column(String, nullable=False)
+    payload = Column(EventPayload, nullable=False) # Remaining event fields (see event_codec.py)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def to_event(self) -> dict:
+        """Returns the event in the dict shape used by game_service."""
+        event = {"event_type": self.event_type}
+        event.update(self.payload or {})
+        return event
+
+    def __repr__(self):
+        return f"<TurnEvent(session_id='{self.session_id}', seq={self.seq}, type='{self.event_type}')>"
+
+
+class SessionSummary(Base):
+    """
+    Rolling summary of the older part of a session's story.
+    Events up to and including covered_seq are folded into `summary`; newer ones are sent verbatim.
+    """
+
+    __tablename__ = "session_summaries"
+
+    session_id = Column(String, ForeignKey("player_states.session_id", ondelete="CASCADE"), primary_key=True)
+    summary = Column(Text, nullable=False, default="")
+    covered_seq = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<SessionSummary(session_id='{self.session_id}', covered_seq={self.covered_seq})>"
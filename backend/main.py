@@ -1,19 +1,73 @@
 # -*- coding: utf-8 -*-
+import os
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 # Import the API router
 from .api import game_routes # Use relative import
-# Import database setup and models
-from .db import database, models
+# Database setup and the versioned schema migrations
+from .db import database, migrations
+from .core import metrics, logging_setup
+from .core.static_files import FrontendFiles
+from .core.json_codec import FastJSONResponse
+from .services import ai_service, prompt_builder, context_builder
+from .services.session_cache import session_cache
+from .services.response_cache import response_cache
+from .services.speculation import speculation
+from .services.turn_coordinator import turn_coordinator
+from .services.ai_scheduler import ai_scheduler
+from .services.session_lifecycle import session_lifecycle
 
-# Create DB tables if they don't exist
-# Note: In production, you might use Alembic for migrations
-# This line ensures tables are created when the app starts
-models.Base.metadata.create_all(bind=database.engine)
+# Queue-based JSON/text logging for all 'backend.*' loggers (see core/logging_setup.py)
+logging_setup.configure_logging()
 
+# Schema migrations (db/migrations.py: table creation, legacy history move) run in the app startup
+# unless DB_INIT_ON_STARTUP=false; importing this module never touches the database.
+# start.py's production mode runs them once before starting the workers.
+DB_INIT_ON_STARTUP = os.getenv("DB_INIT_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+# Serve frontend/ (built variants from frontend/dist first, see backend/tools/build_frontend.py) at "/"
+SERVE_FRONTEND = os.getenv("SERVE_FRONTEND", "true").lower() in ("1", "true", "yes")
+FRONTEND_DIR = os.getenv("FRONTEND_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend"))
+# Seconds shutdown waits for background AI work (summaries, in-flight model calls) to finish
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "10"))
 
-app = FastAPI(title="Text RPG API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Owns process-wide resources (the pooled OpenRouter HTTP client, the DB executor, the session cache flusher) and runs the schema migrations."""
+    await ai_service.start_http_client()
+    database.get_db_executor()
+    prompt_builder.warm_prompt_cache()
+    if DB_INIT_ON_STARTUP:
+        await database.run_db(migrations.migrate)
+    flusher = asyncio.create_task(session_cache.run_flusher()) if session_cache.write_behind else None
+    # Idle session expiry/archival and periodic incremental VACUUM (services/session_lifecycle.py)
+    sweeper = asyncio.create_task(session_lifecycle.run()) if session_lifecycle.enabled else None
+    app.state.ready = True
+    try:
+        yield
+    finally:
+        # uvicorn has already let in-flight requests finish (--timeout-graceful-shutdown)
+        app.state.ready = False
+        if flusher is not None:
+            flusher.cancel()
+        if sweeper is not None:
+            sweeper.cancel()
+        speculation.cancel_all()
+        # Let background AI work finish while the HTTP client and DB executor are still up
+        await context_builder.wait_for_summaries(SHUTDOWN_DRAIN_TIMEOUT)
+        await ai_scheduler.drain(SHUTDOWN_DRAIN_TIMEOUT)
+        # Write out any queued (write-behind) history before the DB executor goes away
+        await session_cache.flush()
+        await ai_service.close_http_client()
+        response_cache.close()
+        database.shutdown_db_executor()
+
+
+app = FastAPI(title="Text RPG API", lifespan=lifespan)
+app.state.ready = False
 
 # CORS Configuration
 origins = [
@@ -32,14 +86,75 @@ app.add_middleware(
     allow_headers=["*"], 
 )
 
+# Per-request phase timings (Server-Timing header) and request duration histograms for /metrics
+app.add_middleware(metrics.TimingMiddleware)
+# request_id for log correlation (X-Request-ID); added last so it wraps everything else
+app.add_middleware(logging_setup.RequestContextMiddleware)
+
 # Include the game API router
 app.include_router(game_routes.router, prefix="/api/v1") # Added a version prefix
 
-# Simple root endpoint for testing
-@app.get("/", tags=["Root"])
+# Simple root endpoint for testing; "/" is the game page when the frontend is served
 async def read_root():
     return {"message": "Welcome to the Text RPG API!"}
 
+if not SERVE_FRONTEND:
+    app.get("/", tags=["Root"])(read_root)
+
+# Readiness probe: 200 once startup has finished, 503 while starting or shutting down (start.py polls it)
+@app.get("/ready", tags=["Root"], response_class=FastJSONResponse)
+async def readiness():
+    if not app.state.ready:
+        return FastJSONResponse({"status": "not_ready"}, status_code=503)
+    return {"status": "ready"}
+
+# Hit/miss, eviction and flush statistics of the in-memory session cache
+@app.get("/stats/session_cache", tags=["Stats"], response_class=FastJSONResponse)
+async def session_cache_stats():
+    return session_cache.get_stats()
+
+# Hit/miss statistics of the (opt-in) AI response cache
+@app.get("/stats/ai_cache", tags=["Stats"], response_class=FastJSONResponse)
+async def ai_cache_stats():
+    return response_cache.get_stats()
+
+# Connection pool statistics for the OpenRouter HTTP client
+@app.get("/stats/ai_http", tags=["Stats"], response_class=FastJSONResponse)
+async def ai_http_stats():
+    return ai_service.get_http_client_stats()
+
+@app.get("/stats/speculation", tags=["Stats"], response_class=FastJSONResponse)
+async def speculation_stats():
+    return speculation.get_stats()
+
+# AI call scheduler: queue depth, shed requests, rate-limit skips and active Retry-After cooldowns
+@app.get("/stats/ai_scheduler", tags=["Stats"], response_class=FastJSONResponse)
+async def ai_scheduler_stats():
+    return ai_scheduler.get_stats()
+
+# Per-session serialization waits and duplicate make_choice requests answered without a new AI call
+@app.get("/stats/turns", tags=["Stats"], response_class=FastJSONResponse)
+async def turn_stats():
+    return turn_coordinator.get_stats()
+
+# Expired sessions archived/deleted, archive size and VACUUM runs
+@app.get("/stats/lifecycle", tags=["Stats"], response_class=FastJSONResponse)
+async def lifecycle_stats():
+    return session_lifecycle.get_stats()
+
+@app.get("/stats/db", tags=["Stats"], response_class=FastJSONResponse)
+async def db_stats():
+    return database.get_db_stats()
+
+# Prometheus scrape endpoint: request/phase/DB/model latency histograms and AI failure counters
+@app.get("/metrics", tags=["Stats"], response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Frontend files; mounted after every route since "/" matches any path
+if SERVE_FRONTEND:
+    app.mount("/", FrontendFiles([os.path.join(FRONTEND_DIR, "dist"), FRONTEND_DIR]), name="frontend")
+
 # The main logic for /start_game and /make_choice is now in api/game_routes.py
 # and services/game_service.py
 
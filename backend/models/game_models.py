@@ -15,6 +15,8 @@ class MakeChoicePayload(BaseModel):
     session_id: str # Unique ID for the game session
     choice_id: str # e.g., "A", "B", "USER_ACTION"
     choice_text: str # Text of the button clicked or the custom action typed
+    # Client-generated key, the same for retries of one click; duplicates get the first request's response
+    idempotency_key: Optional[str] = Field(None, max_length=128)
     # player_state is no longer sent from frontend
 
 # --- Response Models ---
@@ -42,6 +44,16 @@ class ChoiceModel(BaseModel):
     text: str
     skill_check_stat: Optional[str] = None # e.g., "strength", "dexterity"
     skill_check_dc: Optional[int] = None   # e.g., 10, 15
+    skill_check_mode: Optional[str] = None # "advantage" / "disadvantage"; None is a normal roll
+    # Filled in by the server for skill checks from the player's stats (services/skill_odds.py), 0..1
+    success_chance: Optional[float] = None
+    critical_success_chance: Optional[float] = None
+    critical_failure_chance: Optional[float] = None
+
+class NarrationOutputModel(BaseModel):
+    """Structured narrator output (JSON mode): the story text and the next choices."""
+    narration: str
+    choices: List[ChoiceModel]
 
 class SkillCheckResultModel(BaseModel):
     """Detailed result of a skill check."""
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+import os
+import math
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any, AsyncIterator, Iterator
+
+from ..core import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# Every model call goes through the scheduler: a global and a per-model concurrency cap, a
+# per-model token bucket (free OpenRouter models allow about 20 requests/minute), and cooldowns
+# set from Retry-After on 429s. Callers wait in a bounded queue; when it is full, new turns are
+# rejected at once with 503 + Retry-After instead of piling up behind the provider limits.
+AI_MAX_CONCURRENT = int(os.getenv("AI_MAX_CONCURRENT", "16")) # Model calls in flight process-wide
+AI_MAX_CONCURRENT_PER_MODEL = int(os.getenv("AI_MAX_CONCURRENT_PER_MODEL", "4"))
+AI_RATE_LIMIT_PER_MINUTE = float(os.getenv("AI_RATE_LIMIT_PER_MINUTE", "20")) # Per model; 0 disables the token bucket
+AI_RATE_LIMIT_BURST = int(os.getenv("AI_RATE_LIMIT_BURST", "5"))
+AI_QUEUE_MAX = int(os.getenv("AI_QUEUE_MAX", "64")) # Calls allowed to wait for a slot; beyond this requests are shed
+AI_QUEUE_TIMEOUT = float(os.getenv("AI_QUEUE_TIMEOUT", "15.0")) # Max seconds a call waits before it gives up
+AI_RETRY_AFTER_DEFAULT = float(os.getenv("AI_RETRY_AFTER_DEFAULT", "10.0")) # Cooldown after a 429 without Retry-After
+AI_RETRY_AFTER_MAX = float(os.getenv("AI_RETRY_AFTER_MAX", "120.0"))
+AI_SHED_RETRY_AFTER = int(os.getenv("AI_SHED_RETRY_AFTER", "5")) # Retry-After (s) sent with a 503
+
+# Background work (speculative generations, story summaries) never waits in the queue: it runs
+# only if a slot and a rate-limit token are free right away, so it cannot delay players.
+_background: ContextVar[bool] = ContextVar("ai_background", default=False)
+
+
+class AIOverloadedError(Exception):
+    """The AI wait queue is full (or a slot did not free up in time); the request should be retried later."""
+
+    def __init__(self, retry_after: float = AI_SHED_RETRY_AFTER):
+        super().__init__(f"AI scheduler overloaded, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class ModelUnavailableError(Exception):
+    """A single model cannot be called within the wait budget (rate limit or cooldown); try the next one."""
+
+    def __init__(self, model_name: str, wait: float):
+        super().__init__(f"Model {model_name} rate limited for another {wait:.1f}s")
+        self.model_name = model_name
+        self.wait = wait
+
+
+class _ModelLimiter:
+    """Token bucket + concurrency cap + Retry-After cooldown of one model."""
+
+    def __init__(self):
+        self.rate = AI_RATE_LIMIT_PER_MINUTE / 60.0 # Tokens per second
+        self.tokens = float(AI_RATE_LIMIT_BURST)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.slots = asyncio.Semaphore(AI_MAX_CONCURRENT_PER_MODEL)
+
+    def reserve(self, now: float) -> float:
+        """Takes a token (possibly ahead of time) and returns how long the caller must wait before using it."""
+        if self.rate <= 0:
+            return max(self.blocked_until - now, 0.0)
+        self.tokens = min(float(AI_RATE_LIMIT_BURST), self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.tokens -= 1
+        token_wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(token_wait, self.blocked_until - now, 0.0)
+
+    def refund(self) -> None:
+        if self.rate > 0:
+            self.tokens = min(float(AI_RATE_LIMIT_BURST), self.tokens + 1)
+
+    def penalize(self, seconds: float, now: float) -> None:
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class AIScheduler:
+    """Admission control for model calls: `async with ai_scheduler.slot(model_name): <call>`."""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._global: Optional[asyncio.Semaphore] = None
+        self._limiters: Dict[str, _ModelLimiter] = {}
+        self._waiting = 0
+        self._in_flight = 0
+        self.stats = {
+            "calls": 0, "queued": 0, "shed": 0, "queue_timeouts": 0, "rate_limited_skips": 0,
+            "background_skips": 0, "retry_after_cooldowns": 0,
+        }
+
+    @contextmanager
+    def background(self) -> Iterator[None]:
+        """Marks model calls made inside the block (and tasks started from it) as background work."""
+        token = _background.set(True)
+        try:
+            yield
+        finally:
+            _background.reset(token)
+
+    def in_background(self) -> bool:
+        return _background.get()
+
+    def check_capacity(self) -> None:
+        """Raises AIOverloadedError when the wait queue is full; lets the API reject a turn before doing any work."""
+        if self._waiting >= AI_QUEUE_MAX:
+            self.stats["shed"] += 1
+            metrics.AI_SHED.inc()
+            raise AIOverloadedError()
+
+    @asynccontextmanager
+    async def slot(self, model_name: str) -> AsyncIterator[None]:
+        """
+        Holds a global and a per-model slot for one model call, after waiting for the model's rate limit.
+        Raises ModelUnavailableError if this model cannot be called within AI_QUEUE_TIMEOUT, and
+        AIOverloadedError if the queue is full or no global slot frees up in time.
+        """
+        self._bind_loop()
+        limiter = self._limiters.get(model_name)
+        if limiter is None:
+            limiter = self._limiters[model_name] = _ModelLimiter()
+        background = _background.get()
+        if not background:
+            self.check_capacity()
+
+        started_at = time.monotonic()
+        delay = limiter.reserve(started_at)
+        budget = 0.0 if background else AI_QUEUE_TIMEOUT
+        if delay > budget:
+            limiter.refund()
+            self.stats["rate_limited_skips"] += 1
+            metrics.AI_RATE_LIMITED.inc(model_name)
+            raise ModelUnavailableError(model_name, delay)
+
+        if not delay and not self._global.locked() and not limiter.slots.locked():
+            # Free capacity: both acquires complete without suspending
+            await self._global.acquire()
+            await limiter.slots.acquire()
+        elif background:
+            limiter.refund()
+            self.stats["background_skips"] += 1
+            raise ModelUnavailableError(model_name, 0.0)
+        else:
+            await self._wait_for_slots(model_name, limiter, delay, started_at)
+
+        self.stats["calls"] += 1
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            limiter.slots.release()
+            self._global.release()
+
+    async def _wait_for_slots(self, model_name: str, limiter: _ModelLimiter, delay: float, started_at: float) -> None:
+        self._waiting += 1
+        self.stats["queued"] += 1
+        metrics.AI_QUEUE_DEPTH.set(self._waiting)
+        deadline = started_at + AI_QUEUE_TIMEOUT
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                await asyncio.wait_for(self._global.acquire(), max(deadline - time.monotonic(), 0.0))
+            except asyncio.TimeoutError:
+                limiter.refund()
+                self.stats["queue_timeouts"] += 1
+                metrics.AI_SHED.inc()
+                raise AIOverloadedError() from None
+            try:
+                await asyncio.wait_for(limiter.slots.acquire(), max(deadline - time.monotonic(), 0.0))
+            except BaseException:
+                self._global.release()
+                limiter.refund()
+                raise
+        except asyncio.TimeoutError:
+            self.stats["queue_timeouts"] += 1
+            raise ModelUnavailableError(model_name, 0.0) from None
+        finally:
+            self._waiting -= 1
+            metrics.AI_QUEUE_DEPTH.set(self._waiting)
+            metrics.AI_QUEUE_WAIT_SECONDS.observe(time.monotonic() - started_at)
+
+    async def drain(self, timeout: float) -> bool:
+        """Waits (app shutdown) until no model call is in flight; False if some are still running after `timeout`."""
+        deadline = time.monotonic() + timeout
+        while self._in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return self._in_flight == 0
+
+    def penalize(self, model_name: str, headers: Any) -> float:
+        """Applies a cooldown to a model after a 429 (Retry-After seconds or HTTP date); returns its length."""
+        seconds = min(_parse_retry_after(headers.get("retry-after")) or AI_RETRY_AFTER_DEFAULT, AI_RETRY_AFTER_MAX)
+        limiter = self._limiters.get(model_name)
+        if limiter is None:
+            limiter = self._limiters[model_name] = _ModelLimiter()
+        limiter.penalize(seconds, time.monotonic())
+        self.stats["retry_after_cooldowns"] += 1
+        logger.info("Model %s için %.0fs bekleme süresi uygulandı (429).", model_name, seconds)
+        return seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            **self.stats,
+            "waiting": self._waiting,
+            "in_flight": self._in_flight,
+            "cooldowns": {
+                model_name: round(limiter.blocked_until - now, 1)
+                for model_name, limiter in self._limiters.items() if limiter.blocked_until > now
+            },
+        }
+
+    def _bind_loop(self) -> None:
+        # asyncio primitives belong to one event loop; rebuild them if the app runs on a new loop (tests, reloads)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._global = asyncio.Semaphore(AI_MAX_CONCURRENT)
+            self._limiters = {}
+            self._waiting = 0
+            self._in_flight = 0
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+# Process-wide instance
+ai_scheduler = AIScheduler()
@@ -1,24 +1,60 @@
 # -*- coding: utf-8 -*-
 import os
 import httpx # httpx is an async-capable HTTP client, good for FastAPI
-import json
-import re # Added for parsing skill checks from AI response
-from pathlib import Path # Import Path
-from dotenv import load_dotenv
-# Import world lore from story_data (adjust path based on new structure)
-# Assuming this service is called from other services/api in backend/, the path needs to be relative to that
-# Or use absolute imports relative to the project root if PYTHONPATH is set, or relative imports from within backend
-from ..data.worlds import WORLDS # Use relative import from sibling directory 'data'
-
-# Construct an absolute path to the .env file relative to this file's location
-# ai_service.py (services) -> backend -> .env
-DOTENV_PATH = Path(__file__).resolve().parent.parent / '.env'
-load_dotenv(dotenv_path=DOTENV_PATH)
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Optional, Dict, Any, List, Deque, AsyncIterator
+# Prompt construction (cached per-world system prompt + per-turn message) lives in prompt_builder
+from .prompt_builder import build_messages, build_summary_messages
+from .response_cache import response_cache
+# Concurrency caps, per-model rate limits and load shedding for all model calls
+from .ai_scheduler import ai_scheduler, AIOverloadedError, ModelUnavailableError
+# Narration/choice parsing (and its streaming counterpart) lives in narration_parser
+from ..core import metrics, json_codec
+from .narration_parser import parse_narration, parse_structured_narration, NarrationStreamSplitter, NARRATION_RESPONSE_FORMAT
 
+logger = logging.getLogger(__name__)
+
+# backend/.env is loaded into the environment by start.py (or uvicorn --env-file), not on import
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 HTTP_REFERER = os.getenv("HTTP_REFERER", "http://localhost:8000") # Default if not set
 X_TITLE = os.getenv("X_TITLE", "Text RPG Adventure") # Default if not set
 
+# HTTP client configuration (shared, pooled client owned by the app lifespan)
+# OPENROUTER_BASE_URL can point at any OpenAI-compatible endpoint, e.g. the fake server of backend/tools/load_test.py
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+OPENROUTER_API_URL = f"{OPENROUTER_BASE_URL.rstrip('/')}/chat/completions"
+AI_HTTP2_ENABLED = os.getenv("AI_HTTP2_ENABLED", "true").lower() in ("1", "true", "yes")
+AI_MAX_CONNECTIONS = int(os.getenv("AI_MAX_CONNECTIONS", "20"))
+AI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+AI_KEEPALIVE_EXPIRY = float(os.getenv("AI_KEEPALIVE_EXPIRY", "60.0")) # Seconds an idle connection is kept open
+AI_CONNECT_TIMEOUT = float(os.getenv("AI_CONNECT_TIMEOUT", "5.0"))
+AI_READ_TIMEOUT = float(os.getenv("AI_READ_TIMEOUT", "30.0"))
+AI_WRITE_TIMEOUT = float(os.getenv("AI_WRITE_TIMEOUT", "10.0"))
+AI_POOL_TIMEOUT = float(os.getenv("AI_POOL_TIMEOUT", "5.0")) # Max wait for a free connection from the pool
+
+# Hedged requests: if the current model has not answered within its hedge delay,
+# the next model in MODEL_PREFERENCE is started in parallel and the first valid answer wins.
+AI_HEDGING_ENABLED = os.getenv("AI_HEDGING_ENABLED", "false").lower() in ("1", "true", "yes")
+AI_HEDGE_PERCENTILE = float(os.getenv("AI_HEDGE_PERCENTILE", "0.95"))
+AI_HEDGE_DELAY_DEFAULT = float(os.getenv("AI_HEDGE_DELAY_DEFAULT", "8.0")) # Used until enough latency samples exist
+AI_HEDGE_DELAY_MIN = float(os.getenv("AI_HEDGE_DELAY_MIN", "1.0"))
+AI_HEDGE_DELAY_MAX = float(os.getenv("AI_HEDGE_DELAY_MAX", "20.0"))
+AI_HEDGE_MIN_SAMPLES = int(os.getenv("AI_HEDGE_MIN_SAMPLES", "5"))
+AI_HEDGE_LATENCY_WINDOW = int(os.getenv("AI_HEDGE_LATENCY_WINDOW", "100"))
+AI_HEDGE_MAX_PARALLEL = int(os.getenv("AI_HEDGE_MAX_PARALLEL", "2")) # Max models in flight at once
+
+# Structured output: ask for JSON matching NARRATION_JSON_SCHEMA (via `response_format`) instead of
+# the 'A) ...' text format. Models that reject schemas or ignore them fall back to the text parser.
+# Streaming responses always use the text format (the story must be readable while it arrives).
+AI_STRUCTURED_OUTPUT = os.getenv("AI_STRUCTURED_OUTPUT", "false").lower() in ("1", "true", "yes")
+# A single rejected or ignored schema can be transient (provider hiccup, an odd prompt), so a model is
+# only asked for text after this many schema failures in a row, and only for AI_SCHEMA_UNSUPPORTED_TTL seconds
+AI_SCHEMA_FAILURE_THRESHOLD = int(os.getenv("AI_SCHEMA_FAILURE_THRESHOLD", "2"))
+AI_SCHEMA_UNSUPPORTED_TTL = float(os.getenv("AI_SCHEMA_UNSUPPORTED_TTL", "3600"))
+
 # Provided model list
 MODEL_PREFERENCE = [
     "google/gemini-2.0-flash-exp:free",
@@ -30,6 +66,107 @@ MODEL_PREFERENCE = [
     "deepseek/deepseek-prover-v2:free"
 ]
 
+# Models found not to support (or to ignore) `response_format` -> monotonic time until which they are asked for text
+_schema_unsupported_models: Dict[str, float] = {}
+# Consecutive schema failures per model (reset by a valid structured answer)
+_schema_failures: Dict[str, int] = {}
+
+# Provider answers to a `response_format` request that mean "this model/provider cannot do schemas"
+_SCHEMA_REJECTED_STATUS_CODES = (400, 404, 422)
+
+class SchemaNotSupportedError(Exception):
+    """Raised when a provider rejects a structured output (response_format) request."""
+
+# --- Shared HTTP Client ---
+# A single AsyncClient is reused across turns so keep-alive connections (and the
+# TLS session) to OpenRouter survive between requests instead of being rebuilt
+# on every /make_choice call.
+_http_client: Optional[httpx.AsyncClient] = None
+
+# Connection reuse counters. A request that does not trigger a TCP connect was
+# served on an already open (pooled) connection.
+_http_stats = {
+    "requests": 0,
+    "new_connections": 0,
+    "http2": False,
+    "structured_responses": 0,
+    "schema_fallbacks": 0,
+}
+
+def _http2_available() -> bool:
+    """Returns True if the optional 'h2' package needed for HTTP/2 is installed."""
+    try:
+        import h2 # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _create_http_client() -> httpx.AsyncClient:
+    """Builds the pooled AsyncClient using the configured limits and timeouts."""
+    use_http2 = AI_HTTP2_ENABLED and _http2_available()
+    if AI_HTTP2_ENABLED and not use_http2:
+        logger.warning("HTTP/2 için 'h2' paketi bulunamadı, HTTP/1.1 kullanılacak.")
+    _http_stats["http2"] = use_http2
+    return httpx.AsyncClient(
+        http2=use_http2,
+        limits=httpx.Limits(
+            max_connections=AI_MAX_CONNECTIONS,
+            max_keepalive_connections=AI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=AI_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            connect=AI_CONNECT_TIMEOUT,
+            read=AI_READ_TIMEOUT,
+            write=AI_WRITE_TIMEOUT,
+            pool=AI_POOL_TIMEOUT,
+        ),
+    )
+
+async def start_http_client() -> None:
+    """Creates the shared HTTP client. Called from the FastAPI lifespan on startup."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _create_http_client()
+
+async def close_http_client() -> None:
+    """Closes the shared HTTP client and its pooled connections on shutdown."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        logger.info("AI HTTP istemcisi kapatıldı.", extra={"http_stats": get_http_client_stats()})
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared HTTP client.
+    Falls back to creating it lazily (e.g. when the service is used outside the app lifespan).
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _create_http_client()
+    return _http_client
+
+def get_http_client_stats() -> Dict[str, Any]:
+    """Returns connection reuse counters for the shared HTTP client."""
+    requests_sent = _http_stats["requests"]
+    new_connections = _http_stats["new_connections"]
+    reused = max(requests_sent - new_connections, 0)
+    return {
+        "requests": requests_sent,
+        "new_connections": new_connections,
+        "reused_connections": reused,
+        "reuse_ratio": round(reused / requests_sent, 4) if requests_sent else 0.0,
+        "http2": _http_stats["http2"],
+        "structured_responses": _http_stats["structured_responses"],
+        "schema_fallbacks": _http_stats["schema_fallbacks"],
+        "schema_unsupported_models": sorted(model for model in list(_schema_unsupported_models) if not _schema_supported(model)),
+    }
+
+async def _trace_connection_events(event_name: str, info: dict) -> None:
+    """httpcore trace hook; counts TCP connects so pooled reuse can be derived."""
+    if event_name == "connection.connect_tcp.started":
+        _http_stats["new_connections"] += 1
+
 async def get_ai_response(prompt_text: str, player_context: dict = None) -> dict:
     """
     Sends a prompt to the OpenRouter API using a preferred list of models,
@@ -43,178 +180,375 @@ async def get_ai_response(prompt_text: str, player_context: dict = None) -> dict
         A dictionary containing the AI's response or an error message.
     """
     if not OPENROUTER_API_KEY or OPENROUTER_API_KEY == "YOUR_OPENROUTER_API_KEY_HERE":
-        print("HATA: OPENROUTER_API_KEY .env dosyasında ayarlanmamış veya geçersiz.")
+        logger.error("OPENROUTER_API_KEY .env dosyasında ayarlanmamış veya geçersiz.")
         return {"error": "AI servisi konfigüre edilmemiş. Lütfen API anahtarını kontrol edin."}
 
-    # Determine world name and lore for the prompt
-    world_id = player_context.get("world_id") if player_context else None
-    world_data = WORLDS.get(world_id, {})
-    world_name = world_data.get("name", "belirsiz bir dünya")
-    lore_summary = world_data.get("lore_summary", "Dünya hakkında ek bilgi yok.")
-
-    base_prompt = (
-        f"Sen '{world_name}' adlı dünyada geçen, metin tabanlı bir RPG oyununun anlatıcısısın. " 
-        "Oyuncunun hikayesini ve eylemlerinin sonuçlarını yönlendiriyorsun. "
-        "Aşağıda genel dünya bilgisi, oyuncunun mevcut durumu ve son yaptığı eylem/seçim belirtilmiştir. " 
-        "Bu eylemin/seçimin sonucunu ve ortaya çıkan yeni durumu yaratıcı bir şekilde anlat. "
-        "Eğer oyuncu serbest metinle özel bir eylem deniyorsa (örneğin 'Oyuncu şu özel eylemi yapmayı deniyor: ...' gibi bir ifadeyle belirtilmişse), "
-        "bu eylemin başarılı olup olmayacağını mevcut durum, karakterin mantıksal yetenekleri ve oyun dünyasının gerçekçiliği çerçevesinde değerlendir. Her özel eylem otomatik olarak başarılı olmamalıdır. "
-        "Anlatımının sonunda, oyuncuya yeni durumda yapabileceği 2 veya 3 yeni seçenek sun. "
-        "Seçenekleri 'A) Seçenek metni', 'B) Başka bir seçenek metni' gibi, her birini ayrı bir satırda ve net bir şekilde belirt.\n"
-        "ARA SIRA, seçeneklerden biri bir YETENEK KONTROLÜ olabilir. Bunu 'Seçenek metni (YETENEK ZORLUK_DERECESİ)' formatında belirt. Örneğin: 'C) Kapıyı kırmaya çalış (Güç DC15)'. Kullanılabilecek yetenekler: strength, dexterity, constitution, intelligence, wisdom, charisma.\n"
-        "Eğer sana bir yetenek kontrolünün sonucu (BAŞARILI, BAŞARISIZ, KRİTİK BAŞARI, KRİTİK BAŞARISIZ) verilirse, hikayeyi bu sonuca göre devam ettir.\n\n"
-        f"Genel Dünya Bilgisi ({world_name}): {lore_summary}\n\n" # Inject world lore here
-    )
+    # Opt-in response cache (see response_cache.py); identical early-game turns skip the provider
+    cached = await response_cache.get(player_context)
+    if cached is not None:
+        metrics.AI_CACHE_HITS.inc()
+        return cached
 
-    context_str = "Oyuncunun Durumu:\n"
-    if player_context:
-        # Add specific player details
-        if player_context.get("class"):
-            context_str += f"- Sınıf/Fraksiyon: {player_context['class']}\n"
-        if player_context.get("stats"):
-            # Format stats nicely
-            stats_str = ", ".join([f"{k.upper()}: {v}" for k, v in player_context['stats'].items()])
-            context_str += f"- Özellikler: {stats_str}\n"
-        if player_context.get("health"):
-            context_str += f"- Can: {player_context['health']}\n"
-        if player_context.get("current_scenario_text"): # Text player saw before making the choice/action
-             context_str += f"- Önceki Durum Metni: {player_context['current_scenario_text']}\n"
-        if player_context.get("skill_check_outcome"): # If there was a skill check
-            context_str += f"- Yetenek Kontrolü Sonucu: {player_context['skill_check_outcome']}\n"
-        # last_choice_text is now part of the main prompt_text coming in
+    if AI_HEDGING_ENABLED:
+        result = await _get_ai_response_hedged(prompt_text, player_context)
     else:
-        context_str = "Oyuncu durumu hakkında bilgi yok.\n"
+        result = await _get_ai_response_sequential(prompt_text, player_context)
+
+    if result is None:
+        if ai_scheduler.in_background():
+            # Background calls are skipped rather than queued when the scheduler is busy; not a player-facing failure
+            logger.info("Arka plan AI çağrısı yapılamadı.")
+        else:
+            logger.error("Hiçbir AI modeli geçerli bir cevap vermedi.")
+            metrics.AI_FAILURES.inc()
+        return {"error": "AI modellerinden hiçbiri cevap veremedi. Lütfen daha sonra tekrar deneyin."}
+    await response_cache.put(player_context, result)
+    return result
+
+
+async def stream_ai_response(prompt_text: str, player_context: dict = None) -> AsyncIterator[dict]:
+    """
+    Streaming variant of get_ai_response.
+    Requests `stream=True` from the provider and yields events as they arrive:
+        {"type": "token", "text": "..."}   story text, safe to show the player
+        {"type": "done", "result": {...}}  the fully parsed response (same shape as get_ai_response)
+        {"type": "error", "error": "..."}  nothing usable could be produced, or the stream broke off
+                                           after tokens were shown (the partial answer is not cached)
+    Models are tried in MODEL_PREFERENCE order; fallback to the next model is only
+    possible until the first token has been forwarded to the player.
+    """
+    if not OPENROUTER_API_KEY or OPENROUTER_API_KEY == "YOUR_OPENROUTER_API_KEY_HERE":
+        logger.error("OPENROUTER_API_KEY .env dosyasında ayarlanmamış veya geçersiz.")
+        yield {"type": "error", "error": "AI servisi konfigüre edilmemiş. Lütfen API anahtarını kontrol edin."}
+        return
+
+    cached = await response_cache.get(player_context)
+    if cached is not None:
+        metrics.AI_CACHE_HITS.inc()
+        yield {"type": "token", "text": cached.get("text", "")}
+        yield {"type": "done", "result": cached}
+        return
+
+    with metrics.span("prompt"):
+        messages = build_messages(prompt_text, player_context)
+    client = get_http_client()
+
+    for depth, model_name in enumerate(MODEL_PREFERENCE):
+        logger.debug("AI modeli deneniyor (stream): %s", model_name, extra={"sampled": True})
+        data = {
+            "model": model_name,
+            "messages": messages,
+            "stream": True,
+        }
+        splitter = NarrationStreamSplitter()
+        content_parts: List[str] = []
+        interrupted = False # The connection failed mid-stream: what arrived is a truncated answer
+        started_at = time.perf_counter()
+        try:
+            async with ai_scheduler.slot(model_name):
+                started_at = time.perf_counter() # Latency excludes the wait for a scheduler slot
+                _http_stats["requests"] += 1
+                async with client.stream(
+                    "POST",
+                    OPENROUTER_API_URL,
+                    headers=_build_headers(),
+                    json=data,
+                    extensions={"trace": _trace_connection_events}
+                ) as response:
+                    response.raise_for_status()
+                    async for delta in _iter_stream_deltas(response):
+                        content_parts.append(delta)
+                        story_text = splitter.feed(delta)
+                        if story_text:
+                            yield {"type": "token", "text": story_text}
+        except ModelUnavailableError as e:
+            logger.info("%s, sonraki modele geçiliyor.", e)
+            continue
+        except httpx.HTTPStatusError as e:
+            logger.warning("Model %s ile HTTP hatası (stream): %s", model_name, e.response.status_code)
+            if e.response.status_code == 429:
+                ai_scheduler.penalize(model_name, e.response.headers)
+        except httpx.RequestError as e:
+            logger.warning("Model %s ile bağlantı hatası (stream): %r", model_name, e)
+            interrupted = True
+
+        ai_content = "".join(content_parts)
+        elapsed = time.perf_counter() - started_at
+        succeeded = bool(ai_content.strip()) and not interrupted
+        metrics.AI_MODEL_SECONDS.observe(elapsed, model_name, "ok" if succeeded else "error")
+        if succeeded:
+            _record_model_latency(model_name, elapsed)
+            metrics.AI_FALLBACK_DEPTH.observe(depth)
+            logger.info("Başarılı cevap alındı (stream): %s", model_name, extra={"model": model_name, "latency_ms": round(elapsed * 1000)})
+            result = _parse_text_response(model_name, ai_content)
+            await response_cache.put(player_context, result)
+            yield {"type": "done", "result": result}
+            return
+        if splitter.has_emitted:
+            # Tokens already reached the player; switching models now would garble the story.
+            # A truncated answer is neither parsed nor cached: the turn fails and can be retried.
+            logger.error("Model %s cevabı yarıda kesildi (stream), %d karakter alınmıştı.", model_name, len(ai_content))
+            metrics.AI_FAILURES.inc()
+            yield {"type": "error", "error": "AI cevabı yarıda kesildi. Lütfen tekrar deneyin."}
+            return
+
+    logger.error("Hiçbir AI modeli geçerli bir cevap vermedi (stream).")
+    metrics.AI_FAILURES.inc()
+    yield {"type": "error", "error": "AI modellerinden hiçbiri cevap veremedi. Lütfen daha sonra tekrar deneyin."}
 
-    # prompt_text already contains the player's specific action/choice description from the caller
-    # If there was a skill check outcome, prompt_text might be more generic like "Continue the story"
-    # or it could be the original choice text that led to the skill check.
-    # The game_service will decide what prompt_text should be in this case.
-    full_prompt = f"{base_prompt}{context_str}\nOyuncunun Son Eylemi/Seçimi (veya Yetenek Kontrolü İsteği): {prompt_text}\n\nAnlatımın ve yeni seçeneklerin:"
+async def _iter_stream_deltas(response: httpx.Response) -> AsyncIterator[str]:
+    """Yields content deltas from an OpenAI-compatible SSE completion stream."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue # Blank separators and ": OPENROUTER PROCESSING" keep-alive comments
+        payload = line[5:].strip()
+        if payload == "[DONE]":
+            break
+        try:
+            chunk = json_codec.loads(payload)
+        except ValueError:
+            continue
+        choices = chunk.get("choices") or []
+        if choices:
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
 
-    headers = {
+def _build_headers() -> Dict[str, str]:
+    """Request headers required by OpenRouter."""
+    return {
         "Authorization": f"Bearer {OPENROUTER_API_KEY}",
         "Content-Type": "application/json",
         "HTTP-Referer": HTTP_REFERER,
         "X-Title": X_TITLE,
     }
 
-    async with httpx.AsyncClient(timeout=30.0) as client: 
-        for model_name in MODEL_PREFERENCE:
-            print(f"AI modeli deneniyor: {model_name}")
-            data = {
-                "model": model_name,
-                "messages": [{"role": "user", "content": full_prompt}],
-            }
-            try:
-                response = await client.post(
-                    "https://openrouter.ai/api/v1/chat/completions",
-                    headers=headers,
-                    json=data
-                )
-                response.raise_for_status()  
-                
-                response_json = response.json()
-                
-                if response_json.get("choices") and len(response_json["choices"]) > 0:
-                    ai_content = response_json["choices"][0].get("message", {}).get("content")
-                    if ai_content:
-                        print(f"Başarılı cevap alındı: {model_name}")
-                        # Parse AI response into text and choices
-                        ai_lines = ai_content.strip().split("\n")
-                        story_part_lines = []
-                        choice_lines_raw = []
-                        parsing_choices_active = False
-
-                        for line_raw in ai_lines:
-                            current_line_stripped = line_raw.strip()
-                            if not current_line_stripped:
-                                continue
-                            
-                            check_line = current_line_stripped.lstrip(" *") 
-                            is_choice_line = False
-                            if len(check_line) >= 2 and check_line[0].isalnum() and check_line[1] in (")", "."):
-                                is_choice_line = True
-
-                            if is_choice_line:
-                                parsing_choices_active = True
-                            
-                            if parsing_choices_active:
-                                choice_lines_raw.append(current_line_stripped)
-                            else:
-                                story_part_lines.append(current_line_stripped)
-                        
-                        if story_part_lines and choice_lines_raw:
-                            last_story_line_cleaned = story_part_lines[-1].lower().replace('*','').replace(':','').strip()
-                            if last_story_line_cleaned == "yeni seçenekler":
-                                story_part_lines.pop()
-
-                        parsed_choices_list = []
-                        for i, single_choice_raw_line in enumerate(choice_lines_raw):
-                            text_to_extract = single_choice_raw_line 
-                            marker_end_index = -1
-                            idx_paren = text_to_extract.find(')')
-                            idx_dot = text_to_extract.find('.')
-
-                            if idx_paren != -1 and (idx_dot == -1 or idx_paren < idx_dot):
-                                marker_end_index = idx_paren
-                            elif idx_dot != -1:
-                                marker_end_index = idx_dot
-                            
-                            extracted_text = ""
-                            if marker_end_index != -1 and marker_end_index < len(text_to_extract) -1:
-                                extracted_text = text_to_extract[marker_end_index+1:].strip()
-                            else: 
-                                cleaned_marker_part = text_to_extract.lstrip(" *")
-                                if len(cleaned_marker_part) > 2 and cleaned_marker_part[0].isalnum() and cleaned_marker_part[1] in (")", "."):
-                                     pass 
-                                else: 
-                                     extracted_text = text_to_extract
-
-                            extracted_text = extracted_text.removeprefix("**").removesuffix("**").strip()
-                            extracted_text = extracted_text.removeprefix("*").removesuffix("*").strip()
-
-                            if extracted_text:
-                                # Try to parse skill check from the extracted_text
-                                # Format: "Action text (STAT DC##)" e.g., "Try to lift the rock (Strength DC15)"
-                                # Turkish stat names: Güç, Çeviklik, Dayanıklılık, Zeka, Bilgelik, Karizma
-                                # English stat names for mapping: strength, dexterity, constitution, intelligence, wisdom, charisma
-                                # Regex updated to allow an optional period at the end: \.?$
-                                print(f"Attempting to parse skill check from: '{extracted_text}'") # DEBUG
-                                skill_check_match = re.search(r"\((strength|dexterity|constitution|intelligence|wisdom|charisma|güç|çeviklik|dayanıklılık|zeka|bilgelik|karizma)\s+DC(\d+)\)\.?$", extracted_text, re.IGNORECASE)
-                                choice_item = {"id": chr(65 + i), "text": extracted_text}
-                                if skill_check_match:
-                                    print(f"Skill check PARSED for choice '{extracted_text}'") # DEBUG
-                                    stat_name_raw = skill_check_match.group(1).lower()
-                                    dc_value = int(skill_check_match.group(2))
-                                    
-                                    # Map Turkish stat names to English if necessary for consistency
-                                    stat_map = {
-                                        "güç": "strength", "çeviklik": "dexterity", "dayanıklılık": "constitution",
-                                        "zeka": "intelligence", "bilgelik": "wisdom", "karizma": "charisma"
-                                    }
-                                    stat_name_english = stat_map.get(stat_name_raw, stat_name_raw) # Default to raw if already English
-
-                                    choice_item["skill_check_stat"] = stat_name_english
-                                    choice_item["skill_check_dc"] = dc_value
-                                    # Clean the skill check part from the display text (allow optional period)
-                                    choice_item["text"] = re.sub(r"\s*\((strength|dexterity|constitution|intelligence|wisdom|charisma|güç|çeviklik|dayanıklılık|zeka|bilgelik|karizma)\s+DC\d+\)\.?$", "", extracted_text, flags=re.IGNORECASE).strip()
-                                else: # DEBUG
-                                    print(f"NO skill check parsed for choice '{extracted_text}'") # DEBUG
-                                
-                                parsed_choices_list.append(choice_item)
-                        
-                        final_story_output = " ".join(story_part_lines)
-                        if not final_story_output and not parsed_choices_list and ai_content: 
-                            final_story_output = ai_content.strip() 
-
-                        return {
-                            "text": final_story_output if final_story_output else "AI bir hikaye oluşturamadı.",
-                            "choices": parsed_choices_list,
-                            "raw_ai_response": ai_content 
-                        }
-                print(f"Model {model_name} geçerli bir cevap vermedi veya 'choices' boş: {response_json}")
-
-            except httpx.HTTPStatusError as e:
-                print(f"Model {model_name} ile HTTP hatası: {e.response.status_code} - {e.response.text}")
-            except httpx.RequestError as e:
-                print(f"Model {model_name} ile bağlantı hatası: {e}")
+async def _request_model(model_name: str, prompt_text: str, player_context: Optional[dict]) -> Optional[dict]:
+    """
+    Sends one chat completion request to a single model.
+    Returns the parsed response dict, or None if the model failed or returned nothing usable.
+    In structured mode the model is asked for schema-conforming JSON first; the text format
+    (and parser) is used only for models that reject or ignore the schema.
+    """
+    if AI_STRUCTURED_OUTPUT and _schema_supported(model_name):
+        with metrics.span("prompt"):
+            messages = build_messages(prompt_text, player_context, structured=True)
+        try:
+            ai_content = await _request_completion(model_name, messages, response_format=NARRATION_RESPONSE_FORMAT)
+        except SchemaNotSupportedError:
+            logger.info("Model %s yapılandırılmış çıktı isteğini reddetti, metin formatıyla tekrar deneniyor.", model_name)
+            _record_schema_failure(model_name)
+        else:
+            if not ai_content:
+                return None
+            with metrics.span("parse"):
+                result = parse_structured_narration(ai_content)
+            if result is not None:
+                _http_stats["structured_responses"] += 1
+                _schema_failures.pop(model_name, None)
+                return result
+            logger.info("Model %s şemaya uymayan bir cevap verdi, metin olarak ayrıştırılıyor.", model_name)
+            _record_schema_failure(model_name)
+            # The model ignored the schema; its answer may still be usable in the text format
+            result = _parse_text_response(model_name, ai_content)
+            if result["choices"]:
+                return result
+
+    with metrics.span("prompt"):
+        messages = build_messages(prompt_text, player_context)
+    ai_content = await _request_completion(model_name, messages)
+    return _parse_text_response(model_name, ai_content) if ai_content else None
+
+def _parse_text_response(model_name: str, ai_content: str) -> dict:
+    """Parses a text-format answer; an answer without any choices counts as a parse failure."""
+    with metrics.span("parse"):
+        result = parse_narration(ai_content)
+    if not result["choices"]:
+        metrics.AI_PARSE_FAILURES.inc(model_name)
+    return result
+
+def _schema_supported(model_name: str) -> bool:
+    """False while the model is marked as not supporting structured output; the mark expires."""
+    unsupported_until = _schema_unsupported_models.get(model_name)
+    if unsupported_until is None:
+        return True
+    if time.monotonic() >= unsupported_until:
+        del _schema_unsupported_models[model_name]
+        return True
+    return False
+
+def _record_schema_failure(model_name: str) -> None:
+    """Counts a rejected or ignored schema; after AI_SCHEMA_FAILURE_THRESHOLD in a row the model is asked for text for a while."""
+    _http_stats["schema_fallbacks"] += 1
+    failures = _schema_failures.get(model_name, 0) + 1
+    if failures >= AI_SCHEMA_FAILURE_THRESHOLD:
+        logger.info("Model %s için yapılandırılmış çıktı %.0f sn boyunca kapatıldı.", model_name, AI_SCHEMA_UNSUPPORTED_TTL)
+        _schema_unsupported_models[model_name] = time.monotonic() + AI_SCHEMA_UNSUPPORTED_TTL
+        failures = 0
+    _schema_failures[model_name] = failures
+
+async def _request_completion(model_name: str, messages: List[Dict[str, str]],
+                              response_format: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    Sends one chat completion request to a single model and returns the raw message content (or None).
+    With `response_format`, only providers that support it are used; a rejection raises SchemaNotSupportedError.
+    """
+    client = get_http_client()
+    logger.debug("AI modeli deneniyor: %s", model_name, extra={"sampled": True})
+    data = {
+        "model": model_name,
+        "messages": messages,
+    }
+    if response_format is not None:
+        data["response_format"] = response_format
+        data["provider"] = {"require_parameters": True} # Do not route to providers that would ignore it
+    started_at: Optional[float] = None # Set once a scheduler slot is held and the request is sent
+    outcome = "error"
+    try:
+        async with ai_scheduler.slot(model_name):
+            started_at = time.perf_counter()
+            _http_stats["requests"] += 1
+            response = await client.post(
+                OPENROUTER_API_URL,
+                headers=_build_headers(),
+                json=data,
+                extensions={"trace": _trace_connection_events}
+            )
+        response.raise_for_status()
+
+        response_json = response.json()
+
+        if response_json.get("choices") and len(response_json["choices"]) > 0:
+            ai_content = response_json["choices"][0].get("message", {}).get("content")
+            if ai_content:
+                outcome = "ok"
+                _record_model_latency(model_name, time.perf_counter() - started_at)
+                logger.info("Başarılı cevap alındı: %s", model_name,
+                            extra={"model": model_name, "latency_ms": round((time.perf_counter() - started_at) * 1000)})
+                return ai_content
+        outcome = "empty"
+        logger.warning("Model %s geçerli bir cevap vermedi veya 'choices' boş.", model_name)
+        logger.debug("Boş cevabın içeriği: %.500s", response_json)
+
+    except httpx.HTTPStatusError as e:
+        outcome = f"http_{e.response.status_code}"
+        # The error body can be long; only its beginning is logged
+        logger.warning("Model %s ile HTTP hatası: %s - %.300s", model_name, e.response.status_code, e.response.text)
+        if e.response.status_code == 429:
+            ai_scheduler.penalize(model_name, e.response.headers)
+        if response_format is not None and e.response.status_code in _SCHEMA_REJECTED_STATUS_CODES:
+            raise SchemaNotSupportedError(model_name) from e
+    except httpx.RequestError as e:
+        outcome = "connection_error"
+        logger.warning("Model %s ile bağlantı hatası: %r", model_name, e)
+    except ModelUnavailableError as e:
+        # Rate limited or cooling down after a 429; the caller falls back to the next model
+        logger.info("%s, sonraki modele geçiliyor.", e)
+    except asyncio.CancelledError:
+        outcome = "cancelled" # Lost a hedged race
+        raise
+    finally:
+        if started_at is not None:
+            metrics.AI_MODEL_SECONDS.observe(time.perf_counter() - started_at, model_name, outcome)
+    return None
+
+async def summarize_story(previous_summary: str, new_turns_text: str, world_id: Optional[str] = None) -> Optional[str]:
+    """
+    Folds new story turns into an existing rolling summary with a single model call.
+    Only the first model in MODEL_PREFERENCE is tried; returns None on failure so the
+    caller can fall back to an extractive summary.
+    """
+    if not OPENROUTER_API_KEY or OPENROUTER_API_KEY == "YOUR_OPENROUTER_API_KEY_HERE":
+        return None
+    messages = build_summary_messages(previous_summary, new_turns_text, world_id)
+    # Summaries can wait for a later turn; they only run when the scheduler has a free slot
+    with ai_scheduler.background():
+        summary = await _request_completion(MODEL_PREFERENCE[0], messages)
+    return summary.strip() if summary else None
+
+async def _get_ai_response_sequential(prompt_text: str, player_context: Optional[dict]) -> Optional[dict]:
+    """Tries each model in MODEL_PREFERENCE strictly one after another."""
+    for depth, model_name in enumerate(MODEL_PREFERENCE):
+        result = await _request_model(model_name, prompt_text, player_context)
+        if result is not None:
+            metrics.AI_FALLBACK_DEPTH.observe(depth)
+            return result
+    return None
+
+async def _get_ai_response_hedged(prompt_text: str, player_context: Optional[dict]) -> Optional[dict]:
+    """
+    Hedged fallback across MODEL_PREFERENCE.
+    Starts the primary model; if it has not answered within its hedge delay
+    (p95 of its recent latencies), the next model is fired in parallel. A model
+    that fails outright is replaced by the next one immediately. The first valid
+    parsed response wins and all other in-flight requests are cancelled.
+    """
+    remaining_models = list(MODEL_PREFERENCE)
+    pending: Dict[asyncio.Task, str] = {}
+
+    def launch_next() -> Optional[str]:
+        if not remaining_models:
+            return None
+        model_name = remaining_models.pop(0)
+        task = asyncio.create_task(_request_model(model_name, prompt_text, player_context))
+        pending[task] = model_name
+        return model_name
+
+    last_launched = launch_next()
+    try:
+        while pending:
+            # Only hedge while we are below the parallelism cap and have models left
+            can_hedge = remaining_models and len(pending) < AI_HEDGE_MAX_PARALLEL
+            timeout = get_hedge_delay(last_launched) if can_hedge else None
+            done, _ = await asyncio.wait(pending.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                # Hedge delay elapsed without an answer: fire the next model in parallel
+                logger.info("Model %s %.1fs içinde cevap vermedi, paralel yedek model başlatılıyor.", last_launched, timeout)
+                last_launched = launch_next() or last_launched
+                continue
+
+            for task in done:
+                model_name = pending.pop(task, None)
+                try:
+                    result = task.result()
+                except AIOverloadedError:
+                    raise
+                except Exception as e:
+                    logger.exception("Model %s beklenmeyen hata: %s", model_name, e)
+                    result = None
+                if result is not None:
+                    metrics.AI_FALLBACK_DEPTH.observe(MODEL_PREFERENCE.index(model_name))
+                    return result
+            # Every finished request failed; fall back to the next model right away
+            if len(pending) < AI_HEDGE_MAX_PARALLEL:
+                last_launched = launch_next() or last_launched
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+# --- Hedge Delay Tracking ---
+# Rolling window of successful response latencies per model, used to derive the hedge delay.
+_model_latencies: Dict[str, Deque[float]] = {}
+
+def _record_model_latency(model_name: str, seconds: float) -> None:
+    window = _model_latencies.get(model_name)
+    if window is None:
+        window = _model_latencies[model_name] = deque(maxlen=AI_HEDGE_LATENCY_WINDOW)
+    window.append(seconds)
+
+def get_hedge_delay(model_name: Optional[str]) -> float:
+    """
+    Seconds to wait on a model before hedging to the next one: the configured
+    percentile (p95 by default) of its recent latencies, clamped to [min, max].
+    Uses AI_HEDGE_DELAY_DEFAULT until enough samples have been collected.
+    """
+    window = _model_latencies.get(model_name) if model_name else None
+    if not window or len(window) < AI_HEDGE_MIN_SAMPLES:
+        delay = AI_HEDGE_DELAY_DEFAULT
+    else:
+        ordered = sorted(window)
+        index = min(int(len(ordered) * AI_HEDGE_PERCENTILE), len(ordered) - 1)
+        delay = ordered[index]
+    return min(max(delay, AI_HEDGE_DELAY_MIN), AI_HEDGE_DELAY_MAX)
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import os
+import asyncio
+import logging
+from typing import Optional, Dict, Any, List, Tuple
+
+from ..db import crud
+from ..db.database import SessionLocal, run_db
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# The model sees: a rolling summary of older turns + the most recent turns verbatim + the current situation.
+# Older turns are folded into the summary in the background every CONTEXT_SUMMARY_EVERY events,
+# so the prompt stays roughly the same size no matter how long the session runs.
+CONTEXT_RECENT_TURNS = int(os.getenv("CONTEXT_RECENT_TURNS", "4")) # Events always kept verbatim
+CONTEXT_SUMMARY_EVERY = int(os.getenv("CONTEXT_SUMMARY_EVERY", "5")) # Fold older events once this many accumulate
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500")) # Approx. tokens for the per-turn message
+CONTEXT_SUMMARY_MODE = os.getenv("CONTEXT_SUMMARY_MODE", "ai").lower() # "ai" or "extractive"
+CONTEXT_SUMMARY_MAX_CHARS = int(os.getenv("CONTEXT_SUMMARY_MAX_CHARS", "1200"))
+CONTEXT_EVENT_MAX_CHARS = int(os.getenv("CONTEXT_EVENT_MAX_CHARS", "600")) # Per verbatim event
+
+# Events a session needs in memory: the verbatim ones plus those waiting to be summarized
+HISTORY_WINDOW = CONTEXT_RECENT_TURNS + CONTEXT_SUMMARY_EVERY
+
+# Running summary refreshes, one per session at most
+_summary_tasks: Dict[str, asyncio.Task] = {}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token); good enough for budgeting."""
+    return (len(text) + 3) // 4
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= max_chars else text[:max_chars - 1].rstrip() + "…"
+
+
+def describe_event(event: Dict[str, Any]) -> str:
+    """One-line, prompt-friendly description of a history event."""
+    event_type = event.get("event_type")
+    if event_type == "game_start":
+        return f"Başlangıç: {_clip(event.get('text', ''), CONTEXT_EVENT_MAX_CHARS)}"
+    if event_type == "skill_check_attempt":
+        return (f"Yetenek kontrolü: '{_clip(event.get('choice_made', ''), 120)}' "
+                f"({event.get('stat_checked')} DC{event.get('dc')}) -> {event.get('outcome')}")
+    if event_type == "ai_response":
+        return (f"Oyuncu: {_clip(event.get('choice_made', ''), 200)} | "
+                f"Anlatıcı: {_clip(event.get('new_situation_text', ''), CONTEXT_EVENT_MAX_CHARS)}")
+    return ""
+
+
+def build_history_context(session, reserved_text: str = "") -> Dict[str, str]:
+    """
+    Returns {"story_summary", "recent_turns"} for the AI context, within CONTEXT_TOKEN_BUDGET.
+    `reserved_text` is the rest of the per-turn message (situation, action) that must fit as well.
+    Over budget, the oldest verbatim turns are dropped first, then the summary is shortened.
+    """
+    budget = max(CONTEXT_TOKEN_BUDGET - estimate_tokens(reserved_text), 0)
+
+    # Everything not yet folded into the summary, except the latest event: it is the
+    # current situation and already part of the message.
+    unsummarized = [event for seq, event in session.recent_events if seq > session.summary_seq]
+    if unsummarized and unsummarized[-1] is session.last_event:
+        unsummarized = unsummarized[:-1]
+    lines = [line for line in (describe_event(event) for event in unsummarized) if line]
+
+    summary = session.summary or ""
+    while lines and estimate_tokens(summary) + estimate_tokens("\n".join(lines)) > budget:
+        lines.pop(0)
+    if estimate_tokens(summary) > budget:
+        summary = _clip(summary, budget * 4) if budget else ""
+
+    return {"story_summary": summary, "recent_turns": "\n".join(lines)}
+
+
+def maybe_schedule_summary(session) -> None:
+    """
+    Starts a background summary refresh once CONTEXT_SUMMARY_EVERY events have fallen out of
+    the verbatim window. Never blocks the turn; at most one refresh runs per session.
+    """
+    upto_seq = session.last_seq - CONTEXT_RECENT_TURNS
+    if upto_seq - session.summary_seq < CONTEXT_SUMMARY_EVERY or session.session_id in _summary_tasks:
+        return
+    session_id = session.session_id
+    task = asyncio.create_task(_refresh_summary(session, upto_seq))
+    _summary_tasks[session_id] = task
+    task.add_done_callback(lambda _t: _summary_tasks.pop(session_id, None))
+
+
+async def wait_for_summaries(timeout: float) -> None:
+    """Gives running summary refreshes up to `timeout` seconds to finish (app shutdown)."""
+    if _summary_tasks:
+        await asyncio.wait(list(_summary_tasks.values()), timeout=timeout)
+
+
+async def _refresh_summary(session, upto_seq: int) -> None:
+    """Folds events (summary_seq, upto_seq] into the rolling summary and persists it."""
+    try:
+        events = [(seq, event) for seq, event in session.recent_events if session.summary_seq < seq <= upto_seq]
+        if not events or events[0][0] != session.summary_seq + 1:
+            # Part of the range is no longer in memory (e.g. the session was reloaded); read it back
+            events = await run_db(_load_events, session.session_id, session.summary_seq, upto_seq)
+        if not events:
+            return
+
+        new_summary = None
+        if CONTEXT_SUMMARY_MODE == "ai":
+            from .ai_service import summarize_story # Imported lazily: ai_service is heavier and optional here
+            new_turns_text = "\n".join(describe_event(event) for _, event in events)
+            new_summary = await summarize_story(session.summary, new_turns_text, session.world_id)
+        if not new_summary:
+            new_summary = _extractive_summary(session.summary, [event for _, event in events])
+        new_summary = _clip(new_summary, CONTEXT_SUMMARY_MAX_CHARS)
+
+        await run_db(_save_summary, session.session_id, new_summary, upto_seq)
+        session.summary, session.summary_seq = new_summary, upto_seq
+    except Exception as e:
+        logger.warning("Özet güncellenemedi (session %s): %r", session.session_id, e)
+
+
+def _extractive_summary(previous_summary: str, events: List[Dict[str, Any]]) -> str:
+    """Fallback without a model call: keeps the first sentence of each narration, newest last."""
+    pieces = [previous_summary] if previous_summary else []
+    for event in events:
+        text = event.get("new_situation_text") or event.get("text") or ""
+        first_sentence = text.split(". ")[0].strip()
+        if event.get("choice_made"):
+            pieces.append(f"{_clip(event['choice_made'], 80)}: {_clip(first_sentence, 160)}")
+        elif first_sentence:
+            pieces.append(_clip(first_sentence, 160))
+    summary = " ".join(pieces)
+    # Keep the newest part if it grew too long
+    return summary[-CONTEXT_SUMMARY_MAX_CHARS:]
+
+
+def _load_events(session_id: str, after_seq: int, upto_seq: int) -> List[Tuple[int, Dict[str, Any]]]:
+    db = SessionLocal()
+    try:
+        return crud.get_turn_events_with_seq(db, session_id, after_seq=after_seq, upto_seq=upto_seq)
+    finally:
+        db.close()
+
+
+def _save_summary(session_id: str, summary: str, covered_seq: int) -> None:
+    db = SessionLocal()
+    try:
+        crud.upsert_session_summary(db, session_id, summary, covered_seq)
+    finally:
+        db.close()
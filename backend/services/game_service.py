@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 import copy
-import random # Added for dice rolling
-from typing import Dict, Any, Optional, List # Added List
+import logging
+from typing import Dict, Any, Optional, List, AsyncIterator # Added List
 from sqlalchemy.orm import Session
 import uuid # Added for session_id generation in initialize_game
 
@@ -13,9 +13,17 @@ from ..data.worlds import get_world_name
 # Import request models (Fixed PlayerChoice -> MakeChoicePayload)
 from ..models.game_models import StartGamePayload, MakeChoicePayload, MakeChoiceResponse 
 from ..db import crud, models # Import db models and crud functions
-from .ai_service import get_ai_response # Import AI service
+from .ai_service import get_ai_response, stream_ai_response # Import AI service
+from .session_cache import session_cache, CachedSession
+from . import context_builder, skill_odds
+from ..core import metrics
+from .speculation import speculation, SPECULATE_SKILL_CHECKS
+from .turn_coordinator import turn_coordinator
+from ..core.logging_setup import bind_session
 
-def initialize_game(db: Session, payload: StartGamePayload) -> Dict[str, Any]:
+logger = logging.getLogger(__name__)
+
+async def initialize_game(db: Session, payload: StartGamePayload) -> Dict[str, Any]:
     """
     Initializes a new player state in the database based on world and class selection.
     Returns the initial game state data (text, choices, session_id, player_info_for_card).
@@ -40,7 +48,7 @@ def initialize_game(db: Session, payload: StartGamePayload) -> Dict[str, Any]:
             initial_state_dict["skills"] = stats_to_update.pop("skills", []) 
             initial_state_dict["stats"].update(stats_to_update) 
         else:
-            print(f"Uyarı: Seçilen sınıf/fraksiyon '{payload.selected_class_or_faction}' dünya '{selected_world_id}' için bulunamadı.")
+            logger.warning("Seçilen sınıf/fraksiyon '%s' dünya '%s' için bulunamadı.", payload.selected_class_or_faction, selected_world_id)
             initial_state_dict["class"] = f"Bilinmeyen ({payload.selected_class_or_faction})"
 
     # Determine the starting scenario
@@ -64,15 +72,17 @@ def initialize_game(db: Session, payload: StartGamePayload) -> Dict[str, Any]:
     # Create the player state in the database
     try:
         # Pass the prepared dictionary directly to crud function
-        db_player_state = crud.create_player_state(db=db, initial_data=initial_state_dict)
-    except Exception as e:
-        print(f"Error creating player state in DB: {e}")
+        db_player_state = await crud.create_player_state_async(db=db, initial_data=initial_state_dict)
+        session_cache.put_created(db_player_state, initial_state_dict["history"])
+        bind_session(db_player_state.session_id)
+    except Exception:
+        logger.exception("Error creating player state in DB")
         return {"error": "Oyuncu durumu veritabanında oluşturulamadı."}
 
     # Return initial text, choices, session_id, and info for card
     return {
         "text": start_text, 
-        "choices": start_choices, 
+        "choices": skill_odds.annotate_choices(start_choices, db_player_state.stats), 
         "session_id": db_player_state.session_id,
         "player_info_for_card": {
              "name": db_player_state.player_name,
@@ -83,37 +93,70 @@ def initialize_game(db: Session, payload: StartGamePayload) -> Dict[str, Any]:
     }
 
 
-async def process_player_action(db: Session, session_id: str, choice_id: str, choice_text: str) -> MakeChoiceResponse:
+def _situation_text(last_event: Optional[Dict[str, Any]]) -> str:
+    """The situation text the player saw before acting, taken from the latest history event."""
+    current_scenario_text = "Önceki durum bilinmiyor." # Default
+    if isinstance(last_event, dict): # Check if last_event is a dictionary
+        if last_event.get("event_type") == "game_start":
+            current_scenario_text = last_event.get("text", current_scenario_text)
+        elif last_event.get("event_type") == "ai_response":
+            current_scenario_text = last_event.get("new_situation_text", current_scenario_text)
+        elif last_event.get("event_type") == "skill_check_attempt": # If last event was a skill check
+            current_scenario_text = last_event.get("original_situation_text", current_scenario_text)
+    return current_scenario_text
+
+
+def _base_ai_context(session: CachedSession, current_scenario_text: str) -> Dict[str, Any]:
+    return {
+        "world_id": session.world_id,
+        "world_name_display": session.world_name_display,
+        "class": session.class_name,
+        "stats": session.stats, # Assuming stats is already a dict
+        "health": session.health,
+        "current_scenario_text": current_scenario_text
+        # "last_choice_text" will be part of ai_input_text or handled by skill check outcome
+    }
+
+
+def _build_ai_input_text(ai_context: Dict[str, Any], choice_id: str, choice_text: str,
+                         skill_check: Optional[SkillCheckResultModel] = None, outcome: Optional[str] = None) -> str:
     """
-    Processes player's action, calls AI, updates state in DB.
-    Returns the next game state data (text, choices, player_info_for_card, skill_check_result).
+    Builds the action description for the AI and tags ai_context with the action kind.
+    `skill_check` is a rolled check; `outcome` alone describes a not yet rolled one (speculation).
+    """
+    ai_context["last_choice_text"] = choice_text # This is the text of the button clicked or user input
+    if skill_check is not None:
+        ai_context["action_kind"] = "skill_check"
+        return f"Oyuncu '{choice_text}' yetenek kontrolünü denedi ve sonuç: {skill_check.outcome} (Zar: {skill_check.roll}, Bonus: {skill_check.modifier}, Toplam: {skill_check.total_roll} vs DC: {skill_check.dc}). Bu sonuca göre hikayeyi devam ettir."
+    if outcome is not None:
+        ai_context["action_kind"] = "skill_check"
+        return f"Oyuncu '{choice_text}' yetenek kontrolünü denedi ve sonuç: {outcome}. Bu sonuca göre hikayeyi devam ettir."
+    if choice_id == "USER_ACTION":
+        ai_context["action_kind"] = "custom"
+        return f"Oyuncu şu özel eylemi yapmayı deniyor: \"{choice_text}\". Bu eylemin sonucunu, karakterin yeteneklerini ve mevcut durumu göz önünde bulundurarak gerçekçi bir şekilde anlat. Eylem başarılı olabilir, kısmen başarılı olabilir veya tamamen başarısız olabilir."
+    # Regular choice, not a skill check
+    ai_context["action_kind"] = "choice"
+    return f"Oyuncu '{choice_text}' seçeneğini seçti."
+
+
+async def _prepare_turn(db: Session, session_id: str, choice_id: str, choice_text: str) -> Dict[str, Any]:
+    """
+    Everything that happens before the AI call: loads the session, resolves and rolls a
+    skill check if the chosen option has one, and builds the AI prompt and context.
+    Returns a turn dict used by the AI call and _record_ai_response, or {"error": ...}.
     """
-    db_player_state = crud.get_player_state(db=db, session_id=session_id)
+    bind_session(session_id)
+    # Hot sessions are served from the in-process cache; a miss loads the state and only the latest history event
+    with metrics.span("session_load"):
+        db_player_state = await session_cache.get(db, session_id)
     if not db_player_state:
         return {"error": f"Geçersiz oturum ID'si: {session_id}"}
+    last_event = db_player_state.last_event
+    base_seq = db_player_state.last_seq # The event whose choices the player is answering
 
-    # Prepare context for AI using attributes from the ORM object
-    current_scenario_text = "Önceki durum bilinmiyor." # Default
-    if db_player_state.history and isinstance(db_player_state.history, list) and len(db_player_state.history) > 0:
-        last_event = db_player_state.history[-1]
-        if isinstance(last_event, dict): # Check if last_event is a dictionary
-            if last_event.get("event_type") == "game_start":
-                current_scenario_text = last_event.get("text", current_scenario_text)
-            elif last_event.get("event_type") == "ai_response":
-                current_scenario_text = last_event.get("new_situation_text", current_scenario_text)
-            elif last_event.get("event_type") == "skill_check_attempt": # If last event was a skill check
-                current_scenario_text = last_event.get("original_situation_text", current_scenario_text)
-
-
-    ai_context = {
-        "world_id": db_player_state.world_id,
-        "world_name_display": db_player_state.world_name_display,
-        "class": db_player_state.class_name,
-        "stats": db_player_state.stats, # Assuming stats is already a dict
-        "health": db_player_state.health,
-        "current_scenario_text": current_scenario_text
-        # "last_choice_text" will be part of ai_input_text or handled by skill check outcome
-    }
+    # Prepare context for AI using attributes from the cached session
+    current_scenario_text = _situation_text(last_event)
+    ai_context = _base_ai_context(db_player_state, current_scenario_text)
 
     ai_input_text = ""
     skill_check_outcome_for_ai = None
@@ -134,9 +177,10 @@ async def process_player_action(db: Session, session_id: str, choice_id: str, ch
     is_skill_check_choice = False
     skill_stat_to_check = None
     skill_dc_to_beat = None
+    skill_roll_mode = "normal"
+    skill_check_event = None
 
-    if choice_id != "USER_ACTION" and db_player_state.history:
-        last_event = db_player_state.history[-1]
+    if choice_id != "USER_ACTION" and last_event:
         if isinstance(last_event, dict) and last_event.get("event_type") == "ai_response":
             previous_choices_raw = last_event.get("ai_choices") # We need to ensure ai_choices are stored
             if previous_choices_raw and isinstance(previous_choices_raw, list):
@@ -146,6 +190,7 @@ async def process_player_action(db: Session, session_id: str, choice_id: str, ch
                             is_skill_check_choice = True
                             skill_stat_to_check = choice_obj_raw.get("skill_check_stat")
                             skill_dc_to_beat = choice_obj_raw.get("skill_check_dc")
+                            skill_roll_mode = skill_odds.roll_mode(choice_obj_raw.get("skill_check_mode"))
                             # choice_text here is the one from the payload, which is the user-clicked text
                             break
     
@@ -153,7 +198,8 @@ async def process_player_action(db: Session, session_id: str, choice_id: str, ch
         outcome, roll, modifier, total_roll = _perform_skill_check(
             player_stats=db_player_state.stats,
             stat_to_check=skill_stat_to_check,
-            dc=skill_dc_to_beat
+            dc=skill_dc_to_beat,
+            mode=skill_roll_mode
         )
         skill_check_outcome_for_ai = outcome # "KRİTİK BAŞARI", "BAŞARILI", "BAŞARISIZ", "KRİTİK BAŞARISIZ"
         skill_check_result_for_response = SkillCheckResultModel(
@@ -165,9 +211,9 @@ async def process_player_action(db: Session, session_id: str, choice_id: str, ch
             outcome=outcome
         )
         
-        # Update history for the skill check attempt itself
-        current_history = list(db_player_state.history) if isinstance(db_player_state.history, list) else []
-        current_history.append({
+        # The attempt is recorded together with the AI response (_record_ai_response): a turn
+        # that fails or is shed at the AI call leaves no roll without narration behind.
+        skill_check_event = {
             "event_type": "skill_check_attempt",
             "choice_made": choice_text, # The text of the skill check option
             "stat_checked": skill_stat_to_check,
@@ -177,112 +223,257 @@ async def process_player_action(db: Session, session_id: str, choice_id: str, ch
             "total_roll": total_roll,
             "outcome": outcome,
             "original_situation_text": current_scenario_text # Save the text before this check
-        })
-        crud.update_player_state(db=db, session_id=session_id, update_data={"history": current_history})
-        # Reload state to get the updated history for the AI context
-        db_player_state = crud.get_player_state(db=db, session_id=session_id)
+        }
 
         ai_context["skill_check_outcome"] = skill_check_outcome_for_ai
         # For AI, the "action" is now the outcome of the skill check
-        ai_input_text = f"Oyuncu '{choice_text}' yetenek kontrolünü denedi ve sonuç: {skill_check_outcome_for_ai} (Zar: {roll}, Bonus: {modifier}, Toplam: {total_roll} vs DC: {skill_dc_to_beat}). Bu sonuca göre hikayeyi devam ettir."
+        ai_input_text = _build_ai_input_text(ai_context, choice_id, choice_text, skill_check_result_for_response)
+    else:
+        ai_input_text = _build_ai_input_text(ai_context, choice_id, choice_text)
 
-    elif choice_id == "USER_ACTION":
-        ai_input_text = f"Oyuncu şu özel eylemi yapmayı deniyor: \"{choice_text}\". Bu eylemin sonucunu, karakterin yeteneklerini ve mevcut durumu göz önünde bulundurarak gerçekçi bir şekilde anlat. Eylem başarılı olabilir, kısmen başarılı olabilir veya tamamen başarısız olabilir."
-    else: # Regular choice, not a skill check
-        ai_input_text = f"Oyuncu '{choice_text}' seçeneğini seçti."
+    # Bounded story context: rolling summary + recent turns, within the token budget
+    with metrics.span("context"):
+        ai_context.update(context_builder.build_history_context(
+            db_player_state, reserved_text=current_scenario_text + ai_input_text
+        ))
 
-    ai_context["last_choice_text"] = choice_text # This is the text of the button clicked or user input
+    return {
+        "session_id": session_id,
+        "base_seq": base_seq,
+        "choice_id": choice_id,
+        "choice_text": choice_text,
+        "player_state": db_player_state,
+        "ai_input_text": ai_input_text,
+        "ai_context": ai_context,
+        "skill_check_outcome": skill_check_outcome_for_ai,
+        "skill_check_result": skill_check_result_for_response,
+        "skill_check_event": skill_check_event,
+    }
 
-    # Call AI service
-    ai_response = await get_ai_response(prompt_text=ai_input_text, player_context=ai_context)
 
-    # Prepare data for response and potential DB update
-    # response_data = {} # No longer used, directly return MakeChoiceResponse
-    update_data_for_db = {}
+async def process_player_action(db: Session, session_id: str, choice_id: str, choice_text: str,
+                                idempotency_key: Optional[str] = None) -> MakeChoiceResponse:
+    """
+    Processes player's action, calls AI, updates state in DB.
+    Returns the next game state data (text, choices, player_info_for_card, skill_check_result).
+    Turns of a session run one at a time; a repeated request (same idempotency_key, or the same
+    choice while the first is still in flight) gets the first request's response instead of a new AI call.
+    """
+    return await turn_coordinator.run(
+        session_id,
+        idempotency_key or turn_coordinator.implicit_key(choice_id, choice_text),
+        lambda: _process_player_action(db, session_id, choice_id, choice_text),
+        remember=idempotency_key is not None,
+        keep=_is_replayable,
+    )
+
+
+def _is_replayable(response) -> bool:
+    """Only successful turns are stored for replay; after an error a retry gets a fresh attempt."""
+    return isinstance(response, MakeChoiceResponse) and not any(choice.id == "IGNORE" for choice in response.choices)
+
+
+async def _process_player_action(db: Session, session_id: str, choice_id: str, choice_text: str) -> MakeChoiceResponse:
+    turn = await _prepare_turn(db, session_id, choice_id, choice_text)
+    if "error" in turn:
+        return turn
+
+    # Serve a speculative pre-generation of this choice if one exists, otherwise call the AI service
+    with metrics.span("ai"):
+        ai_response = await _claim_speculation(turn)
+        if ai_response is None:
+            ai_response = await get_ai_response(prompt_text=turn["ai_input_text"], player_context=turn["ai_context"])
 
     if ai_response.get("error"):
-        return MakeChoiceResponse(
-            text=f"Bir şeyler ters gitti: {ai_response['error']}. Devam etmek için bir seçenek belirle.",
-            choices=[ChoiceModel(id="IGNORE", text="Hatayı görmezden gel ve devam etmeyi um.")],
-            player_info_for_card={ # type: ignore
-                 "name": db_player_state.player_name,
-                 "class": db_player_state.class_name,
-                 "health": db_player_state.health,
-                 "stats": db_player_state.stats
-            },
-            skill_check_result=skill_check_result_for_response # Pass it even on AI error if check happened before
-        )
-    # If we reach here, there was no AI error.
-    # Prepare data for updating the player state in DB
-    current_history = list(db_player_state.history) if isinstance(db_player_state.history, list) else []
-    
+        return _build_turn_response(turn["player_state"], ai_response, turn["skill_check_result"])
+
+    with metrics.span("persist"):
+        recorded = await _record_ai_response(db, turn, ai_response)
+    if not recorded:
+        logger.error("Failed to update player state for session %s", session_id)
+        # Return AI response anyway; the turn just was not saved
+    else:
+        context_builder.maybe_schedule_summary(turn["player_state"])
+        _schedule_speculation(turn["player_state"], ai_response.get("choices", []))
+
+    # Return the new narrative and choices + card info
+    return _build_turn_response(turn["player_state"], ai_response, turn["skill_check_result"])
+
+
+async def stream_player_action(db: Session, session_id: str, choice_id: str, choice_text: str,
+                               idempotency_key: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of process_player_action.
+    Yields {"event": name, "data": payload} items:
+        skill_check - the SkillCheckResultModel, sent up front if the choice triggered a roll
+        token       - a piece of story text as the model generates it
+        result      - the final MakeChoiceResponse (parsed choices + skill check result)
+        error       - the turn could not be started (e.g. invalid session)
+    History is persisted after the result event has been sent.
+    Serialized and deduplicated like process_player_action; a duplicate request receives no
+    token events, only the first request's skill_check/result (or error).
+    """
+    key = idempotency_key or turn_coordinator.implicit_key(choice_id, choice_text)
+    is_duplicate, response = await turn_coordinator.join(session_id, key)
+    if is_duplicate:
+        if not isinstance(response, MakeChoiceResponse):
+            yield {"event": "error", "data": response}
+            return
+        if response.skill_check_result is not None:
+            yield {"event": "skill_check", "data": response.skill_check_result}
+        yield {"event": "result", "data": response}
+        return
+
+    entry = turn_coordinator.begin(session_id, key, remember=idempotency_key is not None)
+    response = None
+    try:
+        async with turn_coordinator.session_lock(session_id):
+            async for item in _stream_player_action(db, session_id, choice_id, choice_text):
+                if item["event"] in ("result", "error"):
+                    response = item["data"]
+                yield item
+    except BaseException as e:
+        turn_coordinator.fail(session_id, key, entry, e)
+        raise
+    turn_coordinator.complete(session_id, key, entry, response, _is_replayable(response))
+
+
+async def _stream_player_action(db: Session, session_id: str, choice_id: str, choice_text: str) -> AsyncIterator[Dict[str, Any]]:
+    turn = await _prepare_turn(db, session_id, choice_id, choice_text)
+    if "error" in turn:
+        yield {"event": "error", "data": {"error": turn["error"]}}
+        return
+
+    if turn["skill_check_result"] is not None:
+        yield {"event": "skill_check", "data": turn["skill_check_result"]}
+
+    ai_response: Dict[str, Any] = {"error": "AI cevabı alınamadı."}
+    speculative_response = await _claim_speculation(turn)
+    if speculative_response is not None:
+        ai_response = speculative_response
+        yield {"event": "token", "data": {"text": ai_response.get("text", "")}}
+    else:
+        async for ai_event in stream_ai_response(prompt_text=turn["ai_input_text"], player_context=turn["ai_context"]):
+            if ai_event["type"] == "token":
+                yield {"event": "token", "data": {"text": ai_event["text"]}}
+            elif ai_event["type"] == "done":
+                ai_response = ai_event["result"]
+            elif ai_event["type"] == "error":
+                ai_response = {"error": ai_event["error"]}
+
+    yield {"event": "result", "data": _build_turn_response(turn["player_state"], ai_response, turn["skill_check_result"])}
+
+    if not ai_response.get("error"):
+        if not await _record_ai_response(db, turn, ai_response):
+            logger.error("Failed to update player state for session %s", session_id)
+        else:
+            context_builder.maybe_schedule_summary(turn["player_state"])
+            _schedule_speculation(turn["player_state"], ai_response.get("choices", []))
+
+
+# Skill check outcome bands a speculative generation is prepared for
+SKILL_CHECK_OUTCOMES = ["BAŞARILI", "BAŞARISIZ", "KRİTİK BAŞARI", "KRİTİK BAŞARISIZ"]
+
+def _schedule_speculation(session: CachedSession, choices: List[Dict[str, Any]]) -> None:
+    """Queues speculative generations for the choices just presented (regular choices first)."""
+    if not speculation.enabled or not choices:
+        return
+    current_scenario_text = _situation_text(session.last_event)
+    regular_jobs, skill_check_jobs = [], []
+    for choice in choices:
+        is_skill_check = choice.get("skill_check_stat") and choice.get("skill_check_dc") is not None
+        outcomes = SKILL_CHECK_OUTCOMES if is_skill_check else [None]
+        if is_skill_check and not SPECULATE_SKILL_CHECKS:
+            continue
+        for outcome in outcomes:
+            ai_context = _base_ai_context(session, current_scenario_text)
+            if outcome is not None:
+                ai_context["skill_check_outcome"] = outcome
+            ai_input_text = _build_ai_input_text(ai_context, choice["id"], choice["text"], outcome=outcome)
+            ai_context.update(context_builder.build_history_context(session, reserved_text=current_scenario_text + ai_input_text))
+            job = {"choice_id": choice["id"], "outcome": outcome, "choice_text": choice["text"],
+                   "ai_input_text": ai_input_text, "ai_context": ai_context}
+            (skill_check_jobs if is_skill_check else regular_jobs).append(job)
+    speculation.schedule(session.session_id, session.last_seq, regular_jobs + skill_check_jobs)
+
+
+async def _claim_speculation(turn: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not speculation.enabled:
+        return None
+    if turn["choice_id"] == "USER_ACTION":
+        speculation.discard(turn["session_id"])
+        return None
+    return await speculation.claim(turn["session_id"], turn["base_seq"], turn["choice_id"],
+                                   turn["choice_text"], turn["skill_check_outcome"])
+
+
+async def _record_ai_response(db: Session, turn: Dict[str, Any], ai_response: Dict[str, Any]) -> bool:
+    """
+    Appends the turn's events to the session history: the skill_check_attempt (if the choice
+    rolled one), then the ai_response. Returns False if they could not be saved.
+    """
     # Store the AI's choices along with the response text for future skill check lookups
-    ai_choices_from_response = ai_response.get("choices", [])
-    
-    current_history.append({
+    event = {
         "event_type": "ai_response",
-        "choice_made": choice_text, # The original choice/action text
-        "skill_check_outcome_given_to_ai": skill_check_outcome_for_ai, # Null if not a skill check response
+        "choice_made": turn["choice_text"], # The original choice/action text
+        "skill_check_outcome_given_to_ai": turn["skill_check_outcome"], # Null if not a skill check response
         "ai_raw_text": ai_response.get("raw_ai_response"),
         "new_situation_text": ai_response.get("text"),
-        "ai_choices": ai_choices_from_response # Store the choices for the next turn
-    })
-    
-    update_data_for_db = {
-        "history": current_history
-        # TODO: Parse AI response for potential updates to health, location, inventory, stats etc.
-        # For example, if AI says "you take 10 damage", we need to parse that.
-        # health = db_player_state.health - 10 # Example
-        # update_data_for_db["health"] = health
+        "ai_choices": ai_response.get("choices", []) # Store the choices for the next turn
     }
+    # TODO: Parse AI response for potential updates to health, location, inventory, stats etc.
+    # For example, if AI says "you take 10 damage", we need to parse that and call
+    # crud.update_player_state_async(..., update_data={"health": ...}).
+    try:
+        if turn.get("skill_check_event") is not None:
+            if not await session_cache.append_event(db, turn["player_state"], turn["skill_check_event"]):
+                return False
+        return await session_cache.append_event(db, turn["player_state"], event)
+    except Exception:
+        logger.exception("Error appending turn event for session %s", turn["session_id"])
+        return False
 
-    # Update the player state in the database
-    updated_db_state = crud.update_player_state(db=db, session_id=session_id, update_data=update_data_for_db)
 
-    if not updated_db_state:
-        print(f"Error: Failed to update player state for session {session_id}")
-        # Return AI response but indicate potential save failure?
+def _build_turn_response(player_state: CachedSession, ai_response: Dict[str, Any],
+                         skill_check_result: Optional[SkillCheckResultModel]) -> MakeChoiceResponse:
+    """Builds the MakeChoiceResponse for a turn (or the recoverable error response if the AI failed)."""
+    player_info_for_card = { # type: ignore
+        "name": player_state.player_name,
+        "class": player_state.class_name,
+        "health": player_state.health,
+        "stats": player_state.stats
+    }
+    if ai_response.get("error"):
         return MakeChoiceResponse(
-            text=ai_response.get("text", "Bir hata oluştu (kayıt edilemedi)."),
-            choices=[ChoiceModel(**choice) for choice in ai_response.get("choices", [])], # type: ignore
-            player_info_for_card={ # type: ignore
-                    "name": db_player_state.player_name,
-                    "class": db_player_state.class_name,
-                    "health": update_data_for_db.get("health", db_player_state.health),
-                    "stats": updated_db_state.stats if updated_db_state else db_player_state.stats
-            },
-            skill_check_result=skill_check_result_for_response
+            text=f"Bir şeyler ters gitti: {ai_response['error']}. Devam etmek için bir seçenek belirle.",
+            choices=[ChoiceModel(id="IGNORE", text="Hatayı görmezden gel ve devam etmeyi um.")],
+            player_info_for_card=player_info_for_card,
+            skill_check_result=skill_check_result # Pass it even on AI error if check happened before
         )
-    
-    # Return the new narrative and choices + updated card info
     return MakeChoiceResponse(
-        text=ai_response.get("text"),
-        choices=[ChoiceModel(**choice) for choice in ai_choices_from_response], # type: ignore
-        player_info_for_card={ # type: ignore
-                "name": updated_db_state.player_name,
-                "class": updated_db_state.class_name,
-                "health": updated_db_state.health,
-                "stats": updated_db_state.stats
-        },
-        skill_check_result=skill_check_result_for_response
+        text=ai_response.get("text", "Bir hata oluştu."),
+        choices=[ChoiceModel(**choice) for choice in skill_odds.annotate_choices(ai_response.get("choices", []), player_state.stats)], # type: ignore
+        player_info_for_card=player_info_for_card,
+        skill_check_result=skill_check_result
     )
 
 # --- Helper function for Skill Checks ---
-def _perform_skill_check(player_stats: Dict[str, int], stat_to_check: str, dc: int) -> (str, int, int, int):
+def _perform_skill_check(player_stats: Dict[str, int], stat_to_check: str, dc: int, mode: str = "normal") -> (str, int, int, int):
     """
     Performs a d20 skill check based on Baldur's Gate / D&D 5e rules.
     Args:
         player_stats: Dictionary of player's statistics (e.g., {"strength": 12, "dexterity": 15}).
         stat_to_check: The stat being checked (e.g., "strength").
         dc: The difficulty class of the check.
+        mode: "normal", "advantage" or "disadvantage" (the choice's skill_check_mode, see skill_odds.roll_mode).
     Returns:
         A tuple: (outcome_string, roll, modifier, total_roll)
         Outcome string can be "KRİTİK BAŞARI", "BAŞARILI", "BAŞARISIZ", "KRİTİK BAŞARISIZ".
     """
-    stat_value = player_stats.get(stat_to_check.lower(), 10) # Default to 10 if stat not found
-    modifier = (stat_value - 10) // 2 # Standard D&D 5e modifier calculation
-
-    roll = random.randint(1, 20)
+    stat_value = player_stats.get(stat_to_check.lower(), skill_odds.DEFAULT_STAT) # Default to 10 if stat not found
+    modifier = skill_odds.ability_modifier(stat_value) # Standard D&D 5e modifier calculation
+    # Odds shown with the choice come from the same rules (skill_odds tables)
+    roll = skill_odds.roll_d20(mode)
     total_roll = roll + modifier
 
     outcome = ""
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Parser for the narrator's output: story text followed by lettered/numbered choices,
+some of which carry a skill check, e.g. 'C) Kapıyı kırmaya çalış (Güç DC15)'.
+
+Everything is done with precompiled patterns in a single pass over the lines; this runs
+on every turn, so it must stay cheap (a few microseconds for a typical response).
+"""
+import re
+from typing import Optional, Dict, Any, List
+
+from pydantic import ValidationError
+
+from ..models.game_models import NarrationOutputModel
+from .skill_odds import MODE_ALIASES, roll_mode
+
+# Turkish stat names the model may use, mapped to the stat keys of the player state
+STAT_ALIASES = {
+    "güç": "strength", "çeviklik": "dexterity", "dayanıklılık": "constitution",
+    "zeka": "intelligence", "bilgelik": "wisdom", "karizma": "charisma",
+}
+_STAT_NAMES = ["strength", "dexterity", "constitution", "intelligence", "wisdom", "charisma", *STAT_ALIASES]
+
+# One token per non-blank line: a choice line ('A) ...', '**B.** ...', '1. ...') or a story line.
+# The choice marker is one letter/digit followed by ')' or '.', optionally wrapped in markdown bold.
+# Both groups run to the end of the line (greedy, no backtracking); trailing whitespace is stripped afterwards.
+_LINE_RE = re.compile(
+    r"^[ \t]*(?:"
+    r"\**[ \t]*[^\W_][.)](?P<choice>[^\n]*)"
+    r"|(?P<story>[^\s][^\n]*)"
+    r")",
+    re.MULTILINE,
+)
+_MODE_NAMES = ["advantage", "disadvantage", *sorted(MODE_ALIASES, key=len, reverse=True)]
+# Skill check at the end of a choice, with an optional roll mode and trailing period:
+# '(Güç DC15)' / '(strength DC 12).' / '(Çeviklik DC14, avantajlı)'
+_SKILL_CHECK_RE = re.compile(
+    r"\s*\((?P<stat>" + "|".join(_STAT_NAMES) + r")\s+DC\s*(?P<dc>\d+)"
+    r"(?:\s*,\s*(?P<mode>" + "|".join(_MODE_NAMES) + r"))?\)\.?$",
+    re.IGNORECASE,
+)
+# Header the model often puts above the choices ('Yeni Seçenekler:', '**Yeni seçenekler**')
+CHOICE_HEADER = "yeni seçenekler"
+
+FALLBACK_STORY_TEXT = "AI bir hikaye oluşturamadı."
+
+# JSON schema sent as `response_format` in structured output mode; mirrors NarrationOutputModel / ChoiceModel.
+# Written out by hand because strict schemas need every property listed as required (nullable instead of optional).
+NARRATION_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "narration": {"type": "string"},
+        "choices": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "text": {"type": "string"},
+                    "skill_check_stat": {"type": ["string", "null"], "enum": [*_STAT_NAMES[:6], None]},
+                    "skill_check_dc": {"type": ["integer", "null"]},
+                    "skill_check_mode": {"type": ["string", "null"], "enum": ["advantage", "disadvantage", None]},
+                },
+                "required": ["id", "text", "skill_check_stat", "skill_check_dc", "skill_check_mode"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["narration", "choices"],
+    "additionalProperties": False,
+}
+NARRATION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "narration", "strict": True, "schema": NARRATION_JSON_SCHEMA},
+}
+# Some models wrap JSON in a markdown code fence even in JSON mode
+_CODE_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*(?P<body>.*?)\s*```\s*$", re.DOTALL | re.IGNORECASE)
+
+
+def is_choice_line(line: str) -> bool:
+    """True if a (stripped or unstripped) line starts like a choice: 'A)', '**B.', '1.' ..."""
+    match = _LINE_RE.match(line.strip())
+    return match is not None and match.group("story") is None
+
+
+def _is_choice_header(line: str) -> bool:
+    return line.lower().replace("*", "").replace(":", "").strip() == CHOICE_HEADER
+
+
+def parse_choice(text: str, choice_id: str) -> Optional[Dict[str, Any]]:
+    """Builds a choice dict from the text after the marker; None if nothing is left."""
+    # Markdown emphasis is never part of the choice text
+    text = text.replace("**", "").strip().strip("*").strip()
+    if not text:
+        return None
+    choice: Dict[str, Any] = {"id": choice_id, "text": text}
+    # Cheap pre-check: a skill check always ends the line with ')' or ').'
+    skill_check = _SKILL_CHECK_RE.search(text) if text.endswith((")", ").")) else None
+    if skill_check:
+        stat_name = skill_check.group("stat").lower()
+        choice["skill_check_stat"] = STAT_ALIASES.get(stat_name, stat_name)
+        choice["skill_check_dc"] = int(skill_check.group("dc"))
+        if skill_check.group("mode"):
+            choice["skill_check_mode"] = roll_mode(skill_check.group("mode"))
+        choice["text"] = text[:skill_check.start()].strip() or text
+    return choice
+
+
+def parse_narration(ai_content: str) -> Dict[str, Any]:
+    """
+    Parses raw AI text into {"text": story, "choices": [...], "raw_ai_response": ai_content}.
+    Story lines are joined with spaces. Everything from the first choice line on belongs to
+    the choice block; a 'Yeni Seçenekler' header right above it is dropped. Choices get ids
+    A, B, C... in order, regardless of how the model numbered them.
+    """
+    story_lines: List[str] = []
+    choices: List[Dict[str, Any]] = []
+    in_choices = False
+
+    for match in _LINE_RE.finditer(ai_content):
+        choice_text = match.group("choice")
+        if choice_text is None:
+            if not in_choices:
+                story_lines.append(match.group("story").rstrip())
+                continue
+            # Anything after the choices started is treated as one more choice, as before
+            choice_text = match.group("story")
+        elif not in_choices:
+            in_choices = True
+            if story_lines and _is_choice_header(story_lines[-1]):
+                story_lines.pop()
+        choice = parse_choice(choice_text, chr(65 + len(choices)))
+        if choice is not None:
+            choices.append(choice)
+
+    story_text = " ".join(story_lines)
+    if not story_text and not choices and ai_content:
+        story_text = ai_content.strip()
+
+    return {
+        "text": story_text or FALLBACK_STORY_TEXT,
+        "choices": choices,
+        "raw_ai_response": ai_content,
+    }
+
+
+def parse_structured_narration(ai_content: str) -> Optional[Dict[str, Any]]:
+    """
+    Validates a JSON-mode response against NarrationOutputModel and returns it in the same
+    shape as parse_narration. Returns None if the content is not valid narration JSON.
+    """
+    fenced = _CODE_FENCE_RE.match(ai_content)
+    try:
+        output = NarrationOutputModel.model_validate_json(fenced.group("body") if fenced else ai_content)
+    except ValidationError:
+        return None
+
+    choices: List[Dict[str, Any]] = []
+    for choice in output.choices:
+        text = choice.text.strip()
+        if not text:
+            continue
+        item: Dict[str, Any] = {"id": chr(65 + len(choices)), "text": text}
+        if choice.skill_check_stat and choice.skill_check_dc is not None:
+            stat_name = choice.skill_check_stat.strip().lower()
+            item["skill_check_stat"] = STAT_ALIASES.get(stat_name, stat_name)
+            item["skill_check_dc"] = choice.skill_check_dc
+            if roll_mode(choice.skill_check_mode) != "normal":
+                item["skill_check_mode"] = roll_mode(choice.skill_check_mode)
+        choices.append(item)
+
+    return {
+        "text": output.narration.strip() or FALLBACK_STORY_TEXT,
+        "choices": choices,
+        "raw_ai_response": ai_content,
+    }
+
+
+class NarrationStreamSplitter:
+    """
+    Incrementally separates the story part of a streamed narration from the choice block.
+    feed() returns the part of each chunk that is safe to show as story text. As soon as a
+    line starts like a choice ('A)', '**B.' ...), everything from there on is withheld; the
+    final parse of the full text produces the choices. A trailing 'Yeni Seçenekler:' header
+    is withheld too, matching parse_narration.
+    """
+    CHOICE_HEADER = CHOICE_HEADER
+
+    def __init__(self):
+        self.in_choices = False
+        self.has_emitted = False
+        self._line = "" # Current, not yet finished line
+        self._line_emitted = 0 # How many chars of the current line were already forwarded
+        self._held = "" # Completed lines withheld because they may be the choice header
+
+    def feed(self, chunk: str) -> str:
+        if self.in_choices:
+            return ""
+        out = []
+        for piece in chunk.splitlines(keepends=True):
+            self._line += piece
+            if self._line.endswith("\n"):
+                out.append(self._finish_line())
+                if self.in_choices:
+                    break
+            else:
+                out.append(self._flush_partial())
+        text = "".join(out)
+        if text:
+            self.has_emitted = True
+        return text
+
+    def _classify(self, line: str) -> str:
+        """Returns 'choice', 'header', 'story', or 'undecided' for a (possibly partial) line."""
+        if is_choice_line(line):
+            return "choice"
+        cleaned = line.lower().replace('*', '').replace(':', '').strip()
+        if cleaned and self.CHOICE_HEADER.startswith(cleaned):
+            return "header" if cleaned == self.CHOICE_HEADER else "undecided"
+        if len(line.strip().lstrip(" *")) < 2:
+            return "undecided"
+        return "story"
+
+    def _flush_partial(self) -> str:
+        if self._line_emitted == 0 and self._classify(self._line) != "story":
+            return ""
+        text = self._held + self._line[self._line_emitted:]
+        self._held = ""
+        self._line_emitted = len(self._line)
+        return text
+
+    def _finish_line(self) -> str:
+        line, emitted = self._line, self._line_emitted
+        self._line, self._line_emitted = "", 0
+        if emitted:
+            return line[emitted:]
+        kind = self._classify(line)
+        if kind == "choice":
+            self.in_choices = True
+            return ""
+        if kind == "header" or not line.strip():
+            # Hold blank lines / a possible header until we know whether choices follow
+            self._held += line
+            return ""
+        text = self._held + line
+        self._held = ""
+        return text
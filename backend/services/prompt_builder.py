@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+from functools import lru_cache
+from typing import Optional, Dict, List
+
+from ..data.worlds import WORLDS
+
+# Prompt layout (kept byte-for-byte stable so provider-side prefix/prompt caching can reuse it):
+#   1. "system" message - narrator instructions + world lore. Depends only on world_id, so it is
+#      built once per world and cached; every turn in that world sends the exact same string.
+#   2. "user" message   - the small per-turn part: player state, previous situation, action.
+# Nothing per-turn (stats, timestamps, ids) may be placed in the system message.
+
+# Static narrator instructions. Only the world name is substituted.
+_NARRATOR_INSTRUCTIONS = (
+    "Sen '{world_name}' adlı dünyada geçen, metin tabanlı bir RPG oyununun anlatıcısısın. "
+    "Oyuncunun hikayesini ve eylemlerinin sonuçlarını yönlendiriyorsun. "
+    "Aşağıda genel dünya bilgisi verilmiştir; oyuncunun mevcut durumu ve son yaptığı eylem/seçim ayrı bir mesajda gelecektir. "
+    "Bu eylemin/seçimin sonucunu ve ortaya çıkan yeni durumu yaratıcı bir şekilde anlat. "
+    "Eğer oyuncu serbest metinle özel bir eylem deniyorsa (örneğin 'Oyuncu şu özel eylemi yapmayı deniyor: ...' gibi bir ifadeyle belirtilmişse), "
+    "bu eylemin başarılı olup olmayacağını mevcut durum, karakterin mantıksal yetenekleri ve oyun dünyasının gerçekçiliği çerçevesinde değerlendir. Her özel eylem otomatik olarak başarılı olmamalıdır. "
+    "Anlatımının sonunda, oyuncuya yeni durumda yapabileceği 2 veya 3 yeni seçenek sun. "
+    "{format_instructions}"
+    "Eğer sana bir yetenek kontrolünün sonucu (BAŞARILI, BAŞARISIZ, KRİTİK BAŞARI, KRİTİK BAŞARISIZ) verilirse, hikayeyi bu sonuca göre devam ettir.\n\n"
+    "Genel Dünya Bilgisi ({world_name}): {lore_summary}"
+)
+
+
+# How the choices are written: free text parsed by narration_parser...
+_TEXT_FORMAT_INSTRUCTIONS = (
+    "Seçenekleri 'A) Seçenek metni', 'B) Başka bir seçenek metni' gibi, her birini ayrı bir satırda ve net bir şekilde belirt.\n"
+    "ARA SIRA, seçeneklerden biri bir YETENEK KONTROLÜ olabilir. Bunu 'Seçenek metni (YETENEK ZORLUK_DERECESİ)' formatında belirt. Örneğin: 'C) Kapıyı kırmaya çalış (Güç DC15)'. Kullanılabilecek yetenekler: strength, dexterity, constitution, intelligence, wisdom, charisma.\n"
+    "Durum oyuncunun açıkça lehine veya aleyhine ise kontrolü avantajlı ya da dezavantajlı yapabilirsin: 'D) Gölgelerden gizlice yaklaş (Çeviklik DC14, avantajlı)'.\n"
+)
+# ...or a JSON object matching NARRATION_JSON_SCHEMA (structured output mode)
+_JSON_FORMAT_INSTRUCTIONS = (
+    "Cevabını yalnızca şu alanlara sahip bir JSON nesnesi olarak ver: 'narration' (anlatım metni) ve 'choices' "
+    "(seçenekler listesi; her seçenek 'id' (A, B, C...), 'text', 'skill_check_stat' ve 'skill_check_dc' alanlarına sahip).\n"
+    "ARA SIRA, seçeneklerden biri bir YETENEK KONTROLÜ olabilir. Bu durumda 'skill_check_stat' alanına yeteneği (strength, dexterity, constitution, intelligence, wisdom, charisma), "
+    "'skill_check_dc' alanına zorluk derecesini (örneğin 15) yaz; seçenek metnine ekleme. Durum oyuncunun açıkça lehine ise 'skill_check_mode' alanına 'advantage', "
+    "aleyhine ise 'disadvantage' yaz, aksi halde null bırak. Yetenek kontrolü olmayan seçeneklerde bu üç alan null olmalı.\n"
+)
+
+
+@lru_cache(maxsize=128)
+def get_system_prompt(world_id: Optional[str], structured: bool = False) -> str:
+    """
+    Returns the precompiled, cached system prompt (instructions + lore) for a world.
+    `structured` selects the JSON output instructions instead of the 'A) ...' text format.
+    """
+    world_data = WORLDS.get(world_id, {})
+    return _NARRATOR_INSTRUCTIONS.format(
+        world_name=world_data.get("name", "belirsiz bir dünya"),
+        lore_summary=world_data.get("lore_summary", "Dünya hakkında ek bilgi yok."),
+        format_instructions=_JSON_FORMAT_INSTRUCTIONS if structured else _TEXT_FORMAT_INSTRUCTIONS,
+    )
+
+
+def warm_prompt_cache() -> None:
+    """Precompiles the system prompts (both output formats) of every known world (called once on startup)."""
+    for world_id in WORLDS:
+        get_system_prompt(world_id)
+        get_system_prompt(world_id, structured=True)
+
+
+def build_turn_message(prompt_text: str, player_context: Optional[dict]) -> str:
+    """Builds the small per-turn user message: player state, previous situation and the action."""
+    if player_context:
+        parts = ["Oyuncunun Durumu:\n"]
+        if player_context.get("class"):
+            parts.append(f"- Sınıf/Fraksiyon: {player_context['class']}\n")
+        if player_context.get("stats"):
+            stats_str = ", ".join([f"{k.upper()}: {v}" for k, v in player_context['stats'].items()])
+            parts.append(f"- Özellikler: {stats_str}\n")
+        if player_context.get("health"):
+            parts.append(f"- Can: {player_context['health']}\n")
+        if player_context.get("story_summary"): # Rolling summary of older turns (context_builder)
+            parts.append(f"- Hikayenin Özeti: {player_context['story_summary']}\n")
+        if player_context.get("recent_turns"): # Last few turns verbatim (context_builder)
+            parts.append(f"- Son Olaylar:\n{player_context['recent_turns']}\n")
+        if player_context.get("current_scenario_text"): # Text player saw before making the choice/action
+            parts.append(f"- Önceki Durum Metni: {player_context['current_scenario_text']}\n")
+        if player_context.get("skill_check_outcome"): # If there was a skill check
+            parts.append(f"- Yetenek Kontrolü Sonucu: {player_context['skill_check_outcome']}\n")
+        context_str = "".join(parts)
+    else:
+        context_str = "Oyuncu durumu hakkında bilgi yok.\n"
+
+    # prompt_text already contains the player's specific action/choice (or the skill check outcome) from game_service
+    return f"{context_str}\nOyuncunun Son Eylemi/Seçimi (veya Yetenek Kontrolü İsteği): {prompt_text}\n\nAnlatımın ve yeni seçeneklerin:"
+
+
+def build_messages(prompt_text: str, player_context: Optional[dict], structured: bool = False) -> List[Dict[str, str]]:
+    """Chat messages for one turn: the cached per-world system prompt followed by the per-turn message."""
+    world_id = player_context.get("world_id") if player_context else None
+    return [
+        {"role": "system", "content": get_system_prompt(world_id, structured)},
+        {"role": "user", "content": build_turn_message(prompt_text, player_context)},
+    ]
+
+
+_SUMMARY_INSTRUCTIONS = (
+    "Bir metin tabanlı RPG oyununun hikaye özetini güncelliyorsun. "
+    "Mevcut özeti ve yeni olayları birleştirerek tek paragraflık, en fazla {max_words} kelimelik yeni bir özet yaz. "
+    "Önemli karakterleri, yerleri, verilen kararları ve açık kalan hedefleri koru. Seçenek listesi ekleme, sadece özeti yaz."
+)
+
+
+def build_summary_messages(previous_summary: str, new_turns_text: str, world_id: Optional[str], max_words: int = 150) -> List[Dict[str, str]]:
+    """Chat messages asking the model to fold new turns into the rolling story summary."""
+    world_name = WORLDS.get(world_id, {}).get("name", "belirsiz bir dünya")
+    return [
+        {"role": "system", "content": _SUMMARY_INSTRUCTIONS.format(max_words=max_words)},
+        {"role": "user", "content": (
+            f"Dünya: {world_name}\n\n"
+            f"Mevcut Özet: {previous_summary or 'Henüz özet yok.'}\n\n"
+            f"Yeni Olaylar:\n{new_turns_text}\n\n"
+            "Güncellenmiş özet:"
+        )},
+    ]
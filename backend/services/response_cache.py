@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import random
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+from ..core import json_codec
+from ..db.database import run_db
+
+# --- Configuration ---
+# Opt-in cache of parsed AI responses. Many early-game turns are identical across players
+# (same world, faction, base stats, starting scenario and choice), so their narration can be
+# served from here instead of calling OpenRouter. Only those early turns hit: the key includes
+# the story context (see make_cache_key), which is unique to a session after a few turns.
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+AI_CACHE_TTL = float(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600))) # Seconds a cached response stays valid
+AI_CACHE_MEMORY_MAX_KEYS = int(os.getenv("AI_CACHE_MEMORY_MAX_KEYS", "2000"))
+AI_CACHE_DISK_MAX_ROWS = int(os.getenv("AI_CACHE_DISK_MAX_ROWS", "50000"))
+# Variety: each key collects up to this many different responses before it starts serving
+# a random one of them, so players do not all read the exact same text.
+AI_CACHE_VARIANTS = max(int(os.getenv("AI_CACHE_VARIANTS", "1")), 1)
+AI_CACHE_PATH = os.getenv("AI_CACHE_PATH", str(Path(__file__).resolve().parent.parent / "ai_cache.db"))
+
+# Check the disk size limit every this many inserts (pruning is a full-table query)
+_PRUNE_EVERY = 100
+
+
+def _normalize_text(text: Optional[str]) -> str:
+    return " ".join((text or "").split()).casefold()
+
+
+def make_cache_key(player_context: Optional[dict]) -> Optional[str]:
+    """
+    Normalized hash of everything that shapes the narration: world, class, stats, previous situation,
+    the story context (summary + recent turns, empty early in a session), the action and the
+    skill check outcome. Returns None when there is no context to key on.
+    The story context is part of the key on purpose: without it a cached answer could ignore what
+    already happened. As a result only the first turns of a session (before recent_turns has
+    diverged between players) can hit; later turns are effectively never cached.
+    """
+    if not player_context:
+        return None
+    key_material = {
+        "world_id": player_context.get("world_id"),
+        "class": player_context.get("class"),
+        "stats": sorted((player_context.get("stats") or {}).items()),
+        "scenario": _normalize_text(player_context.get("current_scenario_text")),
+        "summary": _normalize_text(player_context.get("story_summary")),
+        "recent": _normalize_text(player_context.get("recent_turns")),
+        "action_kind": player_context.get("action_kind"),
+        "action": _normalize_text(player_context.get("last_choice_text")),
+        "skill_check_outcome": player_context.get("skill_check_outcome"),
+    }
+    # Plain json on purpose: cache keys must not depend on JSON_BACKEND
+    encoded = json.dumps(key_material, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class _DiskTier:
+    """SQLite-backed tier: (key, variant) -> response JSON, with TTL and a row limit."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._inserts = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ai_response_cache ("
+                " cache_key TEXT NOT NULL, variant INTEGER NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL,"
+                " PRIMARY KEY (cache_key, variant))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_ai_response_cache_created ON ai_response_cache (created_at)")
+        return self._conn
+
+    def load(self, key: str, min_created_at: float) -> List[Tuple[dict, float]]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT payload, created_at FROM ai_response_cache WHERE cache_key = ? AND created_at >= ? ORDER BY variant",
+                (key, min_created_at),
+            ).fetchall()
+        return [(json_codec.loads(payload), created_at) for payload, created_at in rows]
+
+    def store(self, key: str, variant: int, response: dict, created_at: float) -> int:
+        """Stores one variant; returns the number of rows pruned to stay within the size limit."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO ai_response_cache (cache_key, variant, payload, created_at) VALUES (?, ?, ?, ?)",
+                (key, variant, json_codec.dumps(response), created_at),
+            )
+            pruned = 0
+            self._inserts += 1
+            if self._inserts % _PRUNE_EVERY == 0:
+                pruned += conn.execute("DELETE FROM ai_response_cache WHERE created_at < ?", (time.time() - AI_CACHE_TTL,)).rowcount
+                (count,) = conn.execute("SELECT COUNT(*) FROM ai_response_cache").fetchone()
+                if count > AI_CACHE_DISK_MAX_ROWS:
+                    pruned += conn.execute(
+                        "DELETE FROM ai_response_cache WHERE rowid IN "
+                        "(SELECT rowid FROM ai_response_cache ORDER BY created_at LIMIT ?)",
+                        (count - AI_CACHE_DISK_MAX_ROWS,),
+                    ).rowcount
+            conn.commit()
+            return pruned
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class AIResponseCache:
+    """
+    Two-tier (memory LRU -> on-disk SQLite) cache of parsed AI responses.
+    Each key holds a pool of up to AI_CACHE_VARIANTS responses; lookups miss until the pool is full.
+    """
+
+    def __init__(self, enabled: bool = AI_CACHE_ENABLED, path: str = AI_CACHE_PATH):
+        self.enabled = enabled
+        self._memory: "OrderedDict[str, List[Tuple[dict, float]]]" = OrderedDict()
+        self._disk = _DiskTier(path)
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    async def get(self, player_context: Optional[dict]) -> Optional[dict]:
+        """Returns a cached response for this context, or None (miss / pool not full yet / disabled)."""
+        key = make_cache_key(player_context) if self.enabled else None
+        if key is None:
+            return None
+
+        min_created_at = time.time() - AI_CACHE_TTL
+        variants = self._memory.get(key)
+        if variants is not None:
+            variants = [v for v in variants if v[1] >= min_created_at]
+            if len(variants) >= AI_CACHE_VARIANTS:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return random.choice(variants)[0]
+
+        variants = await run_db(self._disk.load, key, min_created_at)
+        if variants:
+            self._remember(key, variants)
+        if len(variants) >= AI_CACHE_VARIANTS:
+            self.stats["disk_hits"] += 1
+            return random.choice(variants)[0]
+
+        self.stats["misses"] += 1
+        return None
+
+    async def put(self, player_context: Optional[dict], response: dict) -> None:
+        """Adds a freshly generated response to the key's variant pool (if the pool is not full)."""
+        key = make_cache_key(player_context) if self.enabled else None
+        if key is None or response.get("error") or not response.get("choices"):
+            return # Do not cache failures or responses without choices
+        variants = list(self._memory.get(key, []))
+        if len(variants) >= AI_CACHE_VARIANTS:
+            return
+        created_at = time.time()
+        variant_index = len(variants)
+        variants.append((response, created_at))
+        self._remember(key, variants)
+        self.stats["stores"] += 1
+        self.stats["evictions"] += await run_db(self._disk.store, key, variant_index, response, created_at)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "memory_keys": len(self._memory),
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        self._disk.close()
+
+    def _remember(self, key: str, variants: List[Tuple[dict, float]]) -> None:
+        self._memory[key] = variants
+        self._memory.move_to_end(key)
+        while len(self._memory) > AI_CACHE_MEMORY_MAX_KEYS:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+
+# Process-wide cache instance
+response_cache = AIResponseCache()
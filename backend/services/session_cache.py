@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..core import json_codec
+from ..db import crud, models
+from ..db.database import SessionLocal, run_db
+from .context_builder import HISTORY_WINDOW
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# STATE_CACHE_DURABILITY:
+#   "write_through" - every history event is written to the DB before the turn returns (default)
+#   "write_behind"  - events are queued in memory and flushed in batches every
+#                     STATE_CACHE_FLUSH_INTERVAL seconds and at shutdown
+# The cache is per process; run multiple workers with STATE_CACHE_ENABLED=false
+# (or sticky sessions) so a session is never served from a stale copy.
+STATE_CACHE_ENABLED = os.getenv("STATE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+STATE_CACHE_DURABILITY = os.getenv("STATE_CACHE_DURABILITY", "write_through").lower()
+STATE_CACHE_MAX_ENTRIES = int(os.getenv("STATE_CACHE_MAX_ENTRIES", "5000"))
+STATE_CACHE_MAX_BYTES = int(os.getenv("STATE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))) # Approximate memory cap
+STATE_CACHE_TTL = float(os.getenv("STATE_CACHE_TTL", "1800")) # Seconds a session may stay idle in the cache
+STATE_CACHE_FLUSH_INTERVAL = float(os.getenv("STATE_CACHE_FLUSH_INTERVAL", "1.0"))
+# Failed flushes a session's queued events survive before they are logged and dropped,
+# so one bad session cannot block the flusher (and every other session) forever
+STATE_CACHE_FLUSH_MAX_ATTEMPTS = int(os.getenv("STATE_CACHE_FLUSH_MAX_ATTEMPTS", "3"))
+
+# Rough per-entry overhead (dict/dataclass/OrderedDict bookkeeping) added to the payload size
+_ENTRY_OVERHEAD_BYTES = 1024
+
+
+@dataclass
+class CachedSession:
+    """
+    In-memory copy of the parts of a session a turn needs.
+    Exposes the same attribute names as models.PlayerState, so game_service can use either.
+    """
+    session_id: str
+    player_name: Optional[str]
+    world_id: Optional[str]
+    world_name_display: Optional[str]
+    class_name: Optional[str]
+    health: Optional[int]
+    stats: Dict[str, Any]
+    inventory: List[Any]
+    skills: List[Any]
+    last_event: Optional[Dict[str, Any]] = None
+    last_seq: int = 0
+    recent_events: List[Tuple[int, Dict[str, Any]]] = field(default_factory=list) # Last HISTORY_WINDOW events
+    summary: str = "" # Rolling summary of events up to summary_seq
+    summary_seq: int = 0
+    pending_events: List[Tuple[int, Dict[str, Any]]] = field(default_factory=list) # Not yet flushed (write-behind)
+    flush_failures: int = 0 # Consecutive failed writes of pending_events
+    last_access: float = field(default_factory=time.monotonic)
+    size_bytes: int = 0
+
+    @classmethod
+    def from_db(cls, db_player_state: models.PlayerState, recent_events: List[Tuple[int, Dict[str, Any]]],
+                db_summary: Optional[models.SessionSummary] = None) -> "CachedSession":
+        return cls(
+            session_id=db_player_state.session_id,
+            player_name=db_player_state.player_name,
+            world_id=db_player_state.world_id,
+            world_name_display=db_player_state.world_name_display,
+            class_name=db_player_state.class_name,
+            health=db_player_state.health,
+            stats=dict(db_player_state.stats or {}),
+            inventory=list(db_player_state.inventory or []),
+            skills=list(db_player_state.skills or []),
+            last_event=recent_events[-1][1] if recent_events else None,
+            last_seq=recent_events[-1][0] if recent_events else 0,
+            recent_events=list(recent_events),
+            summary=db_summary.summary if db_summary else "",
+            summary_seq=db_summary.covered_seq if db_summary else 0,
+        )
+
+    def remember_event(self, seq: int, event: Dict[str, Any]) -> None:
+        """Makes `event` the latest one and keeps the recent-events window bounded."""
+        self.last_seq = seq
+        self.last_event = event
+        self.recent_events.append((seq, event))
+        if len(self.recent_events) > HISTORY_WINDOW:
+            del self.recent_events[:len(self.recent_events) - HISTORY_WINDOW]
+
+    def estimate_size(self) -> int:
+        payload = json_codec.dumps_bytes([self.stats, self.inventory, self.skills, self.recent_events, self.summary, self.pending_events], default=str)
+        self.size_bytes = len(payload) + _ENTRY_OVERHEAD_BYTES
+        return self.size_bytes
+
+
+def _load_session_snapshot(db: Session, session_id: str) -> Optional[CachedSession]:
+    """Reads player state, the recent-events window and the rolling summary in one executor hop."""
+    db_player_state = crud.get_player_state(db, session_id)
+    if not db_player_state:
+        return None
+    recent_events = crud.get_turn_events_with_seq(db, session_id, limit=HISTORY_WINDOW)
+    db_summary = crud.get_session_summary(db, session_id)
+    return CachedSession.from_db(db_player_state, recent_events, db_summary)
+
+
+def _write_events(events: List[Tuple[str, int, Dict[str, Any]]]) -> int:
+    """Writes queued events with a dedicated session (the originating request sessions are gone)."""
+    db = SessionLocal()
+    try:
+        return crud.append_turn_events(db, events)
+    finally:
+        db.close()
+
+
+class SessionStateCache:
+    """
+    LRU + idle-TTL cache of hot sessions with an approximate memory cap.
+    Entries with unflushed events are never evicted; they become evictable after the next flush.
+    """
+
+    def __init__(self, enabled: bool = STATE_CACHE_ENABLED, durability: str = STATE_CACHE_DURABILITY,
+                 max_entries: int = STATE_CACHE_MAX_ENTRIES, max_bytes: int = STATE_CACHE_MAX_BYTES,
+                 ttl: float = STATE_CACHE_TTL):
+        self.enabled = enabled
+        # Write-behind only makes sense with the cache holding the queued state
+        self.write_behind = enabled and durability == "write_behind"
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedSession]" = OrderedDict()
+        self._total_bytes = 0
+        self._flush_lock = asyncio.Lock()
+        self.stats = {
+            "hits": 0, "misses": 0, "evictions": 0, "flushes": 0, "flushed_events": 0,
+            "flush_failures": 0, "dropped_events": 0,
+        }
+
+    # --- Reads ---
+
+    async def get(self, db: Session, session_id: str) -> Optional[CachedSession]:
+        """Returns the session from memory, loading it from the DB on a miss."""
+        entry = self._entries.get(session_id) if self.enabled else None
+        if entry is not None and (time.monotonic() - entry.last_access <= self.ttl or entry.pending_events):
+            self.stats["hits"] += 1
+            entry.last_access = time.monotonic()
+            self._entries.move_to_end(session_id)
+            return entry
+
+        self.stats["misses"] += 1
+        entry = await run_db(_load_session_snapshot, db, session_id)
+        if entry is not None and self.enabled:
+            self._store(entry)
+        return entry
+
+    def put_created(self, db_player_state: models.PlayerState, history: List[Dict[str, Any]]) -> None:
+        """Caches a session that was just created (its initial events are already in the DB)."""
+        if not self.enabled:
+            return
+        recent_events = list(enumerate(history, start=1))[-HISTORY_WINDOW:]
+        self._store(CachedSession.from_db(db_player_state, recent_events))
+
+    # --- Writes ---
+
+    async def append_event(self, db: Session, session: CachedSession, event: Dict[str, Any]) -> bool:
+        """
+        Appends one history event. Write-through writes it before returning (under the next free
+        seq in the DB, which differs from ours only if another process wrote to the session);
+        write-behind queues it for the next batch flush. Returns True on success.
+        """
+        seq = session.last_seq + 1
+        if self.write_behind:
+            session.pending_events.append((seq, event))
+        else:
+            stored_seq = await run_db(crud.append_turn_event, db, session.session_id, event)
+            if stored_seq != seq:
+                logger.warning("Session %s was advanced by another writer (seq %d instead of %d)",
+                               session.session_id, stored_seq, seq)
+                seq = stored_seq
+        session.remember_event(seq, event)
+        if self.enabled and session.session_id in self._entries:
+            self._resize(session)
+        return True
+
+    async def flush(self) -> int:
+        """
+        Writes all queued events in one transaction. If that fails, each session is written on its
+        own so the others still get through; a session that keeps failing (STATE_CACHE_FLUSH_MAX_ATTEMPTS)
+        has its events logged and dropped. Returns the number of flushed events.
+        """
+        async with self._flush_lock:
+            batch: List[Tuple[str, int, Dict[str, Any]]] = []
+            flushed_entries = []
+            for entry in self._entries.values():
+                if entry.pending_events:
+                    batch.extend((entry.session_id, seq, event) for seq, event in entry.pending_events)
+                    flushed_entries.append((entry, len(entry.pending_events)))
+            if not batch:
+                return 0
+            try:
+                await run_db(_write_events, batch)
+            except Exception:
+                self.stats["flush_failures"] += 1
+                logger.warning("Batch flush of %d events failed, writing sessions one by one", len(batch), exc_info=True)
+                flushed = 0
+                for entry, count in flushed_entries:
+                    flushed += await self._flush_entry(entry, count)
+            else:
+                # Only drop what was written; events queued during the write stay pending
+                for entry, count in flushed_entries:
+                    del entry.pending_events[:count]
+                    entry.flush_failures = 0
+                flushed = len(batch)
+            self.stats["flushes"] += 1
+            self.stats["flushed_events"] += flushed
+            self._evict()
+            return flushed
+
+    async def _flush_entry(self, entry: CachedSession, count: int) -> int:
+        """Writes the first `count` queued events of one session; returns how many were written."""
+        events = entry.pending_events[:count]
+        try:
+            await run_db(_write_events, [(entry.session_id, seq, event) for seq, event in events])
+        except Exception:
+            entry.flush_failures += 1
+            if entry.flush_failures < STATE_CACHE_FLUSH_MAX_ATTEMPTS:
+                logger.warning("Flush of session %s failed (%d/%d), will retry", entry.session_id,
+                               entry.flush_failures, STATE_CACHE_FLUSH_MAX_ATTEMPTS, exc_info=True)
+                return 0
+            # Kept in the log so the events can be restored by hand
+            logger.error("Dropping %d unflushable events of session %s: %s", len(events), entry.session_id,
+                         json_codec.dumps(events, default=str), exc_info=True)
+            self.stats["dropped_events"] += len(events)
+            written = 0
+        else:
+            written = len(events)
+        del entry.pending_events[:count]
+        entry.flush_failures = 0
+        return written
+
+    async def run_flusher(self, interval: float = STATE_CACHE_FLUSH_INTERVAL) -> None:
+        """Background task (started by the app lifespan) that flushes write-behind events periodically."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Session cache flush failed, will retry")
+
+    def session_ids(self) -> set:
+        """Ids of the sessions held in memory (session expiry leaves these alone)."""
+        return set(self._entries)
+
+    def discard(self, session_id: str) -> None:
+        """Forgets a session that was removed from the DB (its queued events, if any, are dropped)."""
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._total_bytes -= entry.size_bytes
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "approx_bytes": self._total_bytes,
+            "pending_events": sum(len(entry.pending_events) for entry in self._entries.values()),
+            "durability": "write_behind" if self.write_behind else "write_through",
+            "enabled": self.enabled,
+        }
+
+    # --- Internal bookkeeping ---
+
+    def _store(self, entry: CachedSession) -> None:
+        old = self._entries.pop(entry.session_id, None)
+        if old is not None:
+            self._total_bytes -= old.size_bytes
+        self._entries[entry.session_id] = entry
+        self._total_bytes += entry.estimate_size()
+        self._evict()
+
+    def _resize(self, entry: CachedSession) -> None:
+        self._total_bytes -= entry.size_bytes
+        self._total_bytes += entry.estimate_size()
+        self._evict()
+
+    def _evict(self) -> None:
+        """Drops idle-expired entries, then least recently used ones until within limits."""
+        now = time.monotonic()
+        for session_id in list(self._entries.keys()):
+            entry = self._entries[session_id]
+            over_limit = len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes
+            expired = now - entry.last_access > self.ttl
+            if not over_limit and not expired:
+                # Entries are in LRU order; later ones were used more recently
+                break
+            if entry.pending_events:
+                continue
+            del self._entries[session_id]
+            self._total_bytes -= entry.size_bytes
+            self.stats["evictions"] += 1
+
+
+# Process-wide cache instance
+session_cache = SessionStateCache()
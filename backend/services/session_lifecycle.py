@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+import os
+import gzip
+import json
+import time
+import asyncio
+import logging
+import datetime
+import itertools
+from typing import Dict, Any, List, Set
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from ..core import metrics
+from ..db import crud
+from ..db.database import SessionLocal, engine, run_db, get_db_pending
+from .session_cache import session_cache
+from .turn_coordinator import turn_coordinator
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# Sessions idle for longer than SESSION_IDLE_TTL are written to gzip'd JSON-lines files in
+# SESSION_ARCHIVE_DIR and deleted, a batch at a time, by a background task. Freed pages are then
+# handed back with an incremental VACUUM and the query planner statistics refreshed (PRAGMA optimize).
+# All of it backs off while live requests have DB work queued, and pauses between batches.
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", str(30 * 24 * 3600))) # Seconds; 0 disables expiry
+SESSION_ARCHIVE_ENABLED = os.getenv("SESSION_ARCHIVE_ENABLED", "true").lower() in ("1", "true", "yes")
+SESSION_ARCHIVE_DIR = os.getenv(
+    "SESSION_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "session_archive")
+)
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "600")) # Seconds between sweeps
+SESSION_SWEEP_BATCH = int(os.getenv("SESSION_SWEEP_BATCH", "100")) # Sessions archived + deleted per transaction
+SESSION_SWEEP_MAX_PER_RUN = int(os.getenv("SESSION_SWEEP_MAX_PER_RUN", "5000"))
+SESSION_SWEEP_PAUSE = float(os.getenv("SESSION_SWEEP_PAUSE", "0.5")) # Seconds between batches
+SESSION_SWEEP_IDLE_WAIT = float(os.getenv("SESSION_SWEEP_IDLE_WAIT", "30")) # Max wait for the DB to go idle before a batch
+SESSION_VACUUM_INTERVAL = float(os.getenv("SESSION_VACUUM_INTERVAL", "3600"))
+SESSION_VACUUM_PAGES = int(os.getenv("SESSION_VACUUM_PAGES", "2000")) # Pages freed per incremental_vacuum step
+
+_file_counter = itertools.count(1)
+
+
+class SessionLifecycle:
+    """Background expiry, archival and compaction of idle sessions."""
+
+    def __init__(self):
+        self._last_vacuum = time.monotonic()
+        self._warned_auto_vacuum = False
+        self.stats = {
+            "sweeps": 0, "archived_sessions": 0, "deleted_sessions": 0, "deleted_events": 0,
+            "archive_files": 0, "archive_bytes": 0, "busy_deferrals": 0, "lock_conflicts": 0,
+            "vacuum_runs": 0, "vacuumed_pages": 0, "last_sweep_at": None,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return SESSION_IDLE_TTL > 0
+
+    async def run(self) -> None:
+        """Background task (started by the app lifespan): sweeps every SESSION_SWEEP_INTERVAL seconds."""
+        while True:
+            await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+            try:
+                await self.sweep()
+                if engine.dialect.name == "sqlite" and time.monotonic() - self._last_vacuum >= SESSION_VACUUM_INTERVAL:
+                    if await self._wait_for_idle_db():
+                        await run_db(self._compact)
+                        self._last_vacuum = time.monotonic()
+            except Exception:
+                logger.exception("Oturum temizliği başarısız, sonraki turda tekrar denenecek")
+
+    async def sweep(self) -> int:
+        """Archives and deletes expired sessions in batches; returns how many were removed."""
+        if not self.enabled:
+            return 0
+        self.stats["sweeps"] += 1
+        self.stats["last_sweep_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+        idle_before = _utcnow() - datetime.timedelta(seconds=SESSION_IDLE_TTL)
+        removed = 0
+        while removed < SESSION_SWEEP_MAX_PER_RUN:
+            if not await self._wait_for_idle_db():
+                break
+            # Sessions in memory or mid-turn may have newer activity than last_updated shows (write-behind)
+            protected = session_cache.session_ids() | turn_coordinator.active_sessions()
+            try:
+                deleted = await run_db(self._sweep_batch, idle_before, protected)
+            except OperationalError as e:
+                if "locked" not in str(e).lower():
+                    raise
+                # Another worker process is sweeping the same database
+                self.stats["lock_conflicts"] += 1
+                break
+            for session_id in deleted:
+                session_cache.discard(session_id)
+            metrics.SESSIONS_EXPIRED.inc(amount=len(deleted))
+            removed += len(deleted)
+            if len(deleted) < SESSION_SWEEP_BATCH:
+                break
+            await asyncio.sleep(SESSION_SWEEP_PAUSE)
+        if removed:
+            logger.info("%d süresi dolmuş oturum arşivlendi ve silindi.", removed)
+        return removed
+
+    async def _wait_for_idle_db(self) -> bool:
+        """Waits until no request has DB work queued; False if that does not happen within SESSION_SWEEP_IDLE_WAIT."""
+        deadline = time.monotonic() + SESSION_SWEEP_IDLE_WAIT
+        while get_db_pending() > 0:
+            if time.monotonic() >= deadline:
+                self.stats["busy_deferrals"] += 1
+                return False
+            await asyncio.sleep(0.1)
+        return True
+
+    def _sweep_batch(self, idle_before: datetime.datetime, protected: Set[str]) -> List[str]:
+        """One transaction: take the write lock, pick expired sessions, archive them, delete them."""
+        db = SessionLocal()
+        try:
+            # A write statement first, so this transaction holds SQLite's write lock before it reads:
+            # two worker processes sweeping at once cannot archive the same sessions twice
+            db.execute(text("DELETE FROM player_states WHERE 0"))
+            candidates = crud.get_expired_session_ids(db, idle_before, SESSION_SWEEP_BATCH + len(protected))
+            session_ids = [session_id for session_id in candidates if session_id not in protected][:SESSION_SWEEP_BATCH]
+            if not session_ids:
+                db.rollback()
+                return []
+            if SESSION_ARCHIVE_ENABLED:
+                sessions = crud.export_sessions(db, session_ids)
+                self._write_archive(sessions)
+                self.stats["archived_sessions"] += len(sessions)
+            deleted_sessions, deleted_events = crud.delete_sessions(db, session_ids)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.stats["deleted_sessions"] += deleted_sessions
+        self.stats["deleted_events"] += deleted_events
+        return session_ids
+
+    def _write_archive(self, sessions: List[Dict[str, Any]]) -> None:
+        """Writes one gzip'd JSON-lines file (one session per line); durable before the rows are deleted."""
+        os.makedirs(SESSION_ARCHIVE_DIR, exist_ok=True)
+        name = f"sessions-{_utcnow():%Y%m%dT%H%M%S}-{os.getpid()}-{next(_file_counter)}.jsonl.gz"
+        path = os.path.join(SESSION_ARCHIVE_DIR, name)
+        with open(path + ".tmp", "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as archive:
+                for session in sessions:
+                    archive.write(json.dumps(session, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(path + ".tmp", path)
+        self.stats["archive_files"] += 1
+        self.stats["archive_bytes"] += os.path.getsize(path)
+
+    def _compact(self) -> None:
+        """Returns free pages to the file system (incremental auto_vacuum only) and refreshes planner statistics."""
+        raw_connection = engine.raw_connection()
+        try:
+            sqlite_connection = raw_connection.driver_connection
+            auto_vacuum = sqlite_connection.execute("PRAGMA auto_vacuum").fetchone()[0]
+            if auto_vacuum == 2: # INCREMENTAL
+                free_pages = sqlite_connection.execute("PRAGMA freelist_count").fetchone()[0]
+                # executescript steps the pragma to completion; a plain execute() frees a single page
+                sqlite_connection.executescript(f"PRAGMA incremental_vacuum({SESSION_VACUUM_PAGES});")
+                self.stats["vacuumed_pages"] += free_pages - sqlite_connection.execute("PRAGMA freelist_count").fetchone()[0]
+            elif not self._warned_auto_vacuum:
+                self._warned_auto_vacuum = True
+                logger.info("Veritabanı auto_vacuum=INCREMENTAL ile oluşturulmamış; boş sayfalar dosyada yeniden "
+                            "kullanılır ama diske iade edilmez (bir kez 'VACUUM' çalıştırmak bunu değiştirir).")
+            # Cheap ANALYZE: only tables whose statistics are stale, with a bounded sample
+            sqlite_connection.executescript("PRAGMA analysis_limit=400; PRAGMA optimize;")
+        finally:
+            raw_connection.close()
+        self.stats["vacuum_runs"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "idle_ttl_s": SESSION_IDLE_TTL,
+            "archive_dir": SESSION_ARCHIVE_DIR if SESSION_ARCHIVE_ENABLED else None,
+        }
+
+
+def _utcnow() -> datetime.datetime:
+    # Naive UTC, like the CURRENT_TIMESTAMP values SQLite stores in created_at / last_updated
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+# Process-wide instance
+session_lifecycle = SessionLifecycle()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Skill-check odds: probability tables over (stat value, DC) for every roll mode, built once with NumPy.
+
+Rules match game_service._perform_skill_check: d20 + (stat - 10) // 2 against the DC; a natural 20
+always succeeds (critical success), a natural 1 always fails (critical failure). A choice may carry
+skill_check_mode: with advantage the higher of two d20s counts, with disadvantage the lower.
+
+Lookups on the hot path are two clamped integer indexes into a precomputed array, so annotating a
+choice costs the same no matter how many choices or stat/DC values there are.
+"""
+import random
+from typing import Dict, Any, List, Optional, Iterable
+
+import numpy as np
+
+from ..core import metrics
+
+ROLL_MODES = ("normal", "advantage", "disadvantage")
+# Turkish names the narrator may use in '(Çeviklik DC14, avantajlı)'
+MODE_ALIASES = {"avantaj": "advantage", "avantajlı": "advantage", "dezavantaj": "disadvantage", "dezavantajlı": "disadvantage"}
+# Table bounds; values outside are clamped (a DC above MAX_DC behaves like MAX_DC: only a natural 20 passes)
+MIN_STAT, MAX_STAT = 1, 30
+MIN_DC, MAX_DC = 1, 40
+DEFAULT_STAT = 10 # Same default as _perform_skill_check for stats the character does not have
+
+_FACES = np.arange(1, 21)
+
+
+def ability_modifier(stat_value: int) -> int:
+    """D&D 5e ability modifier."""
+    return (stat_value - 10) // 2
+
+
+def roll_mode(value: Optional[str]) -> str:
+    """A choice's skill_check_mode as one of ROLL_MODES; missing or unknown values are a normal roll."""
+    if not value:
+        return "normal"
+    value = str(value).strip().lower()
+    value = MODE_ALIASES.get(value, value)
+    return value if value in ROLL_MODES else "normal"
+
+
+def roll_d20(mode: str = "normal") -> int:
+    """One d20 roll in the given mode."""
+    if mode == "advantage":
+        return max(random.randint(1, 20), random.randint(1, 20))
+    if mode == "disadvantage":
+        return min(random.randint(1, 20), random.randint(1, 20))
+    return random.randint(1, 20)
+
+
+def _face_probabilities() -> np.ndarray:
+    """(mode, face) -> probability that the counted d20 shows `face`."""
+    k = _FACES.astype(np.float64)
+    return np.stack([
+        np.full(20, 1 / 20),
+        (2 * k - 1) / 400, # P(max of two d20 == k)
+        (41 - 2 * k) / 400, # P(min of two d20 == k)
+    ])
+
+
+def _build_tables() -> Dict[str, np.ndarray]:
+    """(mode, stat index, dc index) arrays of success / critical success / critical failure probabilities."""
+    stats = np.arange(MIN_STAT, MAX_STAT + 1)
+    dcs = np.arange(MIN_DC, MAX_DC + 1)
+    modifiers = (stats - 10) // 2
+
+    # success[stat, dc, face]: natural 20 always, natural 1 never, otherwise roll + modifier >= dc
+    totals = _FACES[None, None, :] + modifiers[:, None, None]
+    success = (totals >= dcs[None, :, None]) | (_FACES == 20)
+    success &= _FACES != 1
+
+    face_probs = _face_probabilities()
+    shape = (len(ROLL_MODES), len(stats), len(dcs))
+    return {
+        "success": np.einsum("sdf,mf->msd", success.astype(np.float64), face_probs),
+        # Crit chances only depend on the mode; broadcast so every lookup has the same shape
+        "critical_success": np.broadcast_to(face_probs[:, 19, None, None], shape),
+        "critical_failure": np.broadcast_to(face_probs[:, 0, None, None], shape),
+    }
+
+
+_TABLES = _build_tables()
+
+
+def odds(stat_value: int, dc: int, mode: str = "normal") -> Dict[str, float]:
+    """Success / critical success / critical failure probabilities of one check."""
+    index = (
+        ROLL_MODES.index(mode),
+        min(max(stat_value, MIN_STAT), MAX_STAT) - MIN_STAT,
+        min(max(dc, MIN_DC), MAX_DC) - MIN_DC,
+    )
+    return {name: round(float(table[index]), 4) for name, table in _TABLES.items()}
+
+
+def batch_odds(stat_values: Iterable[int], dcs: Iterable[int], mode: str = "normal") -> Dict[str, np.ndarray]:
+    """Vectorized odds() for many (stat value, DC) pairs (balance reports, simulations)."""
+    mode_index = ROLL_MODES.index(mode)
+    stat_index = np.clip(np.fromiter(stat_values, dtype=np.int64), MIN_STAT, MAX_STAT) - MIN_STAT
+    dc_index = np.clip(np.fromiter(dcs, dtype=np.int64), MIN_DC, MAX_DC) - MIN_DC
+    return {name: table[mode_index, stat_index, dc_index] for name, table in _TABLES.items()}
+
+
+def annotate_choices(choices: List[Dict[str, Any]], stats: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Copies of the choices with success_chance / critical_success_chance / critical_failure_chance
+    filled in for skill checks, using the session's stats and the choice's skill_check_mode.
+    Other choices are returned unchanged.
+    """
+    stats = stats or {}
+    annotated = []
+    for choice in choices:
+        stat_name, dc = choice.get("skill_check_stat"), choice.get("skill_check_dc")
+        if not stat_name or dc is None:
+            annotated.append(choice)
+            continue
+        try:
+            stat_value = int(stats.get(str(stat_name).lower(), DEFAULT_STAT))
+            check_odds = odds(stat_value, int(dc), roll_mode(choice.get("skill_check_mode")))
+        except (TypeError, ValueError):
+            annotated.append(choice)
+            continue
+        metrics.SKILL_CHECK_SUCCESS_CHANCE.observe(check_odds["success"])
+        annotated.append({
+            **choice,
+            "success_chance": check_odds["success"],
+            "critical_success_chance": check_odds["critical_success"],
+            "critical_failure_chance": check_odds["critical_failure"],
+        })
+    return annotated
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Tuple
+
+from .ai_service import get_ai_response
+from .ai_scheduler import ai_scheduler
+from .context_builder import estimate_tokens
+
+# --- Configuration ---
+# Speculative mode: while the player reads a response, the outcomes of the choices on screen
+# are generated in the background. When the player picks one, its result is served at once
+# and the other generations are cancelled or discarded. Costs extra model calls; off by default.
+SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "false").lower() in ("1", "true", "yes")
+SPECULATION_MAX_PER_SESSION = int(os.getenv("SPECULATION_MAX_PER_SESSION", "4")) # Generations per presented turn
+SPECULATION_MAX_GLOBAL = int(os.getenv("SPECULATION_MAX_GLOBAL", "8")) # Speculative calls in flight process-wide
+SPECULATE_SKILL_CHECKS = os.getenv("SPECULATE_SKILL_CHECKS", "true").lower() in ("1", "true", "yes")
+SPECULATION_TTL = float(os.getenv("SPECULATION_TTL", "900")) # Unclaimed speculations older than this are dropped
+
+# Key of one speculative generation: (choice_id, skill check outcome or None)
+SpeculationKey = Tuple[str, Optional[str]]
+
+
+@dataclass
+class _SpeculativeJob:
+    choice_text: str
+    prompt_tokens: int
+    task: Optional[asyncio.Task] = None
+    started: bool = False # True once it holds a global slot and the model call is running
+
+
+class SpeculationManager:
+    """Schedules, serves and discards speculative generations, one set per session."""
+
+    def __init__(self, enabled: bool = SPECULATION_ENABLED):
+        self.enabled = enabled
+        # session_id -> (seq of the event the choices belong to, scheduled_at, jobs)
+        self._sessions: Dict[str, Tuple[int, float, Dict[SpeculationKey, _SpeculativeJob]]] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.stats = {
+            "scheduled": 0, "hits": 0, "misses": 0, "cancelled": 0,
+            # cancelled_in_flight: cancelled while the model call was running (its prompt was already sent)
+            "cancelled_in_flight": 0, "generated_tokens": 0, "wasted_tokens": 0,
+        }
+
+    def schedule(self, session_id: str, base_seq: int, jobs: List[Dict[str, Any]]) -> None:
+        """
+        Starts background generations for a freshly presented turn.
+        jobs: [{"choice_id", "outcome", "choice_text", "ai_input_text", "ai_context"}, ...] in priority order;
+        only the first SPECULATION_MAX_PER_SESSION are started.
+        """
+        if not self.enabled:
+            return
+        self.discard(session_id)
+        self._purge_stale()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(SPECULATION_MAX_GLOBAL)
+
+        session_jobs: Dict[SpeculationKey, _SpeculativeJob] = {}
+        for spec in jobs[:SPECULATION_MAX_PER_SESSION]:
+            job = _SpeculativeJob(
+                choice_text=spec["choice_text"],
+                prompt_tokens=estimate_tokens(spec["ai_input_text"]) + estimate_tokens(str(spec["ai_context"])),
+            )
+            job.task = asyncio.create_task(self._generate(job, spec["ai_input_text"], spec["ai_context"]))
+            session_jobs[(spec["choice_id"], spec.get("outcome"))] = job
+            self.stats["scheduled"] += 1
+        if session_jobs:
+            self._sessions[session_id] = (base_seq, time.monotonic(), session_jobs)
+
+    async def claim(self, session_id: str, base_seq: int, choice_id: str, choice_text: str,
+                    outcome: Optional[str] = None) -> Optional[dict]:
+        """
+        Returns the speculative response for the choice the player actually made, or None.
+        A generation that is still running is awaited (it is ahead of a fresh call); one still
+        waiting for a slot is cancelled. All other speculations of the session are discarded.
+        """
+        entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            return None
+        scheduled_seq, _, jobs = entry
+        job = jobs.pop((choice_id, outcome), None) if scheduled_seq == base_seq else None
+        self._discard_jobs(jobs)
+
+        if job is None or job.choice_text != choice_text or (not job.started and not job.task.done()):
+            if job is not None:
+                self._discard_jobs({(choice_id, outcome): job})
+            self.stats["misses"] += 1
+            return None
+        try:
+            result = await job.task
+        except (asyncio.CancelledError, Exception):
+            result = None
+        if not result or result.get("error"):
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return result
+
+    def discard(self, session_id: str) -> None:
+        """Drops all speculations of a session (e.g. the player typed a custom action)."""
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self._discard_jobs(entry[2])
+
+    def cancel_all(self) -> None:
+        """Drops every pending speculation (shutdown)."""
+        for session_id in list(self._sessions.keys()):
+            self.discard(session_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        claims = self.stats["hits"] + self.stats["misses"]
+        generated = self.stats["generated_tokens"]
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "active_sessions": len(self._sessions),
+            "hit_rate": round(self.stats["hits"] / claims, 4) if claims else 0.0,
+            "wasted_token_rate": round(self.stats["wasted_tokens"] / generated, 4) if generated else 0.0,
+        }
+
+    async def _generate(self, job: _SpeculativeJob, ai_input_text: str, ai_context: dict) -> dict:
+        async with self._slots:
+            job.started = True
+            # Background priority: skipped instead of queued when the AI scheduler is busy with players
+            with ai_scheduler.background():
+                result = await get_ai_response(prompt_text=ai_input_text, player_context=ai_context)
+        self.stats["generated_tokens"] += self._job_tokens(job, result)
+        return result
+
+    def _job_tokens(self, job: _SpeculativeJob, result: Optional[dict]) -> int:
+        """Approximate prompt + completion tokens of a finished generation."""
+        if not result or result.get("error"):
+            return 0
+        return job.prompt_tokens + estimate_tokens(result.get("raw_ai_response") or "")
+
+    def _discard_jobs(self, jobs: Dict[SpeculationKey, _SpeculativeJob]) -> None:
+        for job in jobs.values():
+            if job.task.done():
+                if not job.task.cancelled() and job.task.exception() is None:
+                    self.stats["wasted_tokens"] += self._job_tokens(job, job.task.result())
+            else:
+                job.task.cancel()
+                self.stats["cancelled"] += 1
+                if job.started:
+                    # The provider bills the prompt at least; the partial completion is unknown, so this undercounts
+                    self.stats["cancelled_in_flight"] += 1
+                    self.stats["generated_tokens"] += job.prompt_tokens
+                    self.stats["wasted_tokens"] += job.prompt_tokens
+
+    def _purge_stale(self) -> None:
+        now = time.monotonic()
+        for session_id in [sid for sid, (_, scheduled_at, _) in self._sessions.items() if now - scheduled_at > SPECULATION_TTL]:
+            self.discard(session_id)
+
+
+# Process-wide instance
+speculation = SpeculationManager()
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, Tuple, Callable, Awaitable, AsyncIterator
+from contextlib import asynccontextmanager
+
+from ..core import metrics
+
+# --- Configuration ---
+# Turns of one session are processed one at a time. Requests carrying the same idempotency key
+# (a double click, a frontend retry) share one result: a duplicate of an in-flight request waits
+# for it, a duplicate of a completed one gets the stored response back.
+# State is per process: with several workers, requests of a session must reach the same worker.
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "600")) # Seconds a completed response is kept for replay
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+# (session_id, idempotency key)
+TurnKey = Tuple[str, str]
+
+
+@dataclass
+class _TurnEntry:
+    future: asyncio.Future
+    remember: bool # Keep the result for replay once completed (explicit idempotency keys only)
+    completed_at: Optional[float] = None
+
+
+@dataclass
+class _SessionLock:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    users: int = 0 # Holders + waiters; the lock is dropped when this reaches 0
+
+
+class TurnCoordinator:
+    """Per-session serialization of turns and deduplication of repeated requests."""
+
+    def __init__(self):
+        self._in_flight: Dict[TurnKey, _TurnEntry] = {}
+        # Stored responses in completion order, so the oldest (first to expire or be evicted) is first
+        self._completed: "OrderedDict[TurnKey, _TurnEntry]" = OrderedDict()
+        self._locks: Dict[str, _SessionLock] = {}
+        self.stats = {
+            "turns": 0, "coalesced_in_flight": 0, "replayed_completed": 0, "serialized_waits": 0,
+        }
+
+    @staticmethod
+    def implicit_key(choice_id: str, choice_text: str) -> str:
+        """Key for requests without an idempotency key: identical choices in flight at the same time are merged."""
+        return f"implicit:{choice_id}:{choice_text}"
+
+    async def run(self, session_id: str, key: str, action: Callable[[], Awaitable[Any]], remember: bool = True,
+                  keep: Callable[[Any], bool] = lambda result: True) -> Any:
+        """
+        Runs action() under the session lock, unless a request with the same key is in flight
+        (its result is awaited) or completed within IDEMPOTENCY_TTL (its result is returned).
+        Results for which keep(result) is False (e.g. AI errors) are not stored, so a retry runs again.
+        """
+        is_duplicate, result = await self.join(session_id, key)
+        if is_duplicate:
+            return result
+
+        entry = self.begin(session_id, key, remember)
+        try:
+            async with self.session_lock(session_id):
+                result = await action()
+        except BaseException as e:
+            self.fail(session_id, key, entry, e)
+            raise
+        self.complete(session_id, key, entry, result, keep(result))
+        return result
+
+    async def join(self, session_id: str, key: str) -> Tuple[bool, Any]:
+        """
+        (True, result) if a request with this key is in flight (awaited) or completed (stored);
+        (False, None) if this request has to do the work itself (then call begin()).
+        """
+        while True:
+            entry = self.attach(session_id, key)
+            if entry is None:
+                return False, None
+            try:
+                return True, await asyncio.shield(entry.future)
+            except asyncio.CancelledError:
+                if not entry.future.cancelled():
+                    raise # This request itself was cancelled
+                # The original request was abandoned before finishing; take over
+
+    def attach(self, session_id: str, key: str) -> Optional[_TurnEntry]:
+        """Returns the in-flight or stored entry for this key, or None if the request is new."""
+        self._purge_expired()
+        entry = self._in_flight.get((session_id, key))
+        if entry is not None:
+            self.stats["coalesced_in_flight"] += 1
+            metrics.DUPLICATE_TURNS.inc("in_flight")
+            return entry
+        entry = self._completed.get((session_id, key))
+        if entry is not None:
+            self.stats["replayed_completed"] += 1
+            metrics.DUPLICATE_TURNS.inc("completed")
+        return entry
+
+    def begin(self, session_id: str, key: str, remember: bool) -> _TurnEntry:
+        entry = _TurnEntry(future=asyncio.get_running_loop().create_future(), remember=remember)
+        self._in_flight[(session_id, key)] = entry
+        self.stats["turns"] += 1
+        return entry
+
+    def complete(self, session_id: str, key: str, entry: _TurnEntry, result: Any, keep: bool = True) -> None:
+        if not entry.future.done():
+            entry.future.set_result(result)
+        self._drop(session_id, key, entry)
+        if entry.remember and keep:
+            entry.completed_at = time.monotonic()
+            self._completed[(session_id, key)] = entry
+            self._completed.move_to_end((session_id, key))
+            # Only stored responses count toward the limit; in-flight requests are never evicted
+            while len(self._completed) > IDEMPOTENCY_MAX_ENTRIES:
+                self._completed.popitem(last=False)
+
+    def fail(self, session_id: str, key: str, entry: _TurnEntry, error: BaseException) -> None:
+        """Releases waiting duplicates: they get the same exception, or take over if the request was cancelled."""
+        if not entry.future.done():
+            # GeneratorExit: a streaming response was closed early (client went away)
+            if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+                entry.future.cancel()
+            else:
+                entry.future.set_exception(error)
+                entry.future.exception() # Marks it retrieved; the caller re-raises it anyway
+        self._drop(session_id, key, entry)
+
+    @asynccontextmanager
+    async def session_lock(self, session_id: str) -> AsyncIterator[None]:
+        """Holds the session's lock; a second turn of the same session waits for the first to finish."""
+        session_lock = self._locks.get(session_id)
+        if session_lock is None:
+            session_lock = self._locks[session_id] = _SessionLock()
+        if session_lock.lock.locked():
+            self.stats["serialized_waits"] += 1
+        session_lock.users += 1
+        try:
+            async with session_lock.lock:
+                yield
+        finally:
+            session_lock.users -= 1
+            if session_lock.users == 0:
+                self._locks.pop(session_id, None)
+
+    def active_sessions(self) -> set:
+        """Sessions with a turn running or waiting."""
+        return set(self._locks)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "stored_responses": len(self._completed),
+            "in_flight": len(self._in_flight),
+            "locked_sessions": len(self._locks),
+        }
+
+    def _drop(self, session_id: str, key: str, entry: _TurnEntry) -> None:
+        if self._in_flight.get((session_id, key)) is entry:
+            del self._in_flight[(session_id, key)]
+
+    def _purge_expired(self) -> None:
+        # Stored responses are kept in completion order, so expired ones are found from the front
+        now = time.monotonic()
+        while self._completed:
+            key, entry = next(iter(self._completed.items()))
+            if now - entry.completed_at <= IDEMPOTENCY_TTL:
+                break
+            del self._completed[key]
+
+
+turn_coordinator = TurnCoordinator()
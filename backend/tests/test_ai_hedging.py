@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""Hedged model fallback: first valid answer wins, losers are cancelled (ai_service._get_ai_response_hedged)."""
+import asyncio
+import json
+import time
+
+import httpx
+
+from backend.services import ai_service
+
+SLOW, FAST, SPARE = "slow/model", "fast/model", "spare/model"
+ANSWER = "Kapı gıcırdayarak açıldı.\n\nYeni Seçenekler:\nA) İçeri gir.\nB) Geri çekil.\n"
+
+
+def _run(monkeypatch, behaviours, hedge_delay):
+    """
+    Runs one hedged request over MODEL_PREFERENCE = list(behaviours), where each model's
+    behaviour is an async function returning its httpx.Response. Returns the result,
+    the models in request order, the cancelled models and the elapsed seconds.
+    """
+    requested, cancelled = [], []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        model_name = json.loads(request.content)["model"]
+        requested.append(model_name)
+        try:
+            return await behaviours[model_name]()
+        except asyncio.CancelledError:
+            cancelled.append(model_name)
+            raise
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(ai_service, "MODEL_PREFERENCE", list(behaviours))
+    monkeypatch.setattr(ai_service, "AI_STRUCTURED_OUTPUT", False)
+    monkeypatch.setattr(ai_service, "AI_HEDGE_MAX_PARALLEL", 2)
+    monkeypatch.setattr(ai_service, "AI_HEDGE_DELAY_DEFAULT", hedge_delay)
+    monkeypatch.setattr(ai_service, "AI_HEDGE_DELAY_MIN", 0.0)
+    monkeypatch.setattr(ai_service, "_model_latencies", {})
+    monkeypatch.setattr(ai_service, "get_http_client", lambda: client)
+
+    async def scenario():
+        started_at = time.perf_counter()
+        try:
+            result = await ai_service._get_ai_response_hedged("Kapıyı aç", {"world_id": "dark_fantasy"})
+            elapsed = time.perf_counter() - started_at
+            # Let the cancelled requests unwind
+            for _ in range(5):
+                await asyncio.sleep(0)
+            return result, elapsed
+        finally:
+            await client.aclose()
+
+    result, elapsed = asyncio.run(scenario())
+    return result, requested, cancelled, elapsed
+
+
+def _answer(delay: float = 0.0, status: int = 200):
+    async def behaviour():
+        await asyncio.sleep(delay)
+        return httpx.Response(status, json={"choices": [{"message": {"content": ANSWER}}]})
+    return behaviour
+
+
+def test_hedged_request_wins_and_slow_primary_is_cancelled(monkeypatch):
+    result, requested, cancelled, elapsed = _run(
+        monkeypatch, {SLOW: _answer(delay=5.0), FAST: _answer(), SPARE: _answer()}, hedge_delay=0.05)
+
+    assert result["text"].startswith("Kapı gıcırdayarak açıldı.")
+    assert requested == [SLOW, FAST]
+    assert cancelled == [SLOW]
+    assert elapsed < 1.0
+
+
+def test_fast_primary_answers_without_hedging(monkeypatch):
+    result, requested, cancelled, _ = _run(
+        monkeypatch, {FAST: _answer(), SLOW: _answer(delay=5.0)}, hedge_delay=1.0)
+
+    assert result is not None
+    assert requested == [FAST]
+    assert cancelled == []
+
+
+def test_failed_models_fall_through_to_the_next_without_waiting(monkeypatch):
+    async def broken():
+        raise RuntimeError("sağlayıcı çöktü")
+
+    result, requested, cancelled, elapsed = _run(
+        monkeypatch, {SLOW: _answer(status=500), FAST: broken, SPARE: _answer()}, hedge_delay=5.0)
+
+    assert result is not None
+    assert requested == [SLOW, FAST, SPARE]
+    assert cancelled == []
+    # Failures are replaced right away, not after the hedge delay
+    assert elapsed < 1.0
+
+
+def test_all_models_failing_returns_none(monkeypatch):
+    result, requested, _, _ = _run(
+        monkeypatch, {SLOW: _answer(status=500), FAST: _answer(status=502)}, hedge_delay=5.0)
+
+    assert result is None
+    assert requested == [SLOW, FAST]
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""Rate limiting, Retry-After cooldowns and load shedding of model calls (services/ai_scheduler.py)."""
+import asyncio
+import time
+from email.utils import formatdate
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from backend.api import game_routes
+from backend.db import crud, database, models
+from backend.services import ai_scheduler as scheduler_module
+from backend.services import game_service
+from backend.services.ai_scheduler import AIOverloadedError, AIScheduler, _ModelLimiter, _parse_retry_after
+from backend.services.session_cache import SessionStateCache
+
+MODEL = "test/model"
+
+
+def test_token_bucket_refills_at_the_configured_rate_up_to_the_burst(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "AI_RATE_LIMIT_PER_MINUTE", 60.0) # One token per second
+    monkeypatch.setattr(scheduler_module, "AI_RATE_LIMIT_BURST", 2)
+
+    async def scenario():
+        limiter = _ModelLimiter()
+        start = limiter.updated_at
+        waits = [limiter.reserve(start), limiter.reserve(start), limiter.reserve(start)]
+        # Half a second later the third token is half refilled
+        waits.append(limiter.reserve(start + 0.5))
+        # A long idle period refills the bucket to the burst, not beyond it
+        limiter.reserve(start + 100.0)
+        tokens_after_idle = limiter.tokens
+        return waits, tokens_after_idle
+
+    waits, tokens_after_idle = asyncio.run(scenario())
+
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(1.0)
+    assert waits[3] == pytest.approx(1.5)
+    assert tokens_after_idle == pytest.approx(1.0)
+
+
+def test_retry_after_is_parsed_from_seconds_and_http_dates():
+    assert _parse_retry_after("7") == 7.0
+    assert _parse_retry_after("-3") == 0.0
+    assert _parse_retry_after(formatdate(time.time() + 30, usegmt=True)) == pytest.approx(30, abs=2)
+    assert _parse_retry_after(formatdate(time.time() - 30, usegmt=True)) == 0.0
+    assert _parse_retry_after("yarın") is None
+    assert _parse_retry_after(None) is None
+
+
+def test_429_cooldown_uses_the_default_and_is_capped(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "AI_RETRY_AFTER_DEFAULT", 10.0)
+    monkeypatch.setattr(scheduler_module, "AI_RETRY_AFTER_MAX", 60.0)
+    scheduler = AIScheduler()
+
+    async def scenario():
+        return (scheduler.penalize(MODEL, {}), scheduler.penalize(MODEL, {"retry-after": "3600"}),
+                scheduler.get_stats()["cooldowns"])
+
+    default, capped, cooldowns = asyncio.run(scenario())
+
+    assert (default, capped) == (10.0, 60.0)
+    assert cooldowns[MODEL] == pytest.approx(60.0, abs=1)
+
+
+def test_full_queue_is_shed_with_503_and_retry_after(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "AI_QUEUE_MAX", 0)
+    monkeypatch.setattr(game_routes, "ai_scheduler", AIScheduler())
+    app = FastAPI()
+    app.include_router(game_routes.router)
+    app.dependency_overrides[game_routes.get_db] = lambda: None
+
+    payload = {"session_id": "s1", "choice_id": "A", "choice_text": "Kapıyı aç"}
+    with TestClient(app) as client:
+        response = client.post("/make_choice", json=payload)
+        stream_response = client.post("/make_choice/stream", json=payload)
+
+    for shed in (response, stream_response):
+        assert shed.status_code == 503
+        assert int(shed.headers["retry-after"]) >= 1
+
+
+def test_global_slot_timeout_raises_overloaded(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "AI_MAX_CONCURRENT", 1)
+    monkeypatch.setattr(scheduler_module, "AI_QUEUE_TIMEOUT", 0.05)
+    monkeypatch.setattr(scheduler_module, "AI_RATE_LIMIT_PER_MINUTE", 0)
+    scheduler = AIScheduler()
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot(MODEL):
+                await release.wait()
+
+        task = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(AIOverloadedError):
+                async with scheduler.slot("other/model"):
+                    pass
+        finally:
+            release.set()
+            await task
+        return scheduler.get_stats()
+
+    stats = asyncio.run(scenario())
+
+    assert stats["queue_timeouts"] == 1
+    assert stats["waiting"] == stats["in_flight"] == 0
+
+
+def test_shed_turn_leaves_no_skill_roll_in_history(tmp_path, monkeypatch):
+    engine = database.create_db_engine(f"sqlite+pysqlite:///{tmp_path / 'shed.db'}", "balanced")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    choice = {"id": "A", "text": "Duvara tırman", "skill_check_stat": "dexterity", "skill_check_dc": 12}
+    session_id = crud.create_player_state(db, {"stats": {"dexterity": 14}, "history": [
+        {"event_type": "game_start", "text": "Başla"},
+        {"event_type": "ai_response", "new_situation_text": "Yüksek bir duvar.", "ai_choices": [choice]},
+    ]}).session_id
+    monkeypatch.setattr(game_service, "session_cache", SessionStateCache(enabled=False))
+    monkeypatch.setattr(game_service.speculation, "enabled", False)
+    responses = [AIOverloadedError(), {"text": "Tırmandın.", "raw_ai_response": "Tırmandın.", "choices": []}]
+
+    async def get_ai_response(prompt_text, player_context=None):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(game_service, "get_ai_response", get_ai_response)
+
+    async def scenario():
+        with pytest.raises(AIOverloadedError):
+            await game_service._process_player_action(db, session_id, "A", choice["text"])
+        shed_seq = crud.get_last_turn_seq(db, session_id)
+        # The retry still finds the skill check choice and rolls it
+        retried = await game_service._process_player_action(db, session_id, "A", choice["text"])
+        return shed_seq, retried
+
+    try:
+        shed_seq, retried = asyncio.run(scenario())
+        event_types = [event["event_type"] for event in crud.get_turn_events(db, session_id)]
+    finally:
+        db.close()
+        database.shutdown_db_executor()
+        engine.dispose()
+
+    assert shed_seq == 2
+    assert retried.skill_check_result is not None
+    assert event_types == ["game_start", "ai_response", "skill_check_attempt", "ai_response"]
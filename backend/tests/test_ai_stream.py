@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""A narration stream that breaks off after tokens were shown is an error, not a result (ai_service.stream_ai_response)."""
+import asyncio
+
+import httpx
+
+from backend.services import ai_service
+
+MODEL = "test/model"
+
+
+def _chunk(text: str) -> bytes:
+    return b"data: " + ai_service.json_codec.dumps_bytes({"choices": [{"delta": {"content": text}}]}) + b"\n\n"
+
+
+async def _broken_body():
+    yield _chunk("Karanlık koridorda ")
+    yield _chunk("bir ses duydun ve ")
+    raise httpx.ReadError("connection reset")
+
+
+def _collect(monkeypatch, body):
+    cached = []
+
+    async def cache_get(player_context):
+        return None
+
+    async def cache_put(player_context, response):
+        cached.append(response)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=body())))
+    monkeypatch.setattr(ai_service, "OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(ai_service, "MODEL_PREFERENCE", [MODEL])
+    monkeypatch.setattr(ai_service, "get_http_client", lambda: client)
+    monkeypatch.setattr(ai_service.response_cache, "get", cache_get)
+    monkeypatch.setattr(ai_service.response_cache, "put", cache_put)
+
+    async def scenario():
+        try:
+            return [event async for event in ai_service.stream_ai_response("Kapıyı aç", {"session": "s1"})]
+        finally:
+            await client.aclose()
+
+    return asyncio.run(scenario()), cached
+
+
+def test_truncated_stream_yields_error_and_is_not_cached(monkeypatch):
+    events, cached = _collect(monkeypatch, _broken_body)
+
+    assert [event["type"] for event in events if event["type"] != "token"] == ["error"]
+    assert any(event["type"] == "token" for event in events)
+    assert cached == []
+
+
+def test_complete_stream_is_parsed_and_cached(monkeypatch):
+    async def body():
+        yield _chunk("Karanlık koridorda bir ses duydun.\n\nYeni Seçenekler:\nA) Sese doğru yürü.\n")
+        yield b"data: [DONE]\n\n"
+
+    events, cached = _collect(monkeypatch, body)
+
+    assert events[-1]["type"] == "done"
+    assert cached == [events[-1]["result"]]
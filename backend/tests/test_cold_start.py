@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Importing the app does no startup work: no database access, no .env parsing (backend/main.py, tools/importtime.py)."""
+import os
+import subprocess
+import sys
+
+from backend.tools.importtime import package_totals, parse_importtime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_importing_the_app_does_not_touch_the_database(tmp_path):
+    database_path = tmp_path / "cold.db"
+    env = dict(os.environ, DATABASE_URL=f"sqlite+pysqlite:///{database_path}", AI_CACHE_PATH=str(tmp_path / "ai_cache.db"),
+               LOG_LEVEL="WARNING")
+    script = "import sys, backend.main; print('dotenv' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+
+    assert output.strip().splitlines()[-1] == "False"
+    assert not database_path.exists()
+    assert not (tmp_path / "ai_cache.db").exists()
+
+
+def test_importtime_output_is_parsed_and_grouped():
+    output = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |     numpy._core",
+        "import time:       300 |        420 |   numpy",
+        "import time:        50 |         50 |     backend.services.skill_odds",
+        "import time:        30 |         80 |   backend.services",
+        "import time:        10 |        510 | backend.main",
+        "Traceback lines and other stderr output are ignored",
+    ])
+
+    entries = parse_importtime(output)
+
+    assert [(entry.module, entry.self_us, entry.cumulative_us, entry.depth) for entry in entries][:2] == [
+        ("numpy._core", 120, 120, 2), ("numpy", 300, 420, 1),
+    ]
+    assert len(entries) == 5
+    assert package_totals(entries) == {"numpy": 420, "backend.services": 80, "backend.main": 10}
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Story context stays within the token budget by dropping and summarizing old turns (services/context_builder.py)."""
+import asyncio
+from types import SimpleNamespace
+
+from backend.db import database
+from backend.services import context_builder
+
+
+def _session(turns: int, summary: str = "", summary_seq: int = 0) -> SimpleNamespace:
+    events = [(1, {"event_type": "game_start", "text": "Bir köyde uyandın."})]
+    for seq in range(2, turns + 2):
+        events.append((seq, {"event_type": "ai_response", "choice_made": f"Eylem {seq}",
+                             "new_situation_text": f"Tur {seq}. " + "Rüzgâr esiyor ve yol uzuyor. " * 8}))
+    return SimpleNamespace(session_id="s1", world_id="dark_fantasy", recent_events=events, last_event=events[-1][1],
+                           last_seq=events[-1][0], summary=summary, summary_seq=summary_seq)
+
+
+def _tokens(context: dict) -> int:
+    return context_builder.estimate_tokens(context["story_summary"]) + context_builder.estimate_tokens(context["recent_turns"])
+
+
+def test_over_budget_drops_oldest_turns_then_clips_the_summary(monkeypatch):
+    session = _session(turns=8, summary="Köylüler seni uyardı. " * 40, summary_seq=1)
+
+    monkeypatch.setattr(context_builder, "CONTEXT_TOKEN_BUDGET", 100_000)
+    full = context_builder.build_history_context(session)
+    monkeypatch.setattr(context_builder, "CONTEXT_TOKEN_BUDGET", 400)
+    trimmed = context_builder.build_history_context(session, reserved_text="Şu anki durum. " * 20)
+    monkeypatch.setattr(context_builder, "CONTEXT_TOKEN_BUDGET", 100)
+    clipped = context_builder.build_history_context(session)
+
+    full_lines = full["recent_turns"].split("\n")
+    # The latest event is the current situation and is never repeated as a past turn
+    assert len(full_lines) == 7 and "Eylem 9" not in full["recent_turns"]
+    trimmed_lines = trimmed["recent_turns"].split("\n")
+    assert 0 < len(trimmed_lines) < len(full_lines)
+    assert trimmed_lines == full_lines[-len(trimmed_lines):] # Newest turns survive
+    assert trimmed["story_summary"] == session.summary
+    assert _tokens(trimmed) <= 400 - context_builder.estimate_tokens("Şu anki durum. " * 20)
+    assert clipped["recent_turns"] == ""
+    assert clipped["story_summary"].endswith("…") and _tokens(clipped) <= 100
+
+
+def test_old_turns_are_folded_into_the_summary(monkeypatch):
+    saved = []
+    monkeypatch.setattr(context_builder, "CONTEXT_SUMMARY_MODE", "extractive")
+    monkeypatch.setattr(context_builder, "CONTEXT_RECENT_TURNS", 4)
+    monkeypatch.setattr(context_builder, "CONTEXT_SUMMARY_EVERY", 5)
+    monkeypatch.setattr(context_builder, "_save_summary", lambda *args: saved.append(args))
+    session = _session(turns=5)
+
+    async def scenario():
+        context_builder.maybe_schedule_summary(session) # Only 2 events outside the verbatim window yet
+        assert not context_builder._summary_tasks
+        session.recent_events.extend(_session(turns=9).recent_events[6:])
+        session.last_seq = session.recent_events[-1][0]
+        session.last_event = session.recent_events[-1][1]
+        before = context_builder.build_history_context(session)
+        context_builder.maybe_schedule_summary(session)
+        await context_builder.wait_for_summaries(timeout=5)
+        return before
+
+    try:
+        before = asyncio.run(scenario())
+    finally:
+        database.shutdown_db_executor()
+    after = context_builder.build_history_context(session)
+
+    assert saved == [("s1", session.summary, 6)]
+    assert session.summary_seq == 6 and "Eylem 6" in session.summary
+    assert before["story_summary"] == ""
+    assert len(after["recent_turns"].split("\n")) == 3
+    assert "Eylem 6" not in after["recent_turns"] and "Eylem 7" in after["recent_turns"]
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Blocking database work runs on the DB executor and leaves the event loop free (database.run_db)."""
+import asyncio
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from backend.db import crud, database, models
+
+SLOW_CALL_SECONDS = 0.3
+TICK_SECONDS = 0.01
+
+
+def _slow_write(db, session_id):
+    # A commit followed by a stall, like a write waiting on SQLite's lock
+    crud.append_turn_event(db, session_id, {"event_type": "ai_response", "new_situation_text": "Yavaş yazım"})
+    time.sleep(SLOW_CALL_SECONDS)
+    return crud.get_last_turn_seq(db, session_id)
+
+
+def test_event_loop_keeps_ticking_during_slow_db_call(tmp_path):
+    engine = database.create_db_engine(f"sqlite+pysqlite:///{tmp_path / 'executor.db'}", "balanced")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    session_id = crud.create_player_state(db, {"history": [{"event_type": "game_start", "text": "Başla"}]}).session_id
+
+    async def scenario():
+        ticks = []
+        done = asyncio.Event()
+
+        async def heartbeat():
+            while not done.is_set():
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(TICK_SECONDS)
+
+        beat = asyncio.create_task(heartbeat())
+        await asyncio.sleep(0)
+        try:
+            seq = await database.run_db(_slow_write, db, session_id)
+        finally:
+            done.set()
+            await beat
+        return seq, ticks
+
+    try:
+        seq, ticks = asyncio.run(scenario())
+    finally:
+        db.close()
+        database.shutdown_db_executor()
+        engine.dispose()
+
+    assert seq == 2
+    # A blocked loop would tick once before the call and once after it
+    assert len(ticks) >= SLOW_CALL_SECONDS / TICK_SECONDS / 3
+    assert max(later - earlier for earlier, later in zip(ticks, ticks[1:])) < SLOW_CALL_SECONDS / 2
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""Turn events decode to exactly what was stored, in every encoding a row may have (db/event_codec.py)."""
+import json
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from backend.core import json_codec
+from backend.db import crud, event_codec, models
+from backend.db.database import create_db_engine
+from backend.services.narration_parser import parse_narration
+from backend.tools.bench_events import build_turns
+
+PAYLOADS = [{k: v for k, v in event.items() if k != "event_type"} for turn in build_turns() for event in turn]
+
+RAW_NARRATION = ("Sis, yıkık kulenin etrafında yoğunlaştı.\n  Uzakta bir kurt uludu.\n\n"
+                 "Yeni Seçenekler:\nA) Kuleye gir. (Çeviklik DC12)\nB) Geri dön.\n")
+
+
+def _body(record: bytes) -> dict:
+    assert record[1] & (event_codec.FLAG_ZLIB | event_codec.FLAG_ZSTD) == 0
+    return json_codec.loads(record[2:])
+
+
+@pytest.mark.parametrize("compression", ["zlib", "none"] + (["zstd"] if event_codec.zstandard is not None else []))
+def test_every_generated_event_round_trips(compression, monkeypatch):
+    monkeypatch.setattr(event_codec, "EVENT_COMPRESSION", compression)
+
+    mismatched = [payload for payload in PAYLOADS
+                  if event_codec.decode_payload(event_codec.encode_payload(payload)) != payload]
+
+    assert mismatched == []
+
+
+def test_parsed_story_text_is_stored_as_offsets_into_the_raw_answer(monkeypatch):
+    monkeypatch.setattr(event_codec, "EVENT_COMPRESSION", "none")
+    parsed = parse_narration(RAW_NARRATION)
+    payload = {"choice_made": "Yürü", "ai_raw_text": parsed["raw_ai_response"],
+               "new_situation_text": parsed["text"], "ai_choices": parsed["choices"]}
+
+    record = event_codec.encode_payload(payload)
+    body = _body(record)
+
+    assert record[0] == event_codec.FORMAT_VERSION
+    assert "N" in body and "n" not in body
+    assert body["h"][0] == ["A", "Kuleye gir.", "dexterity", 12]
+    assert event_codec.decode_payload(record) == payload
+
+
+def test_fields_named_like_codes_keep_their_own_keys(monkeypatch):
+    monkeypatch.setattr(event_codec, "EVENT_COMPRESSION", "none")
+    payload = {"r": "kısa anahtar", "text": "Işık söndü."}
+
+    record = event_codec.encode_payload(payload)
+
+    assert not record[1] & event_codec.FLAG_SHORT_KEYS
+    assert _body(record) == payload
+    assert event_codec.decode_payload(record) == payload
+
+
+def test_legacy_json_rows_still_decode():
+    payload = {"text": "Şövalye kılıcını çekti.", "world_id": "dark_fantasy"}
+
+    assert event_codec.decode_payload(json.dumps(payload)) == payload
+    assert event_codec.decode_payload(json.dumps(payload).encode("utf-8")) == payload
+    assert event_codec.decode_payload(payload) == payload
+    assert event_codec.decode_payload(None) == {}
+
+
+def test_database_rows_of_both_formats_load_as_events(tmp_path):
+    engine = create_db_engine(f"sqlite+pysqlite:///{tmp_path / 'events.db'}", "balanced")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    start = {"event_type": "game_start", "text": "Kuzey kapısında uyandın.", "world_id": "dark_fantasy"}
+    legacy = {"choice_made": "Kapıyı aç", "new_situation_text": "Kapı gıcırdadı."}
+    try:
+        session_id = crud.create_player_state(db, {"history": [start]}).session_id
+        # A row written by the old JSON column
+        db.execute(text("INSERT INTO turn_events (session_id, seq, event_type, payload) VALUES (:sid, 2, 'ai_response', :payload)"),
+                   {"sid": session_id, "payload": json.dumps(legacy)})
+        db.commit()
+        crud.append_turn_event(db, session_id, {"event_type": "ai_response", **PAYLOADS[0]})
+        db.expire_all()
+        events = crud.get_turn_events(db, session_id)
+    finally:
+        db.close()
+        engine.dispose()
+
+    assert events == [start, {"event_type": "ai_response", **legacy}, {"event_type": "ai_response", **PAYLOADS[0]}]
+
+
+def test_choices_with_a_roll_mode_are_packed_and_round_trip(monkeypatch):
+    monkeypatch.setattr(event_codec, "EVENT_COMPRESSION", "none")
+    choices = [{"id": "A", "text": "Gizlen", "skill_check_stat": "dexterity", "skill_check_dc": 14, "skill_check_mode": "advantage"},
+               {"id": "B", "text": "Koş"}]
+    payload = {"ai_choices": choices}
+
+    record = event_codec.encode_payload(payload)
+
+    assert _body(record)["h"] == [["A", "Gizlen", "dexterity", 14, "advantage"], ["B", "Koş"]]
+    assert event_codec.decode_payload(record) == payload
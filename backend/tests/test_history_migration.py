@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Legacy PlayerState.history lists move to turn_events exactly once (crud.migrate_history_to_turn_events)."""
+from sqlalchemy.orm import sessionmaker
+
+from backend.db import crud, models
+from backend.db.database import create_db_engine
+
+LEGACY_HISTORY = [
+    {"event_type": "game_start", "text": "Başla"},
+    {"event_type": "ai_response", "choice_made": "Kapıyı aç", "new_situation_text": "Kapı açıldı."},
+    "bozuk kayıt", # Non-dict entries of old databases are skipped
+]
+
+
+def test_migration_is_idempotent(tmp_path):
+    engine = create_db_engine(f"sqlite+pysqlite:///{tmp_path / 'legacy.db'}", "balanced")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    for session_id in ("legacy-1", "legacy-2", "legacy-3"):
+        db.add(models.PlayerState(session_id=session_id, player_name="Eski", history=list(LEGACY_HISTORY)))
+    # Already has turn_events (e.g. written after an interrupted migration): only the column is cleared
+    db.add(models.PlayerState(session_id="partial", player_name="Yarım", history=list(LEGACY_HISTORY)))
+    db.add(crud._make_turn_event("partial", 1, {"event_type": "game_start", "text": "Yeni başlangıç"}))
+    db.commit()
+    current = crud.create_player_state(db, {"history": [{"event_type": "game_start", "text": "Güncel"}]}).session_id
+
+    try:
+        first = crud.migrate_history_to_turn_events(db, batch_size=2)
+        second = crud.migrate_history_to_turn_events(db, batch_size=2)
+        events = {session_id: crud.get_turn_events(db, session_id)
+                  for session_id in ("legacy-1", "legacy-2", "legacy-3", "partial", current)}
+        histories = [state.history for state in db.query(models.PlayerState).all()]
+    finally:
+        db.close()
+        engine.dispose()
+
+    assert (first, second) == (4, 0)
+    for session_id in ("legacy-1", "legacy-2", "legacy-3"):
+        assert events[session_id] == LEGACY_HISTORY[:2]
+    assert events["partial"] == [{"event_type": "game_start", "text": "Yeni başlangıç"}]
+    assert events[current] == [{"event_type": "game_start", "text": "Güncel"}]
+    assert histories == [[]] * 5
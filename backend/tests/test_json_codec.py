@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Turkish game data survives the JSON codec, JSON columns and SSE frames unchanged (core/json_codec.py)."""
+import json
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import sessionmaker
+
+from backend.api.game_routes import _format_sse
+from backend.core import json_codec
+from backend.data import characters, scenarios, worlds
+from backend.db import models
+from backend.db.database import create_db_engine
+from backend.models.game_models import MakeChoiceResponse, SkillCheckResultModel
+
+BACKENDS = ["stdlib"] + (["orjson"] if json_codec.orjson is not None else [])
+
+GAME_DATA = {
+    "starting_scenarios": scenarios.STARTING_SCENARIOS,
+    "initial_scenarios": scenarios.INITIAL_SCENARIOS_BY_WORLD,
+    "class_base_stats": characters.CLASS_BASE_STATS,
+    "world_names": {world_id: worlds.get_world_name(world_id) for world_id in scenarios.INITIAL_SCENARIOS_BY_WORLD},
+    "world_lore": {world_id: worlds.get_world_lore_summary(world_id) for world_id in scenarios.INITIAL_SCENARIOS_BY_WORLD},
+}
+
+
+@pytest.fixture(params=BACKENDS, autouse=True)
+def backend(request, monkeypatch):
+    monkeypatch.setattr(json_codec, "BACKEND", request.param)
+    return request.param
+
+
+def test_game_data_round_trips_and_stays_readable():
+    encoded = json_codec.dumps(GAME_DATA)
+
+    assert json_codec.loads(encoded) == GAME_DATA
+    assert json_codec.loads(json_codec.dumps_bytes(GAME_DATA)) == GAME_DATA
+    assert json.loads(encoded) == GAME_DATA
+    assert json_codec.loads(json.dumps(GAME_DATA)) == GAME_DATA # Older ASCII-escaped rows
+    assert "\\u" not in encoded
+
+
+def test_player_state_json_columns_round_trip(tmp_path):
+    engine = create_db_engine(f"sqlite+pysqlite:///{tmp_path / 'json.db'}", "balanced")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    scenario = GAME_DATA["starting_scenarios"]["animal_kingdom"]["vargar"]
+    stats = {"güç": 14, "çeviklik": 8, "İsim": "Işıl Öztürk"}
+    try:
+        db.add(models.PlayerState(session_id="roundtrip", stats=stats, inventory=[scenario["text"]],
+                                  skills=scenario["choices"], history=[]))
+        db.commit()
+        db.expunge_all()
+        state = db.get(models.PlayerState, "roundtrip")
+        assert (state.stats, state.inventory, state.skills) == (stats, [scenario["text"]], scenario["choices"])
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def _sse_data(frame: str):
+    return json.loads(frame.split("data: ", 1)[1])
+
+
+def test_sse_frames_carry_the_same_data_as_jsonable_encoder():
+    scenario = GAME_DATA["starting_scenarios"]["dark_fantasy"]["ashen_legion"]
+    response = MakeChoiceResponse(
+        text=scenario["text"], choices=scenario["choices"],
+        player_info_for_card={"name": "Işıl", "class": "ashen_legion", "health": 90},
+        skill_check_result=SkillCheckResultModel(stat_checked="strength", dc=14, roll=20, modifier=2, total_roll=22,
+                                                 outcome="KRİTİK BAŞARI"),
+    )
+    for event, payload in (("result", response), ("skill_check", response.skill_check_result),
+                           ("token", {"text": scenario["text"]}), ("error", {"error": "Geçersiz oturum"})):
+        assert _sse_data(_format_sse(event, payload)) == jsonable_encoder(payload), event
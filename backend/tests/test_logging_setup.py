@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Queued JSON logging: records are written as JSON lines off the caller's thread and flushed on shutdown (core/logging_setup.py)."""
+import io
+import json
+import logging
+
+from backend.core import logging_setup
+
+
+def _configure(monkeypatch, **config) -> io.StringIO:
+    output = io.StringIO()
+    backend_logger = logging.getLogger("backend")
+    monkeypatch.setattr(backend_logger, "handlers", list(backend_logger.handlers))
+    monkeypatch.setattr(backend_logger, "propagate", backend_logger.propagate)
+    monkeypatch.setattr(backend_logger, "level", backend_logger.level)
+    monkeypatch.setattr(logging_setup, "_listener", None)
+    monkeypatch.setattr(logging_setup, "_dropped_records", 0)
+    monkeypatch.setattr(logging_setup.sys, "stdout", output)
+    monkeypatch.setattr(logging_setup, "LOG_FORMAT", "json")
+    monkeypatch.setattr(logging_setup, "LOG_LEVEL", "DEBUG")
+    for name, value in config.items():
+        monkeypatch.setattr(logging_setup, name, value)
+    logging_setup.configure_logging()
+    return output
+
+
+def test_queued_records_are_json_lines_flushed_on_shutdown(monkeypatch):
+    output = _configure(monkeypatch, LOG_DEBUG_SAMPLE_RATE=0.0)
+    logger = logging.getLogger("backend.services.test")
+
+    token = logging_setup.request_id_var.set("req-1")
+    try:
+        logging_setup.bind_session("s1")
+        for index in range(500):
+            logger.info("Tur %d işlendi", index, extra={"model": "test/model"})
+        logger.debug("Örneklenen ayrıntı", extra={"sampled": True}) # Dropped at a 0% sample rate
+        try:
+            raise ValueError("bozuk cevap")
+        except ValueError:
+            logger.exception("Model hatası")
+    finally:
+        logging_setup.bind_session(None)
+        logging_setup.request_id_var.reset(token)
+    # Everything still queued is written before shutdown returns
+    logging_setup.shutdown_logging()
+
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert len(lines) == 501
+    assert lines[0]["msg"] == "Tur 0 işlendi" and lines[499]["msg"] == "Tur 499 işlendi"
+    assert {key: lines[0][key] for key in ("level", "logger", "request_id", "session_id", "model")} == {
+        "level": "INFO", "logger": "backend.services.test", "request_id": "req-1", "session_id": "s1", "model": "test/model",
+    }
+    assert lines[0]["ts"].endswith("Z")
+    assert lines[-1]["level"] == "ERROR" and "ValueError: bozuk cevap" in lines[-1]["exc"]
+    assert logging_setup._listener is None
+
+
+def test_full_queue_drops_records_instead_of_blocking(monkeypatch):
+    output = _configure(monkeypatch, LOG_QUEUE_SIZE=3)
+    logger = logging.getLogger("backend.services.test")
+    # Stop the writer thread so nothing drains the queue while logging
+    logging_setup._listener.stop()
+    for index in range(10):
+        logger.warning("Kayıt %d", index)
+    dropped = logging_setup.get_dropped_records()
+    logging_setup._listener.start()
+    logging_setup.shutdown_logging()
+
+    assert dropped == 7
+    assert [json.loads(line)["msg"] for line in output.getvalue().splitlines()] == ["Kayıt 0", "Kayıt 1", "Kayıt 2"]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Versioned schema migrations run each step once and bring pre-versioning databases up to date (db/migrations.py)."""
+from sqlalchemy import inspect
+from sqlalchemy.orm import sessionmaker
+
+from backend.db import crud, migrations, models
+from backend.db.database import create_db_engine
+
+
+def test_new_database_is_created_and_versioned(tmp_path):
+    engine = create_db_engine(f"sqlite+pysqlite:///{tmp_path / 'new.db'}", "balanced")
+    try:
+        assert migrations.get_schema_version(engine) == 0
+        assert migrations.migrate(engine) == migrations.LATEST_VERSION
+        tables = set(inspect(engine).get_table_names())
+        assert migrations.migrate(engine) == migrations.LATEST_VERSION
+    finally:
+        engine.dispose()
+
+    assert set(models.Base.metadata.tables) <= tables
+
+
+def test_applied_steps_are_skipped(tmp_path, monkeypatch):
+    engine = create_db_engine(f"sqlite+pysqlite:///{tmp_path / 'skip.db'}", "balanced")
+    calls = []
+    steps = [(version, description, lambda engine, version=version: calls.append(version))
+             for version, description, _ in migrations.MIGRATIONS]
+    monkeypatch.setattr(migrations, "MIGRATIONS", steps)
+    try:
+        migrations.migrate(engine)
+        migrations.migrate(engine)
+    finally:
+        engine.dispose()
+
+    assert calls == [version for version, _, _ in migrations.MIGRATIONS]
+
+
+def test_unversioned_legacy_database_is_upgraded(tmp_path):
+    engine = create_db_engine(f"sqlite+pysqlite:///{tmp_path / 'legacy.db'}", "balanced")
+    # A database from before versioning: tables exist, history still in the legacy column
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    db.add(models.PlayerState(session_id="legacy", player_name="Eski", history=[{"event_type": "game_start", "text": "Başla"}]))
+    db.commit()
+    try:
+        version = migrations.migrate(engine)
+        events = crud.get_turn_events(db, "legacy")
+    finally:
+        db.close()
+        engine.dispose()
+
+    assert version == migrations.LATEST_VERSION
+    assert events == [{"event_type": "game_start", "text": "Başla"}]
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""The narration parser against the corpus of real model outputs (tools/parser_corpus.json)."""
+import random
+
+import pytest
+
+from backend.services.narration_parser import NarrationStreamSplitter, parse_narration
+from backend.tools.bench_parser import load_corpus
+
+CORPUS = load_corpus()
+FUZZ_ROUNDS = 2000
+
+# Fragments the fuzzer splices into corpus entries
+_FUZZ_FRAGMENTS = ["\n", "\r\n", "**", "*", "A)", "1.", " (Güç DC", "15)", ").", ":", "Yeni Seçenekler:", "  ", "\t", "ı", "İ", "(", "DC"]
+
+
+@pytest.mark.parametrize("entry", CORPUS, ids=[entry["name"] for entry in CORPUS])
+def test_corpus_entry_parses_to_expected_output(entry):
+    result = parse_narration(entry["input"])
+
+    assert {"text": result["text"], "choices": result["choices"]} == entry["expected"]
+
+
+@pytest.mark.parametrize("entry", CORPUS, ids=[entry["name"] for entry in CORPUS])
+def test_streamed_story_never_contains_the_choice_block(entry):
+    result = parse_narration(entry["input"])
+    splitter = NarrationStreamSplitter()
+    streamed = "".join(splitter.feed(entry["input"][i:i + 7]) for i in range(0, len(entry["input"]), 7))
+
+    leaked = [choice["text"] for choice in result["choices"]
+              if choice["text"] in streamed and choice["text"] not in result["text"]]
+    assert leaked == []
+
+
+def test_mutated_corpus_entries_parse_without_breaking_invariants():
+    rng = random.Random(1)
+    for _ in range(FUZZ_ROUNDS):
+        text = rng.choice(CORPUS)["input"]
+        for _mutation in range(rng.randint(1, 5)):
+            position = rng.randint(0, len(text))
+            if rng.random() < 0.3 and text:
+                text = text[:position] + text[position + rng.randint(1, 10):]
+            else:
+                text = text[:position] + rng.choice(_FUZZ_FRAGMENTS) + text[position:]
+
+        result = parse_narration(text)
+
+        ids = [choice["id"] for choice in result["choices"]]
+        assert result["text"], f"empty story text for {text!r}"
+        assert ids == [chr(65 + i) for i in range(len(ids))], f"non-sequential ids for {text!r}"
+        assert all(choice["text"] for choice in result["choices"]), f"empty choice text for {text!r}"
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Two-tier AI response cache: memory, then SQLite, keyed on the narration inputs (services/response_cache.py)."""
+import asyncio
+
+from backend.db import database
+from backend.services import response_cache as cache_module
+from backend.services.response_cache import AIResponseCache, make_cache_key
+
+RESPONSE = {"text": "Orman sessiz.", "raw_ai_response": "Orman sessiz.", "choices": [{"id": "A", "text": "İlerle."}]}
+
+
+def _context(**overrides) -> dict:
+    context = {
+        "world_id": "dark_fantasy", "class": "Savaşçı", "stats": {"strength": 15, "dexterity": 10},
+        "current_scenario_text": "Karanlık bir ormandasın.", "story_summary": "", "recent_turns": "",
+        "action_kind": "choice", "last_choice_text": "Patikayı izle", "skill_check_outcome": None,
+    }
+    context.update(overrides)
+    return context
+
+
+def _run(scenario):
+    try:
+        return asyncio.run(scenario())
+    finally:
+        database.shutdown_db_executor()
+
+
+def test_memory_hit_then_sqlite_hit_after_restart(tmp_path):
+    path = str(tmp_path / "ai_cache.db")
+
+    async def scenario():
+        cache = AIResponseCache(enabled=True, path=path)
+        miss = await cache.get(_context())
+        await cache.put(_context(), RESPONSE)
+        memory_hit = await cache.get(_context())
+        cache.close()
+
+        # A new process only has the SQLite tier; the hit is promoted back to memory
+        restarted = AIResponseCache(enabled=True, path=path)
+        disk_hit = await restarted.get(_context())
+        promoted_hit = await restarted.get(_context())
+        stats = restarted.get_stats()
+        restarted.close()
+        return miss, memory_hit, disk_hit, promoted_hit, cache.get_stats(), stats
+
+    miss, memory_hit, disk_hit, promoted_hit, first_stats, restarted_stats = _run(scenario)
+
+    assert miss is None
+    assert memory_hit == disk_hit == promoted_hit == RESPONSE
+    assert (first_stats["misses"], first_stats["memory_hits"]) == (1, 1)
+    assert (restarted_stats["disk_hits"], restarted_stats["memory_hits"]) == (1, 1)
+
+
+def test_errors_and_choiceless_responses_are_not_stored(tmp_path):
+    async def scenario():
+        cache = AIResponseCache(enabled=True, path=str(tmp_path / "ai_cache.db"))
+        await cache.put(_context(), {"error": "Zaman aşımı"})
+        await cache.put(_context(), {"text": "Son.", "choices": []})
+        result = await cache.get(_context())
+        cache.close()
+        return result, cache.get_stats()["stores"]
+
+    assert _run(scenario) == (None, 0)
+
+
+def test_expired_entries_miss_in_both_tiers(tmp_path, monkeypatch):
+    path = str(tmp_path / "ai_cache.db")
+
+    async def scenario():
+        cache = AIResponseCache(enabled=True, path=path)
+        await cache.put(_context(), RESPONSE)
+        monkeypatch.setattr(cache_module, "AI_CACHE_TTL", -1)
+        result = await cache.get(_context())
+        cache.close()
+        return result
+
+    assert _run(scenario) is None
+
+
+def test_variant_pool_must_fill_before_serving(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "AI_CACHE_VARIANTS", 2)
+    other = {**RESPONSE, "text": "Rüzgâr uğulduyor."}
+
+    async def scenario():
+        cache = AIResponseCache(enabled=True, path=str(tmp_path / "ai_cache.db"))
+        await cache.put(_context(), RESPONSE)
+        partial = await cache.get(_context())
+        await cache.put(_context(), other)
+        served = {(await cache.get(_context()))["text"] for _ in range(30)}
+        cache.close()
+        return partial, served
+
+    partial, served = _run(scenario)
+
+    assert partial is None
+    assert served == {RESPONSE["text"], other["text"]}
+
+
+def test_key_ignores_formatting_but_changes_with_every_narration_input():
+    base = make_cache_key(_context())
+
+    assert make_cache_key(_context(last_choice_text="  patikayı   IZLE ")) == base
+    assert make_cache_key(_context(stats={"dexterity": 10, "strength": 15})) == base
+    for change in (
+        {"world_id": "cyberpunk"}, {"class": "Büyücü"}, {"stats": {"strength": 16, "dexterity": 10}},
+        {"current_scenario_text": "Bir mağaradasın."}, {"last_choice_text": "Geri dön"},
+        {"skill_check_outcome": "BAŞARILI"}, {"action_kind": "free_text"},
+        # Story context: after a few turns every session has its own key
+        {"story_summary": "Kurtlarla savaştın."}, {"recent_turns": "Oyuncu: Patikayı izle | Anlatıcı: Orman sessiz."},
+    ):
+        assert make_cache_key(_context(**change)) != base, change
+    assert make_cache_key(None) is None
+
+
+def test_disabled_cache_never_stores_or_serves(tmp_path):
+    async def scenario():
+        cache = AIResponseCache(enabled=False, path=str(tmp_path / "ai_cache.db"))
+        await cache.put(_context(), RESPONSE)
+        result = await cache.get(_context())
+        cache.close()
+        return result
+
+    assert _run(scenario) is None
+    assert not (tmp_path / "ai_cache.db").exists()
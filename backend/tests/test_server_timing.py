@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Per-request phase timings reach the Server-Timing header and /metrics (core/metrics.py)."""
+import asyncio
+import re
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.core import metrics
+
+# RFC 8673 entries as written by RequestTimings: name;dur=<milliseconds>
+_ENTRY = re.compile(r"^([A-Za-z0-9_-]+);dur=(\d+\.\d)$")
+
+
+def _timed_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(metrics.TimingMiddleware)
+
+    @app.get("/turn")
+    async def turn():
+        with metrics.span("db"):
+            await asyncio.sleep(0.01)
+        with metrics.span("ai"):
+            await asyncio.sleep(0.02)
+        with metrics.span("db"):
+            pass
+        return {"ok": True}
+
+    @app.get("/plain")
+    async def plain():
+        return {"ok": True}
+
+    return app
+
+
+def _parse(header: str) -> dict:
+    entries = {}
+    for entry in header.split(", "):
+        match = _ENTRY.match(entry)
+        assert match, f"malformed Server-Timing entry: {entry!r}"
+        entries[match.group(1)] = float(match.group(2))
+    return entries
+
+
+def test_server_timing_header_is_well_formed():
+    with TestClient(_timed_app()) as client:
+        response = client.get("/turn")
+        plain = client.get("/plain")
+
+    timings = _parse(response.headers["server-timing"])
+    assert list(timings) == ["db", "ai", "total"] # Repeated phases are summed into one entry
+    assert timings["db"] >= 10 and timings["ai"] >= 20
+    assert timings["total"] >= timings["db"] + timings["ai"]
+    assert response.headers["timing-allow-origin"] == "*"
+    # Requests without spans still report their total
+    assert list(_parse(plain.headers["server-timing"])) == ["total"]
+
+
+def test_request_duration_is_recorded_per_route_template():
+    with TestClient(_timed_app()) as client:
+        client.get("/turn")
+        client.get("/missing")
+
+    rendered = metrics.render_metrics()
+    assert 'rpg_http_request_seconds_count{method="GET",route="/turn",status="200"}' in rendered
+    assert 'route="unmatched",status="404"' in rendered
+    assert 'rpg_phase_seconds_count{phase="ai"}' in rendered
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""One unwritable session must not block write-behind flushing for the others (session_cache.flush)."""
+import asyncio
+
+from sqlalchemy.orm import sessionmaker
+
+from backend.db import crud, models
+from backend.db.database import create_db_engine
+from backend.services import session_cache as session_cache_module
+from backend.services.session_cache import SessionStateCache
+
+
+def test_failing_session_is_retried_alone_then_dropped(tmp_path, monkeypatch):
+    engine = create_db_engine(f"sqlite+pysqlite:///{tmp_path / 'flush.db'}", "balanced")
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(session_cache_module, "SessionLocal", Session)
+    monkeypatch.setattr(session_cache_module, "STATE_CACHE_FLUSH_MAX_ATTEMPTS", 2)
+
+    db = Session()
+    cache = SessionStateCache(enabled=True, durability="write_behind")
+    history = [{"event_type": "game_start", "text": "Başla"}]
+    good = crud.create_player_state(db, {"history": history})
+    bad = crud.create_player_state(db, {"history": history})
+    cache.put_created(good, history)
+    cache.put_created(bad, history)
+
+    async def scenario():
+        good_entry = await cache.get(db, good.session_id)
+        bad_entry = await cache.get(db, bad.session_id)
+        await cache.append_event(db, good_entry, {"event_type": "ai_response", "new_situation_text": "iyi"})
+        # seq 1 is already in the DB: this batch can never be written
+        bad_entry.pending_events.append((1, {"event_type": "ai_response", "new_situation_text": "bozuk"}))
+        first = await cache.flush()
+        assert cache.get_stats()["pending_events"] == 1
+        second = await cache.flush()
+        return first, second
+
+    try:
+        first, second = asyncio.run(scenario())
+        good_events = crud.get_turn_events(db, good.session_id)
+    finally:
+        db.close()
+        engine.dispose()
+
+    assert (first, second) == (1, 0)
+    assert [event.get("new_situation_text") for event in good_events] == [None, "iyi"]
+    stats = cache.get_stats()
+    assert stats["flush_failures"] == 2
+    assert stats["dropped_events"] == 1
+    assert stats["pending_events"] == 0
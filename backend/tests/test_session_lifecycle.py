@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Idle sessions are archived and deleted; sessions in memory or mid-turn are left alone (session_lifecycle.sweep)."""
+import asyncio
+import datetime
+import gzip
+import json
+
+from sqlalchemy.orm import sessionmaker
+
+from backend.db import crud, models
+from backend.db.database import create_db_engine
+from backend.services import session_lifecycle as lifecycle_module
+from backend.services.session_cache import SessionStateCache
+from backend.services.session_lifecycle import SessionLifecycle
+from backend.services.turn_coordinator import TurnCoordinator
+
+
+def test_sweep_skips_cached_and_active_sessions(tmp_path, monkeypatch):
+    engine = create_db_engine(f"sqlite+pysqlite:///{tmp_path / 'lifecycle.db'}", "balanced")
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    cache, coordinator = SessionStateCache(enabled=True), TurnCoordinator()
+    monkeypatch.setattr(lifecycle_module, "SessionLocal", Session)
+    monkeypatch.setattr(lifecycle_module, "session_cache", cache)
+    monkeypatch.setattr(lifecycle_module, "turn_coordinator", coordinator)
+    monkeypatch.setattr(lifecycle_module, "SESSION_ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(lifecycle_module, "SESSION_IDLE_TTL", 3600)
+
+    db = Session()
+    history = [{"event_type": "game_start", "text": "Kuzey kapısında uyandın."}]
+    expired, cached, mid_turn, fresh = (crud.create_player_state(db, {"history": history}).session_id for _ in range(4))
+    long_ago = lifecycle_module._utcnow() - datetime.timedelta(days=2)
+    db.query(models.PlayerState).filter(models.PlayerState.session_id.in_([expired, cached, mid_turn])).update(
+        {models.PlayerState.last_updated: long_ago}, synchronize_session=False
+    )
+    db.commit()
+    cache.put_created(crud.get_player_state(db, cached), history)
+
+    lifecycle = SessionLifecycle()
+
+    async def scenario():
+        async with coordinator.session_lock(mid_turn):
+            return await lifecycle.sweep()
+
+    try:
+        removed = asyncio.run(scenario())
+        remaining = {state.session_id for state in db.query(models.PlayerState)}
+        expired_events = crud.get_turn_events(db, expired)
+    finally:
+        db.close()
+        engine.dispose()
+
+    assert removed == 1
+    assert remaining == {cached, mid_turn, fresh}
+    assert expired_events == []
+    archives = list((tmp_path / "archive").glob("*.jsonl.gz"))
+    assert len(archives) == 1
+    with gzip.open(archives[0], "rt", encoding="utf-8") as archive:
+        sessions = [json.loads(line) for line in archive]
+    assert [session["player_state"]["session_id"] for session in sessions] == [expired]
+    assert sessions[0]["turn_events"][0]["text"] == "Kuzey kapısında uyandın."
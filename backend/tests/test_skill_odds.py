@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Skill-check odds tables against brute-force enumeration of the dice (services/skill_odds.py)."""
+import itertools
+
+import numpy as np
+import pytest
+
+from backend.services import game_service, skill_odds
+from backend.services.narration_parser import parse_choice
+
+STATS = range(skill_odds.MIN_STAT, skill_odds.MAX_STAT + 1)
+DCS = range(skill_odds.MIN_DC, skill_odds.MAX_DC + 1)
+
+
+def _enumerated_odds(stat_value: int, dc: int, mode: str):
+    """Exact probabilities by walking every die (1 face, or all 20x20 pairs with advantage/disadvantage)."""
+    if mode == "normal":
+        counted = [(face,) for face in range(1, 21)]
+    else:
+        counted = list(itertools.product(range(1, 21), repeat=2))
+    faces = [max(dice) if mode == "advantage" else min(dice) for dice in counted]
+    modifier = skill_odds.ability_modifier(stat_value)
+    success = sum(1 for face in faces if face == 20 or (face != 1 and face + modifier >= dc))
+    return {
+        "success": success / len(faces),
+        "critical_success": faces.count(20) / len(faces),
+        "critical_failure": faces.count(1) / len(faces),
+    }
+
+
+@pytest.mark.parametrize("mode", skill_odds.ROLL_MODES)
+def test_tables_match_enumeration_for_every_stat_and_dc(mode):
+    pairs = list(itertools.product(STATS, DCS))
+    batch = skill_odds.batch_odds((stat for stat, _ in pairs), (dc for _, dc in pairs), mode)
+
+    for index, (stat_value, dc) in enumerate(pairs):
+        expected = _enumerated_odds(stat_value, dc, mode)
+        single = skill_odds.odds(stat_value, dc, mode)
+        for name, probability in expected.items():
+            assert batch[name][index] == pytest.approx(probability), (mode, stat_value, dc, name)
+            assert single[name] == round(probability, 4), (mode, stat_value, dc, name)
+
+
+def test_out_of_range_values_are_clamped():
+    assert skill_odds.odds(99, 99) == skill_odds.odds(skill_odds.MAX_STAT, skill_odds.MAX_DC)
+    assert skill_odds.odds(-5, 0, "advantage") == skill_odds.odds(skill_odds.MIN_STAT, skill_odds.MIN_DC, "advantage")
+    assert np.all(skill_odds.batch_odds([99], [99])["success"] == 1 / 20)
+
+
+def test_choice_mode_reaches_the_annotation_and_the_roll(monkeypatch):
+    choice = parse_choice("Gölgelerden gizlice yaklaş (Çeviklik DC14, avantajlı)", "A")
+    stats = {"dexterity": 12}
+
+    annotated, = skill_odds.annotate_choices([choice], stats)
+
+    assert choice["skill_check_mode"] == "advantage"
+    assert annotated["success_chance"] == skill_odds.odds(12, 14, "advantage")["success"]
+    assert annotated["success_chance"] > skill_odds.odds(12, 14)["success"]
+
+    dice = iter([4, 17, 4, 17])
+    monkeypatch.setattr(skill_odds.random, "randint", lambda low, high: next(dice))
+    assert game_service._perform_skill_check(stats, "dexterity", 14, "advantage") == ("BAŞARILI", 17, 1, 18)
+    assert game_service._perform_skill_check(stats, "dexterity", 14, "disadvantage") == ("BAŞARISIZ", 4, 1, 5)
+
+
+def test_unknown_modes_roll_normally():
+    assert [skill_odds.roll_mode(value) for value in (None, "", "dezavantaj", "ADVANTAGE", "şanslı")] == \
+        ["normal", "normal", "disadvantage", "advantage", "normal"]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Speculative generations cancelled mid-call still count as wasted tokens (services/speculation.py)."""
+import asyncio
+
+from backend.services import speculation as speculation_module
+from backend.services.speculation import SpeculationManager
+
+
+def _job(choice_id: str, text: str) -> dict:
+    return {"choice_id": choice_id, "outcome": None, "choice_text": text,
+            "ai_input_text": f"Oyuncu seçti: {text}", "ai_context": {"world": "dark_fantasy"}}
+
+
+def test_cancelled_running_generation_counts_its_prompt_as_wasted(monkeypatch):
+    release = asyncio.Event()
+
+    async def slow_response(prompt_text, player_context=None):
+        if "Kaç" in prompt_text:
+            await release.wait() # Still generating when the player picks the other choice
+        return {"text": "Sonuç", "raw_ai_response": "Sonuç metni", "choices": []}
+
+    monkeypatch.setattr(speculation_module, "get_ai_response", slow_response)
+    manager = SpeculationManager(enabled=True)
+
+    async def scenario():
+        manager.schedule("s1", 3, [_job("A", "Savaş"), _job("B", "Kaç")])
+        await asyncio.sleep(0.01)
+        result = await manager.claim("s1", 3, "A", "Savaş")
+        await asyncio.sleep(0)
+        return result
+
+    result = asyncio.run(scenario())
+
+    assert result["text"] == "Sonuç"
+    stats = manager.get_stats()
+    assert stats["cancelled"] == stats["cancelled_in_flight"] == 1
+    assert stats["wasted_tokens"] > 0
+    assert stats["wasted_token_rate"] <= 1
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Frontend file serving: ETag/304, precompressed variants, byte ranges and the image build (core/static_files.py)."""
+import gzip
+import os
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.core.static_files import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, FrontendFiles
+from backend.tools import build_frontend
+
+SCRIPT = "// Oyun betiği\n" + "console.log('Karanlık koridor');\n" * 200
+INDEX_HTML = (
+    '<!DOCTYPE html><html><head><link rel="stylesheet" href="style.css"></head><body>'
+    '<img src="images/kart.jpg" alt="Kart"><script src="script.js"></script></body></html>'
+)
+STYLE = ".kart { background-image: url('images/kart.jpg'); }\n" + "body { color: #fff; }\n" * 50
+
+
+def _frontend(tmp_path, with_image: bool = False):
+    frontend_dir = tmp_path / "frontend"
+    (frontend_dir / "images").mkdir(parents=True)
+    (frontend_dir / "index.html").write_text(INDEX_HTML, encoding="utf-8")
+    (frontend_dir / "script.js").write_text(SCRIPT, encoding="utf-8")
+    (frontend_dir / "style.css").write_text(STYLE, encoding="utf-8")
+    (frontend_dir / "images" / "harita.bin").write_bytes(bytes(range(256)) * 40)
+    if with_image:
+        image_module = pytest.importorskip("PIL.Image")
+        image_module.new("RGB", (1200, 800), (90, 40, 30)).save(frontend_dir / "images" / "kart.jpg", quality=95)
+    return frontend_dir
+
+
+def _client(frontend_dir) -> TestClient:
+    # Used without `with`: the app is a mounted sub-app and gets no lifespan events
+    return TestClient(FrontendFiles([str(frontend_dir / "dist"), str(frontend_dir)]))
+
+
+def _built(frontend_dir):
+    manifest = build_frontend.build(str(frontend_dir), str(frontend_dir / "dist"))
+    # The encoding negotiation is tested with a .br file even when the 'brotli' package is missing
+    script_path = frontend_dir / "dist" / manifest["script.js"]
+    script_path.with_name(script_path.name + ".br").write_bytes(b"brotli-bytes")
+    return manifest
+
+
+def test_etag_revalidation_answers_304(tmp_path):
+    frontend_dir = _frontend(tmp_path)
+    _built(frontend_dir)
+
+    client = _client(frontend_dir)
+    client.headers["Accept-Encoding"] = "identity"
+    first = client.get("/")
+    etag = first.headers["etag"]
+    cached = client.get("/", headers={"If-None-Match": etag})
+    weak = client.get("/", headers={"If-None-Match": f'"other", W/{etag}'})
+    stale = client.get("/", headers={"If-None-Match": '"other"'})
+
+    assert first.status_code == 200 and re.fullmatch(r'"[0-9a-f]{16}"', etag)
+    assert first.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+    assert (cached.status_code, weak.status_code, stale.status_code) == (304, 304, 200)
+    assert cached.content == b"" and cached.headers["etag"] == etag
+
+
+def test_precompressed_variant_is_chosen_from_accept_encoding(tmp_path):
+    frontend_dir = _frontend(tmp_path)
+    script_name = _built(frontend_dir)["script.js"]
+
+    def fetch(accept_encoding):
+        client = _client(frontend_dir)
+        # Raw bytes: the test client must not decode the variant itself
+        with client.stream("GET", f"/{script_name}", headers={"Accept-Encoding": accept_encoding}) as response:
+            return response, b"".join(response.iter_raw())
+
+    brotli_response, brotli_body = fetch("gzip, br")
+    gzip_response, gzip_body = fetch("br;q=0, gzip")
+    plain_response, plain_body = fetch("identity")
+
+    assert brotli_response.headers["content-encoding"] == "br" and brotli_body == b"brotli-bytes"
+    assert gzip_response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(gzip_body).decode("utf-8") == SCRIPT
+    assert "content-encoding" not in plain_response.headers and plain_body.decode("utf-8") == SCRIPT
+    # One ETag per representation; caches key on Accept-Encoding
+    etags = {response.headers["etag"] for response in (brotli_response, gzip_response, plain_response)}
+    assert len(etags) == 3
+    assert brotli_response.headers["etag"].endswith('-br"') and gzip_response.headers["etag"].endswith('-gzip"')
+    for response in (brotli_response, gzip_response, plain_response):
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+
+
+def test_range_requests_return_partial_content(tmp_path):
+    frontend_dir = _frontend(tmp_path)
+    data = (frontend_dir / "images" / "harita.bin").read_bytes()
+
+    client = _client(frontend_dir)
+    full = client.get("/images/harita.bin")
+    partial = client.get("/images/harita.bin", headers={"Range": "bytes=100-199"})
+    suffix = client.get("/images/harita.bin", headers={"Range": "bytes=-16"})
+    unsatisfiable = client.get("/images/harita.bin", headers={"Range": f"bytes={len(data) + 10}-"})
+
+    assert full.headers["accept-ranges"] == "bytes" and full.content == data
+    assert partial.status_code == 206 and partial.content == data[100:200]
+    assert partial.headers["content-range"] == f"bytes 100-199/{len(data)}"
+    assert suffix.status_code == 206 and suffix.content == data[-16:]
+    assert unsatisfiable.status_code == 416
+
+
+def test_unknown_paths_and_traversal_are_not_found(tmp_path):
+    frontend_dir = _frontend(tmp_path)
+    (tmp_path / "secret.txt").write_text("gizli", encoding="utf-8")
+
+    client = _client(frontend_dir)
+    assert client.get("/yok.js").status_code == 404
+    assert client.get("/../secret.txt").status_code == 404
+    assert client.get("/images/%2e%2e/%2e%2e/secret.txt").status_code == 404
+    assert client.post("/").status_code == 405
+
+
+def test_images_are_built_as_resized_hashed_variants(tmp_path):
+    frontend_dir = _frontend(tmp_path, with_image=True)
+    manifest = _built(frontend_dir)
+    images_dir = frontend_dir / "dist" / "images"
+    variants = sorted(name for name in os.listdir(images_dir) if name.startswith("kart-"))
+
+    # Widths above the source (1200px) are capped at it; every variant has a content hash in its name
+    assert {name.split(".")[0] for name in variants} == {"kart-480", "kart-960", "kart-1200"}
+    assert all(re.fullmatch(r"kart-\d+\.[0-9a-f]{12}\.(avif|webp|jpg)", name) for name in variants)
+    assert {name.rsplit(".", 1)[1] for name in variants} >= {"webp", "jpg"}
+    assert manifest["images/kart.jpg"].startswith("images/kart-1200.")
+
+    index_html = (frontend_dir / "dist" / "index.html").read_text(encoding="utf-8")
+    assert '<source type="image/webp" srcset="images/kart-480.' in index_html
+    assert re.search(r'<img src="images/kart-480\.[0-9a-f]{12}\.jpg" srcset="[^"]+ 960w, [^"]+ 1200w" sizes="300px" alt="Kart">',
+                     index_html)
+    style = (frontend_dir / "dist" / manifest["style.css"]).read_text(encoding="utf-8")
+    assert "image-set(" in style and "type('image/webp')" in style and "images/kart.jpg" not in style
+
+    webp_name = next(name for name in variants if name.startswith("kart-960.") and name.endswith(".webp"))
+    client = _client(frontend_dir)
+    response = client.get(f"/images/{webp_name}")
+    partial = client.get(f"/images/{webp_name}", headers={"Range": "bytes=0-11"})
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert partial.status_code == 206 and partial.content[8:12] == b"WEBP"
+
+    # A rebuild with unchanged sources reuses the encoded files
+    mtimes = {name: os.stat(images_dir / name).st_mtime_ns for name in variants}
+    build_frontend.build(str(frontend_dir), str(frontend_dir / "dist"))
+    assert {name: os.stat(images_dir / name).st_mtime_ns for name in variants} == mtimes
+
+
+def test_without_pillow_the_original_images_are_kept(tmp_path, monkeypatch):
+    monkeypatch.setattr(build_frontend, "Image", None)
+    frontend_dir = _frontend(tmp_path)
+    manifest = _built(frontend_dir)
+
+    assert not (frontend_dir / "dist" / "images").exists()
+    assert 'src="images/kart.jpg"' in (frontend_dir / "dist" / "index.html").read_text(encoding="utf-8")
+    assert "url('images/kart.jpg')" in (frontend_dir / "dist" / manifest["style.css"]).read_text(encoding="utf-8")
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""Structured (JSON schema) narrator output and its fallbacks to the text format (ai_service._request_model)."""
+import asyncio
+import json
+
+import httpx
+
+from backend.services import ai_service
+from backend.services.narration_parser import parse_structured_narration
+
+MODEL = "test/model"
+
+TEXT_ANSWER = "Köprü sallanıyor.\n\nYeni Seçenekler:\nA) Koşarak geç.\nB) Halatı kes. (Güç DC13)\n"
+JSON_ANSWER = json.dumps({
+    "narration": "Köprü sallanıyor.",
+    "choices": [
+        {"id": "A", "text": "Koşarak geç.", "skill_check_stat": None, "skill_check_dc": None, "skill_check_mode": None},
+        {"id": "B", "text": "Halatı kes.", "skill_check_stat": "Güç", "skill_check_dc": 13, "skill_check_mode": None},
+    ],
+}, ensure_ascii=False)
+
+
+def _completion(content: str) -> httpx.Response:
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+
+def _run(monkeypatch, handler, calls: int = 1):
+    """Calls _request_model `calls` times; returns the results and whether each HTTP request asked for a schema."""
+    requests = []
+
+    def record(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append("response_format" in body)
+        return handler(body)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(record))
+    monkeypatch.setattr(ai_service, "AI_STRUCTURED_OUTPUT", True)
+    monkeypatch.setattr(ai_service, "get_http_client", lambda: client)
+
+    async def scenario():
+        try:
+            return [await ai_service._request_model(MODEL, "Köprüye yürü", {"world_id": "dark_fantasy"}) for _ in range(calls)]
+        finally:
+            await client.aclose()
+
+    return asyncio.run(scenario()), requests
+
+
+def _reset_schema_state(monkeypatch):
+    monkeypatch.setattr(ai_service, "_schema_unsupported_models", {})
+    monkeypatch.setattr(ai_service, "_schema_failures", {})
+
+
+def test_schema_answer_is_validated_and_normalized():
+    result = parse_structured_narration("```json\n" + JSON_ANSWER + "\n```")
+
+    assert result["text"] == "Köprü sallanıyor."
+    assert result["choices"] == [
+        {"id": "A", "text": "Koşarak geç."},
+        {"id": "B", "text": "Halatı kes.", "skill_check_stat": "strength", "skill_check_dc": 13},
+    ]
+    assert parse_structured_narration(TEXT_ANSWER) is None
+    assert parse_structured_narration('{"narration": "Eksik"}') is None
+
+
+def test_answer_ignoring_the_schema_falls_back_to_the_text_parser(monkeypatch):
+    _reset_schema_state(monkeypatch)
+
+    (result,), requests = _run(monkeypatch, lambda body: _completion(TEXT_ANSWER))
+
+    assert requests == [True] # Usable as text: no second request
+    assert [choice["text"] for choice in result["choices"]] == ["Koşarak geç.", "Halatı kes."]
+    assert result["choices"][1]["skill_check_dc"] == 13
+    assert ai_service._schema_supported(MODEL) # One failure does not disable the schema
+
+
+def test_rejected_schema_downgrades_the_model_only_after_repeated_failures(monkeypatch):
+    _reset_schema_state(monkeypatch)
+    monkeypatch.setattr(ai_service, "AI_SCHEMA_FAILURE_THRESHOLD", 2)
+
+    def provider(body):
+        if "response_format" in body:
+            return httpx.Response(400, json={"error": "response_format not supported"})
+        return _completion(TEXT_ANSWER)
+
+    results, requests = _run(monkeypatch, provider, calls=3)
+
+    assert all(len(result["choices"]) == 2 for result in results)
+    # Both failed attempts retry as text; the third call goes straight to text
+    assert requests == [True, False, True, False, False]
+    assert not ai_service._schema_supported(MODEL)
+    assert ai_service.get_http_client_stats()["schema_unsupported_models"] == [MODEL]
+
+    # The mark expires and the schema is tried again
+    ai_service._schema_unsupported_models[MODEL] = 0.0
+    assert ai_service._schema_supported(MODEL)
+
+
+def test_valid_schema_answer_resets_the_failure_count(monkeypatch):
+    _reset_schema_state(monkeypatch)
+    answers = iter([httpx.Response(422, json={}), _completion(TEXT_ANSWER), _completion(JSON_ANSWER)])
+
+    results, requests = _run(monkeypatch, lambda body: next(answers), calls=2)
+
+    assert requests == [True, False, True]
+    assert results[1]["choices"][1]["skill_check_stat"] == "strength"
+    assert ai_service._schema_failures == {}
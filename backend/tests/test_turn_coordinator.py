@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Duplicate turn requests share one AI call (services/turn_coordinator.py)."""
+import asyncio
+
+from backend.services import turn_coordinator as coordinator_module
+from backend.services.turn_coordinator import TurnCoordinator
+
+
+def test_duplicate_of_in_flight_request_waits_for_its_result():
+    coordinator = TurnCoordinator()
+    calls = []
+
+    async def action():
+        calls.append("ai")
+        await asyncio.sleep(0.01)
+        return {"text": "Kapı açıldı."}
+
+    async def scenario():
+        return await asyncio.gather(
+            coordinator.run("s1", "key-1", action),
+            coordinator.run("s1", "key-1", action),
+        )
+
+    first, second = asyncio.run(scenario())
+
+    assert calls == ["ai"]
+    assert first is second
+    assert coordinator.stats["coalesced_in_flight"] == 1
+
+
+def test_completed_request_is_replayed_and_failed_one_runs_again():
+    coordinator = TurnCoordinator()
+    calls = []
+
+    async def action():
+        calls.append("ai")
+        return {"error": "Zaman aşımı"} if len(calls) == 1 else {"text": "Yol çatallandı."}
+
+    async def scenario():
+        keep = lambda result: "error" not in result
+        failed = await coordinator.run("s1", "key-1", action, keep=keep)
+        retried = await coordinator.run("s1", "key-1", action, keep=keep)
+        replayed = await coordinator.run("s1", "key-1", action, keep=keep)
+        return failed, retried, replayed
+
+    failed, retried, replayed = asyncio.run(scenario())
+
+    assert failed == {"error": "Zaman aşımı"}
+    assert retried is replayed
+    assert calls == ["ai", "ai"]
+    assert coordinator.stats["replayed_completed"] == 1
+
+
+def test_eviction_and_expiry_skip_in_flight_requests(monkeypatch):
+    monkeypatch.setattr(coordinator_module, "IDEMPOTENCY_MAX_ENTRIES", 2)
+    coordinator = TurnCoordinator()
+
+    async def scenario():
+        slow = coordinator.begin("s1", "slow", remember=True)
+        for index in range(5):
+            entry = coordinator.begin("s2", f"key-{index}", remember=True)
+            coordinator.complete("s2", f"key-{index}", entry, index)
+        assert coordinator.attach("s1", "slow") is slow
+        assert coordinator.get_stats()["stored_responses"] == 2
+
+        # Expired responses are purged even though the in-flight request started before them
+        monkeypatch.setattr(coordinator_module, "IDEMPOTENCY_TTL", -1)
+        assert coordinator.attach("s2", "key-4") is None
+        assert coordinator.get_stats()["stored_responses"] == 0
+        assert coordinator.attach("s1", "slow") is slow
+
+    asyncio.run(scenario())
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Turn events written by two processes to the same session must not be lost (crud.append_turn_event)."""
+from sqlalchemy.orm import sessionmaker
+
+from backend.db import crud, models
+from backend.db.database import create_db_engine
+
+
+def _session_factory(tmp_path):
+    engine = create_db_engine(f"sqlite+pysqlite:///{tmp_path / 'seq.db'}", "balanced")
+    models.Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def test_append_retries_when_another_writer_took_the_seq(tmp_path, monkeypatch):
+    Session = _session_factory(tmp_path)
+    db, other_process = Session(), Session()
+    session_id = crud.create_player_state(db, {"history": [{"event_type": "game_start", "text": "Başla"}]}).session_id
+
+    # The other process inserts seq 2 between our seq read and our insert
+    real_last_seq = crud.get_last_turn_seq
+    reads = []
+
+    def racing_last_seq(session, sid):
+        seq = real_last_seq(session, sid)
+        if session is db:
+            reads.append(seq)
+            if len(reads) == 1:
+                crud.append_turn_event(other_process, sid, {"event_type": "ai_response", "new_situation_text": "öteki"})
+        return seq
+
+    monkeypatch.setattr(crud, "get_last_turn_seq", racing_last_seq)
+    stored_seq = crud.append_turn_event(db, session_id, {"event_type": "ai_response", "new_situation_text": "bizim"})
+
+    assert reads[0] == 1 and stored_seq == 3
+    events = crud.get_turn_events(db, session_id)
+    assert [event.get("new_situation_text") for event in events] == [None, "öteki", "bizim"]
@@ -0,0 +1 @@
+# This file makes 'tools' a sub-package of 'backend' (benchmarks and maintenance scripts).
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Cold-start benchmark: how long a fresh server process takes before it can serve a turn.
+
+Per run, in a temporary directory (own database, no frontend build):
+    import  - `import backend.main` in a fresh interpreter
+    ready   - uvicorn started -> first 200 from GET /ready, on a new database (migrations run)
+    restart - the same on the already migrated database
+Reports the median and the best run. With --max-import-ms / --max-ready-ms the exit status is 1
+when a median exceeds its budget, so the benchmark can guard against cold-start regressions.
+The import breakdown behind a slow number: python -m backend.tools.importtime
+
+Usage (from the project root):
+    python -m backend.tools.bench_coldstart
+    python -m backend.tools.bench_coldstart --runs 10 --max-import-ms 1500 --max-ready-ms 4000
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+READY_TIMEOUT = 60.0
+
+_IMPORT_SNIPPET = "import time; started = time.perf_counter(); import backend.main; print(time.perf_counter() - started)"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(env: Dict[str, str]) -> float:
+    """Seconds `import backend.main` takes in a fresh interpreter."""
+    output = subprocess.run([sys.executable, "-c", _IMPORT_SNIPPET], cwd=ROOT_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_ready(env: Dict[str, str]) -> float:
+    """Seconds from starting uvicorn until GET /ready returns 200."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/ready"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port), "--no-access-log"],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < READY_TIMEOUT:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {server.returncode} before it was ready")
+            try:
+                with urllib.request.urlopen(url, timeout=1.0) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, OSError):
+                pass
+            time.sleep(0.01)
+        raise RuntimeError(f"/ready did not answer within {READY_TIMEOUT:.0f}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def run_once() -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite+pysqlite:///{os.path.join(tmp_dir, 'coldstart.db')}",
+            AI_CACHE_PATH=os.path.join(tmp_dir, "ai_cache.db"),
+            FRONTEND_DIR=tmp_dir, LOG_LEVEL="WARNING", PYTHONDONTWRITEBYTECODE="1",
+        )
+        return {"import": measure_import(env), "ready": measure_ready(env), "restart": measure_ready(env)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cold-start benchmark of the backend server")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=None, help="Fail if the median import time exceeds this")
+    parser.add_argument("--max-ready-ms", type=float, default=None, help="Fail if the median time to /ready exceeds this")
+    args = parser.parse_args()
+
+    results: Dict[str, List[float]] = {"import": [], "ready": [], "restart": []}
+    for _ in range(args.runs):
+        for name, seconds in run_once().items():
+            results[name].append(seconds * 1000)
+
+    medians = {name: statistics.median(values) for name, values in results.items()}
+    for name, values in results.items():
+        print(f"{name:>8}: medyan {medians[name]:7.1f} ms, en iyi {min(values):7.1f} ms ({len(values)} çalıştırma)")
+
+    failed = False
+    for name, budget in (("import", args.max_import_ms), ("ready", args.max_ready_ms), ("restart", args.max_ready_ms)):
+        if budget is not None and medians[name] > budget:
+            print(f"GERİLEME: {name} medyanı {medians[name]:.1f} ms > {budget:.1f} ms")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
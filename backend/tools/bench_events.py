@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Turn event storage size benchmark.
+
+Builds ai_response events the way game_service records them (raw narration + parsed text and
+choices), from the starting scenarios of every world rendered in each narrator output format
+(text, bold, numbered, JSON mode) and from the parser corpus, plus a skill_check_attempt for
+turns that answer a skill check. Every event is encoded with event_codec and compared with the
+old storage (SQLAlchemy JSON column: json.dumps with default settings).
+  1. size  - stored bytes per turn and per event type, old vs new, for each compression
+  2. speed - microseconds per encode / decode
+That every event decodes back to the same dict is tested in backend/tests/test_event_codec.py.
+
+Usage (from the project root):
+    python -m backend.tools.bench_events
+    python -m backend.tools.bench_events --compression zlib none --min-ratio 3
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+from ..data.scenarios import STARTING_SCENARIOS, INITIAL_SCENARIOS_BY_WORLD
+from ..db import event_codec
+from ..services.narration_parser import parse_narration, parse_structured_narration
+from .bench_parser import load_corpus
+
+_OUTPUT_FORMATS = ("text", "bold", "numbered", "json")
+_SKILL_CHECKS = [("strength", 14), ("dexterity", 12), ("intelligence", 15), ("charisma", 10)]
+_STAT_DISPLAY = {"strength": "Güç", "dexterity": "Çeviklik", "intelligence": "Zeka", "charisma": "Karizma"}
+
+
+def _render(scenario: Dict[str, Any], output_format: str, rng: random.Random) -> str:
+    """The scenario as a narrator answer; one random choice gets a skill check."""
+    choices = [(choice["text"], None, None) for choice in scenario.get("choices", [])]
+    if choices:
+        checked = rng.randrange(len(choices))
+        choices[checked] = (choices[checked][0], *rng.choice(_SKILL_CHECKS))
+    if output_format == "json":
+        return json.dumps({
+            "narration": scenario["text"],
+            "choices": [
+                {"id": chr(65 + i), "text": text, "skill_check_stat": stat, "skill_check_dc": dc}
+                for i, (text, stat, dc) in enumerate(choices)
+            ],
+        }, ensure_ascii=False)
+    # Longer answers span paragraphs: split the story after every second sentence
+    sentences = scenario["text"].replace(". ", ".\n").split("\n")
+    lines = [" ".join(sentences[i:i + 2]) for i in range(0, len(sentences), 2)]
+    lines += ["", "**Yeni Seçenekler:**" if output_format == "bold" else "Yeni Seçenekler:"]
+    for i, (text, stat, dc) in enumerate(choices):
+        marker = f"{i + 1}." if output_format == "numbered" else f"{chr(65 + i)})"
+        if output_format == "bold":
+            marker = f"**{marker}**"
+        lines.append(f"{marker} {text}" + (f" ({_STAT_DISPLAY[stat]} DC{dc})" if stat else ""))
+    return "\n".join(lines) + "\n"
+
+
+def build_turns(seed: int = 7) -> List[List[Dict[str, Any]]]:
+    """Turns as lists of the events game_service appends for them."""
+    rng = random.Random(seed)
+    scenarios = [scenario for by_class in STARTING_SCENARIOS.values() for scenario in by_class.values()]
+    scenarios += list(INITIAL_SCENARIOS_BY_WORLD.values())
+    raw_texts = [_render(scenario, output_format, rng) for scenario in scenarios for output_format in _OUTPUT_FORMATS]
+    raw_texts += [entry["input"] for entry in load_corpus() if entry["input"].strip()]
+
+    turns = []
+    previous = {"text": scenarios[0]["text"], "choices": scenarios[0]["choices"]}
+    for raw in raw_texts:
+        parsed = parse_structured_narration(raw) if raw.startswith("{") else parse_narration(raw)
+        turn = []
+        choice = rng.choice(previous["choices"]) if previous["choices"] else {"id": "USER_ACTION", "text": "Etrafa bak."}
+        outcome = None
+        if choice.get("skill_check_stat"):
+            roll = rng.randint(1, 20)
+            outcome = "BAŞARILI" if roll >= 10 else "BAŞARISIZ"
+            turn.append({
+                "event_type": "skill_check_attempt", "choice_made": choice["text"],
+                "stat_checked": choice["skill_check_stat"], "dc": choice["skill_check_dc"], "roll": roll,
+                "modifier": 1, "total_roll": roll + 1, "outcome": outcome, "original_situation_text": previous["text"],
+            })
+        turn.append({
+            "event_type": "ai_response", "choice_made": choice["text"], "skill_check_outcome_given_to_ai": outcome,
+            "ai_raw_text": parsed["raw_ai_response"], "new_situation_text": parsed["text"], "ai_choices": parsed["choices"],
+        })
+        turns.append(turn)
+        previous = parsed
+    return turns
+
+
+def _payload(event: Dict[str, Any]) -> Dict[str, Any]:
+    # What crud._make_turn_event stores in the payload column
+    return {k: v for k, v in event.items() if k != "event_type"}
+
+
+def measure(turns: List[List[Dict[str, Any]]], iterations: int) -> Dict[str, Any]:
+    """Stored bytes (old JSON column vs encoded) and codec speed with the current compression setting."""
+    events = [event for turn in turns for event in turn]
+    old_by_type: Dict[str, int] = {}
+    new_by_type: Dict[str, int] = {}
+    for event in events:
+        payload = _payload(event)
+        old_by_type[event["event_type"]] = old_by_type.get(event["event_type"], 0) + len(json.dumps(payload).encode("utf-8"))
+        new_by_type[event["event_type"]] = new_by_type.get(event["event_type"], 0) + len(event_codec.encode_payload(payload))
+
+    payloads = [_payload(event) for event in events]
+    started = time.perf_counter()
+    for _ in range(iterations):
+        encoded = [event_codec.encode_payload(payload) for payload in payloads]
+    encode_us = (time.perf_counter() - started) / (iterations * len(payloads)) * 1e6
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for value in encoded:
+            event_codec.decode_payload(value)
+    decode_us = (time.perf_counter() - started) / (iterations * len(payloads)) * 1e6
+
+    old_total, new_total = sum(old_by_type.values()), sum(new_by_type.values())
+    return {
+        "old_bytes_per_turn": old_total / len(turns),
+        "new_bytes_per_turn": new_total / len(turns),
+        "ratio": old_total / new_total,
+        "ratio_by_type": {event_type: old_by_type[event_type] / new_by_type[event_type] for event_type in old_by_type},
+        "encode_us": encode_us,
+        "decode_us": decode_us,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Turn event encoding size / speed benchmark")
+    available = ["zlib", "none"] + (["zstd"] if event_codec.zstandard is not None else [])
+    parser.add_argument("--compression", nargs="+", choices=["zlib", "zstd", "none"], default=available)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--min-ratio", type=float, default=None, help="Exit with status 1 if a ratio is below this")
+    args = parser.parse_args()
+
+    turns = build_turns()
+    print(f"{len(turns)} tur, {sum(len(turn) for turn in turns)} olay")
+    below = False
+    for compression in args.compression:
+        if compression == "zstd" and event_codec.zstandard is None:
+            print("zstd: 'zstandard' paketi kurulu değil, atlanıyor")
+            continue
+        event_codec.EVENT_COMPRESSION = compression
+        result = measure(turns, args.iterations)
+        by_type = ", ".join(f"{event_type} {ratio:.1f}x" for event_type, ratio in result["ratio_by_type"].items())
+        print(f"{compression:>5}: {result['old_bytes_per_turn']:.0f} -> {result['new_bytes_per_turn']:.0f} bayt/tur "
+              f"({result['ratio']:.2f}x; {by_type}) | encode {result['encode_us']:.1f} µs, decode {result['decode_us']:.1f} µs")
+        below |= args.min_ratio is not None and result["ratio"] < args.min_ratio
+    sys.exit(1 if below else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+JSON codec benchmark (core/json_codec.py).
+
+Plays streamed turns (scripted narrator, SSE frames formatted like the route, no session cache
+so state is loaded every turn) in a child process per setup and reports the time spent
+serializing as a share of the turn:
+    before: JSON_BACKEND=stdlib, SSE frames via jsonable_encoder + json.dumps
+    after:  the configured backend (orjson when installed)
+Round-trip checks of the game data, JSON columns and SSE frames are in backend/tests/test_json_codec.py.
+
+Usage (from the project root):
+    python -m backend.tools.bench_json
+    python -m backend.tools.bench_json --sessions 20 --turns 25
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+from ..core import json_codec
+
+SETUPS = ("before", "after")
+
+
+def _legacy_format_sse(event: str, data) -> str:
+    """The route's SSE formatting before json_codec (the "before" setup)."""
+    from fastapi.encoders import jsonable_encoder
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+
+class _Timer:
+    """Adds up time spent in wrapped functions, across threads; nested wrapped calls count once."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def wrap(self, function):
+        def timed(*args, **kwargs):
+            if getattr(self._local, "active", False):
+                return function(*args, **kwargs)
+            self._local.active = True
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                self._local.active = False
+                with self._lock:
+                    self.seconds += elapsed
+                    self.calls += 1
+        return timed
+
+
+def _scripted_stream(turn_texts: List[Dict[str, Any]]):
+    """stream_ai_response stand-in: streams a parsed Turkish narration word by word."""
+    counter = iter(range(10 ** 9))
+
+    async def stream(prompt_text: str, player_context: dict = None):
+        parsed = turn_texts[next(counter) % len(turn_texts)]
+        for word in parsed["text"].split(" "):
+            yield {"type": "token", "text": word + " "}
+        yield {"type": "done", "result": parsed}
+    return stream
+
+
+async def _play(sessions: int, turns: int, timer: _Timer) -> Dict[str, Any]:
+    from ..api import game_routes
+    from ..db import database, models
+    from ..models.game_models import StartGamePayload
+    from ..services import game_service
+    from ..services.narration_parser import parse_narration
+    from .bench_events import build_turns
+
+    models.Base.metadata.create_all(bind=database.engine)
+    parsed = [parse_narration(event["ai_raw_text"]) for turn in build_turns() for event in turn
+              if event["event_type"] == "ai_response" and not event["ai_raw_text"].startswith("{")]
+    game_service.stream_ai_response = _scripted_stream([result for result in parsed if result["choices"]])
+    format_sse = timer.wrap(_legacy_format_sse if os.environ.get("BENCH_LEGACY_SSE") else game_routes._format_sse)
+
+    frames = 0
+    turn_count = 0
+    started = time.perf_counter()
+    for session_index in range(sessions):
+        db = database.SessionLocal()
+        try:
+            state = await game_service.initialize_game(db, StartGamePayload(
+                world_id="dark_fantasy", selected_class_or_faction="ashen_legion", player_name="Işıl"))
+            session_id, choices = state["session_id"], state["choices"]
+            for turn_index in range(turns):
+                choice = choices[(session_index + turn_index) % len(choices)]
+                async for item in game_service.stream_player_action(db, session_id, choice["id"], choice["text"]):
+                    format_sse(item["event"], item["data"])
+                    frames += 1
+                    if item["event"] == "result":
+                        choices = [choice.model_dump() for choice in item["data"].choices]
+                turn_count += 1
+        finally:
+            db.close()
+    wall = time.perf_counter() - started
+    database.shutdown_db_executor()
+    return {"turns": turn_count, "frames": frames, "wall_s": wall, "serialize_s": timer.seconds, "calls": timer.calls}
+
+
+def run_child(sessions: int, turns: int) -> Dict[str, Any]:
+    # Wrapped before backend modules bind them (the engine keeps json_serializer from creation time)
+    timer = _Timer()
+    for name in ("dumps", "dumps_bytes", "loads"):
+        setattr(json_codec, name, timer.wrap(getattr(json_codec, name)))
+    result = asyncio.run(_play(sessions, turns, timer))
+    result["backend"] = json_codec.BACKEND
+    return result
+
+
+def measure(setup: str, sessions: int, turns: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite+pysqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+            STATE_CACHE_ENABLED="false", SPECULATION_ENABLED="false", AI_CACHE_ENABLED="false",
+            CONTEXT_SUMMARY_MODE="extractive", LOG_LEVEL="WARNING", SESSION_IDLE_TTL="0",
+        )
+        if setup == "before":
+            env.update(JSON_BACKEND="stdlib", BENCH_LEGACY_SSE="1")
+        output = subprocess.run(
+            [sys.executable, "-m", "backend.tools.bench_json", "--child", "--sessions", str(sessions), "--turns", str(turns)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Turn serialization benchmark for the JSON codec")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.sessions, args.turns)))
+        return
+
+    print(f"JSON backend: {json_codec.BACKEND}")
+    for setup in SETUPS:
+        result = measure(setup, args.sessions, args.turns)
+        per_turn_ms = result["wall_s"] / result["turns"] * 1000
+        serialize_ms = result["serialize_s"] / result["turns"] * 1000
+        print(f"{setup:>6} ({result['backend']}): tur {per_turn_ms:.2f} ms, serileştirme {serialize_ms:.3f} ms "
+              f"(%{serialize_ms / per_turn_ms * 100:.1f}), tur başına {result['calls'] / result['turns']:.0f} çağrı, "
+              f"{result['frames'] / result['turns']:.0f} SSE çerçevesi")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Narration parser throughput benchmark.
+
+Parses the corpus in parser_corpus.json (model outputs in the formats seen in practice:
+markdown bold, numbered choices, trailing periods, CRLF, headers...) and reports parses per
+second and microseconds per parse. Correctness and fuzzing against the same corpus are in
+backend/tests/test_narration_parser.py.
+
+Usage (from the project root):
+    python -m backend.tools.bench_parser
+    python -m backend.tools.bench_parser --iterations 20000
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from ..services.narration_parser import parse_narration
+
+CORPUS_PATH = Path(__file__).resolve().parent / "parser_corpus.json"
+
+
+def load_corpus(path: Path = CORPUS_PATH) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as corpus_file:
+        return json.load(corpus_file)
+
+
+def benchmark(corpus: List[Dict[str, Any]], iterations: int) -> Dict[str, float]:
+    inputs = [entry["input"] for entry in corpus]
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for text in inputs:
+            parse_narration(text)
+    elapsed = time.perf_counter() - started
+    parses = iterations * len(inputs)
+    return {"parses_per_s": parses / elapsed, "us_per_parse": elapsed / parses * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the narration parser on its corpus.")
+    parser.add_argument("--iterations", type=int, default=5000, help="Benchmark passes over the corpus")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    result = benchmark(corpus, args.iterations)
+    print(f"{len(corpus)} entries, {result['parses_per_s']:.0f} parses/s, {result['us_per_parse']:.2f} µs/parse")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Storage profile benchmark.
+
+Runs N concurrent sessions against a fresh SQLite file per profile: each session
+creates its player state and then appends history events turn by turn, using the
+same crud functions as the game. Reports create/append throughput and latency.
+
+Usage (from the project root):
+    python -m backend.tools.bench_storage --sessions 16 --turns 50
+    python -m backend.tools.bench_storage --profiles legacy balanced
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from sqlalchemy.orm import sessionmaker
+
+from ..db import crud, models
+from ..db.database import STORAGE_PROFILES, create_db_engine
+
+# Roughly the size of a real ai_response event (raw + parsed narration, three choices)
+_SAMPLE_TEXT = "Karanlık ormanın derinliklerinden gelen sesler giderek yaklaşıyor. " * 12
+_SAMPLE_EVENT = {
+    "event_type": "ai_response",
+    "choice_made": "Sesin geldiği yöne doğru ilerle.",
+    "skill_check_outcome_given_to_ai": None,
+    "ai_raw_text": _SAMPLE_TEXT,
+    "new_situation_text": _SAMPLE_TEXT,
+    "ai_choices": [
+        {"id": "A", "text": "Saklan"},
+        {"id": "B", "text": "Kılıcını çek", "skill_check_stat": "strength", "skill_check_dc": 14},
+        {"id": "C", "text": "Geri çekil"},
+    ],
+}
+_INITIAL_DATA = {
+    "name": "Bench",
+    "world_id": "dark_fantasy",
+    "world_name_display": "Karanlık Fantezi Dünyası",
+    "class": "ashen_legion",
+    "stats": {"strength": 14, "dexterity": 8, "constitution": 15, "intelligence": 7, "wisdom": 9, "charisma": 6},
+    "history": [{"event_type": "game_start", "world_id": "dark_fantasy", "class": "ashen_legion", "text": _SAMPLE_TEXT}],
+}
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct), len(ordered) - 1)] if ordered else 0.0
+
+
+def run_profile(profile_name: str, sessions: int, turns: int, workers: int) -> Dict[str, float]:
+    """Benchmarks one storage profile on a throwaway database file."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench.db")
+        engine = create_db_engine(f"sqlite+pysqlite:///{db_path}", profile_name)
+        models.Base.metadata.create_all(bind=engine)
+        SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        create_latencies: List[float] = []
+        append_latencies: List[float] = []
+        lock = threading.Lock()
+
+        def play_session(_):
+            db = SessionFactory()
+            try:
+                started = time.perf_counter()
+                state = crud.create_player_state(db, _INITIAL_DATA)
+                created = time.perf_counter() - started
+                local_appends = []
+                for _turn in range(turns):
+                    started = time.perf_counter()
+                    crud.append_turn_event(db, state.session_id, _SAMPLE_EVENT)
+                    local_appends.append(time.perf_counter() - started)
+                with lock:
+                    create_latencies.append(created)
+                    append_latencies.extend(local_appends)
+            finally:
+                db.close()
+
+        wall_started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(play_session, range(sessions)))
+        wall = time.perf_counter() - wall_started
+        engine.dispose()
+
+    total_ops = len(create_latencies) + len(append_latencies)
+    return {
+        "ops_per_s": total_ops / wall if wall else 0.0,
+        "create_p50_ms": statistics.median(create_latencies) * 1000,
+        "append_p50_ms": statistics.median(append_latencies) * 1000 if append_latencies else 0.0,
+        "append_p95_ms": _percentile(append_latencies, 0.95) * 1000,
+        "append_p99_ms": _percentile(append_latencies, 0.99) * 1000,
+        "wall_s": wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SQLite storage profiles under concurrent sessions.")
+    parser.add_argument("--profiles", nargs="+", default=list(STORAGE_PROFILES), choices=list(STORAGE_PROFILES))
+    parser.add_argument("--sessions", type=int, default=16, help="Concurrent game sessions")
+    parser.add_argument("--turns", type=int, default=30, help="History events appended per session")
+    parser.add_argument("--workers", type=int, default=4, help="Writer threads (like DB_EXECUTOR_MAX_WORKERS)")
+    args = parser.parse_args()
+
+    print(f"{'profile':<10} {'ops/s':>9} {'create p50':>11} {'append p50':>11} {'append p95':>11} {'append p99':>11} {'wall':>8}")
+    for profile_name in args.profiles:
+        result = run_profile(profile_name, args.sessions, args.turns, args.workers)
+        print(
+            f"{profile_name:<10} {result['ops_per_s']:>9.1f} {result['create_p50_ms']:>9.2f}ms "
+            f"{result['append_p50_ms']:>9.2f}ms {result['append_p95_ms']:>9.2f}ms "
+            f"{result['append_p99_ms']:>9.2f}ms {result['wall_s']:>7.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Frontend build step for serving from FastAPI (see backend/core/static_files.py).
+
+Writes frontend/dist/:
+  - script.<hash>.js and style.<hash>.css (content-hashed names, cached as immutable)
+  - index.html referencing the hashed names (revalidated with its ETag)
+  - .gz (and .br when the optional 'brotli' package is installed) next to each text file,
+    kept only when smaller than the original
+  - images/<name>-<width>.<hash>.<avif|webp|jpg>: resized, recompressed variants of the
+    frontend/images photos (2-3 MB each) at IMAGE_WIDTHS, when the optional 'Pillow' package
+    is installed (AVIF only if its Pillow build supports it). index.html gets <picture> elements
+    with srcset/sizes and style.css image-set() backgrounds pointing at them. Variants are
+    reused across builds while their source file is unchanged.
+Without Pillow the original images are served from frontend/ directly.
+
+start.py runs this before starting the server. Manual usage (from the project root):
+    python -m backend.tools.build_frontend
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import sys
+from typing import Dict, List
+
+from ..core.static_files import file_digest
+
+try:
+    import brotli
+except ImportError: # Optional: gzip variants only
+    brotli = None
+
+try:
+    from PIL import Image, features
+except ImportError: # Optional: images are served as they are
+    Image = features = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FRONTEND_DIR = os.path.join(ROOT_DIR, "frontend")
+DIST_DIR = os.path.join(FRONTEND_DIR, "dist")
+
+# Source files that get content-hashed names; index.html keeps its name
+HASHED_ASSETS = ("script.js", "style.css")
+COMPRESSIBLE_EXTENSIONS = (".html", ".js", ".css", ".json", ".svg", ".txt")
+
+# --- Images ---
+IMAGES_DIR_NAME = "images"
+IMAGE_SOURCE_EXTENSIONS = (".jpg", ".jpeg")
+# Widths of the resized variants (capped at the source width). World cards are 300 CSS px wide,
+# so 480/960 cover 1x-3x screens; the widest variant is used for full-card and page backgrounds.
+IMAGE_WIDTHS = (480, 960, 1536)
+# sizes attribute of the <img> elements in index.html (the .world-card width in style.css)
+IMAGE_SIZES = "300px"
+# (format, file extension, MIME type, Pillow save options), in the order browsers should prefer them;
+# the last one is the fallback for browsers without <picture>/image-set() type support
+IMAGE_FORMATS = (
+    ("AVIF", "avif", "image/avif", {"quality": 50, "speed": 8}),
+    ("WEBP", "webp", "image/webp", {"quality": 80, "method": 4}),
+    ("JPEG", "jpg", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+)
+# Record of built variants in dist/images; a source whose digest and settings match is not re-encoded
+_IMAGE_RECORD = "variants.json"
+
+
+def _digest(data: bytes, length: int = 12) -> str:
+    # Same hash as static_files.file_digest, for content that is not on disk yet
+    return hashlib.sha256(data).hexdigest()[:length]
+
+
+def _write_compressed_variants(path: str) -> None:
+    with open(path, "rb") as f:
+        data = f.read()
+    # mtime=0 keeps the .gz bytes (and so its ETag) identical between builds of the same file
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data, quality=11)
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(data):
+            with open(path + suffix, "wb") as f:
+                f.write(compressed)
+
+
+def _image_formats() -> List[tuple]:
+    if Image is None:
+        return []
+    return [image_format for image_format in IMAGE_FORMATS
+            if image_format[0] == "JPEG" or features.check(image_format[0].lower())]
+
+
+def _encode_image_variants(source: str, images_dir: str) -> Dict[str, List[List]]:
+    """Writes the resized variants of one image; returns {MIME type: [[width, file name], ...]} (widest last)."""
+    stem = os.path.splitext(os.path.basename(source))[0]
+    with Image.open(source) as opened:
+        image = opened.convert("RGB")
+    widths = sorted({min(width, image.width) for width in IMAGE_WIDTHS})
+    variants: Dict[str, List[List]] = {}
+    for width in widths:
+        resized = image if width == image.width else image.resize(
+            (width, round(image.height * width / image.width)), Image.LANCZOS)
+        for pillow_format, extension, mime_type, options in _image_formats():
+            buffer = io.BytesIO()
+            resized.save(buffer, pillow_format, **options)
+            data = buffer.getvalue()
+            name = f"{stem}-{width}.{_digest(data)}.{extension}"
+            with open(os.path.join(images_dir, name), "wb") as f:
+                f.write(data)
+            variants.setdefault(mime_type, []).append([width, name])
+    return variants
+
+
+def build_images(frontend_dir: str = FRONTEND_DIR, dist_dir: str = DIST_DIR) -> Dict[str, Dict[str, List[List]]]:
+    """
+    Builds dist/images from frontend/images; returns {"images/<source name>": {MIME type: [[width, name], ...]}}.
+    Returns {} (and leaves no dist/images) when Pillow is not installed.
+    """
+    source_dir = os.path.join(frontend_dir, IMAGES_DIR_NAME)
+    images_dir = os.path.join(dist_dir, IMAGES_DIR_NAME)
+    if Image is None or not os.path.isdir(source_dir):
+        shutil.rmtree(images_dir, ignore_errors=True)
+        return {}
+    os.makedirs(images_dir, exist_ok=True)
+
+    record_path = os.path.join(images_dir, _IMAGE_RECORD)
+    try:
+        with open(record_path, encoding="utf-8") as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+
+    # Formats depend on the installed Pillow build, so they are part of the settings as well
+    settings = repr((IMAGE_WIDTHS, _image_formats()))
+    record = {}
+    for name in sorted(os.listdir(source_dir)):
+        if not name.lower().endswith(IMAGE_SOURCE_EXTENSIONS):
+            continue
+        source = os.path.join(source_dir, name)
+        source_digest = file_digest(source)
+        entry = previous.get(name)
+        reusable = (
+            entry is not None and entry.get("source") == source_digest and entry.get("settings") == settings
+            and all(os.path.exists(os.path.join(images_dir, file_name))
+                    for widths in entry["variants"].values() for _, file_name in widths)
+        )
+        if not reusable:
+            entry = {"source": source_digest, "settings": settings,
+                     "variants": _encode_image_variants(source, images_dir)}
+        record[name] = entry
+
+    # Drop variants of removed or changed sources
+    keep = {file_name for entry in record.values() for widths in entry["variants"].values() for _, file_name in widths}
+    for name in os.listdir(images_dir):
+        if name != _IMAGE_RECORD and name not in keep:
+            os.remove(os.path.join(images_dir, name))
+    with open(record_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=1)
+    return {f"{IMAGES_DIR_NAME}/{name}": entry["variants"] for name, entry in record.items()}
+
+
+def _srcset(widths: List[List]) -> str:
+    return ", ".join(f"{IMAGES_DIR_NAME}/{name} {width}w" for width, name in widths)
+
+
+def _picture_markup(match: "re.Match", images: Dict[str, Dict[str, List[List]]]) -> str:
+    """<img src="images/x.jpg" ...> -> <picture> with one <source> per modern format and a resized JPEG <img>."""
+    variants = images.get(match.group("src"))
+    if variants is None:
+        return match.group(0)
+    *preferred, (_, _, fallback_type, _) = _image_formats()
+    sources = "".join(
+        f'<source type="{mime_type}" srcset="{_srcset(variants[mime_type])}" sizes="{IMAGE_SIZES}">'
+        for _, _, mime_type, _ in preferred
+    )
+    fallback = variants[fallback_type]
+    return (f'<picture>{sources}<img src="{IMAGES_DIR_NAME}/{fallback[0][1]}" srcset="{_srcset(fallback)}" '
+            f'sizes="{IMAGE_SIZES}"{match.group("rest")}></picture>')
+
+
+def _background_declaration(match: "re.Match", images: Dict[str, Dict[str, List[List]]]) -> str:
+    """background-image: url(images/x.jpg) -> a resized JPEG, then image-set() of the modern formats."""
+    variants = images.get(match.group("src"))
+    if variants is None:
+        return match.group(0)
+    # Backgrounds cover whole cards or the page, so they use the widest variant of each format
+    candidates = [(mime_type, f"{IMAGES_DIR_NAME}/{variants[mime_type][-1][1]}") for _, _, mime_type, _ in _image_formats()]
+    image_set = ", ".join(f"url('{path}') type('{mime_type}')" for mime_type, path in candidates)
+    # Browsers without image-set() type support keep the first declaration
+    return f"background-image: url('{candidates[-1][1]}'); background-image: image-set({image_set})"
+
+
+def _rewrite_image_references(text: str, images: Dict[str, Dict[str, List[List]]]) -> str:
+    if not images:
+        return text
+    text = re.sub(r'<img src="(?:\./)?(?P<src>images/[^"]+)"(?P<rest>[^>]*?)\s*/?>',
+                  lambda match: _picture_markup(match, images), text)
+    return re.sub(r"background-image:\s*url\((['\"]?)(?:\./)?(?P<src>images/[^'\")]+)\1\)",
+                  lambda match: _background_declaration(match, images), text)
+
+
+def build(frontend_dir: str = FRONTEND_DIR, dist_dir: str = DIST_DIR) -> Dict[str, str]:
+    """Rebuilds dist_dir from frontend_dir; returns {source name: built name}."""
+    # dist/images survives the rebuild so unchanged images are not encoded again
+    if os.path.isdir(dist_dir):
+        for name in os.listdir(dist_dir):
+            path = os.path.join(dist_dir, name)
+            if name == IMAGES_DIR_NAME and os.path.isdir(path):
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+    os.makedirs(dist_dir, exist_ok=True)
+    images = build_images(frontend_dir, dist_dir)
+
+    manifest = {}
+    for name in HASHED_ASSETS:
+        source = os.path.join(frontend_dir, name)
+        if not os.path.exists(source):
+            continue
+        with open(source, encoding="utf-8") as f:
+            content = _rewrite_image_references(f.read(), images).encode("utf-8")
+        stem, extension = os.path.splitext(name)
+        manifest[name] = f"{stem}.{_digest(content)}{extension}"
+        with open(os.path.join(dist_dir, manifest[name]), "wb") as f:
+            f.write(content)
+
+    with open(os.path.join(frontend_dir, "index.html"), encoding="utf-8") as f:
+        index_html = _rewrite_image_references(f.read(), images)
+    for name, built_name in manifest.items():
+        # src="script.js" / href="style.css" (optionally ./-prefixed)
+        index_html = re.sub(rf'(src|href)=(["\'])(\./)?{re.escape(name)}\2', rf"\1=\2{built_name}\2", index_html)
+    with open(os.path.join(dist_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(index_html)
+
+    for name in os.listdir(dist_dir):
+        if name.endswith(COMPRESSIBLE_EXTENSIONS):
+            _write_compressed_variants(os.path.join(dist_dir, name))
+    for source_name, variants in images.items():
+        # The widest fallback variant stands for the image's set
+        manifest[source_name] = f"{IMAGES_DIR_NAME}/{variants['image/jpeg'][-1][1]}"
+    return manifest
+
+
+def _size_of(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(_size_of(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Builds frontend/dist (hashed names, gzip/brotli variants, resized images).")
+    parser.add_argument("--frontend-dir", default=FRONTEND_DIR)
+    parser.add_argument("--dist-dir", default=DIST_DIR)
+    args = parser.parse_args()
+
+    manifest = build(args.frontend_dir, args.dist_dir)
+    for name, built_name in manifest.items():
+        print(f"{name} -> {built_name}")
+    for name in sorted(os.listdir(args.dist_dir)):
+        print(f"  {name:<32} {_size_of(os.path.join(args.dist_dir, name)):>8} bytes")
+    if brotli is None:
+        print("Not: 'brotli' paketi yüklü değil, yalnızca gzip varyantları üretildi.", file=sys.stderr)
+    if Image is None:
+        print("Not: 'Pillow' paketi yüklü değil, görseller küçültülmeden sunulacak.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for OpenRouter's /api/v1/chat/completions endpoint, for load tests.
+
+Answers every completion request with a canned narration after a simulated latency,
+fails a configurable share of requests, and supports `stream=True` (SSE) and
+`response_format` (JSON) requests. Point the game at it with
+    OPENROUTER_BASE_URL=http://127.0.0.1:8099/api/v1
+
+Usage (from the project root):
+    python -m backend.tools.fake_openrouter --port 8099 --latency lognormal --latency-mean 1.5
+    python -m backend.tools.fake_openrouter --error-rate 0.05 --format mixed
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from typing import Any, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+# Format of answers to text-mode requests; requests with `response_format` always get JSON
+OUTPUT_FORMATS = ("text", "bold", "numbered", "mixed")
+
+_STORY = (
+    "Sisli vadiye indiğinde uzaktan çan sesleri duyuluyor. Yolun kenarındaki eski bir tabela "
+    "yarı yarıya çamura gömülmüş, üzerindeki yazı okunmuyor. Arkandan yaklaşan ayak seslerini fark ediyorsun."
+)
+_CHOICES = [
+    ("Çan seslerinin geldiği yöne ilerle.", None, None),
+    ("Tabelayı temizleyip okumaya çalış", "intelligence", 12),
+    ("Arkanı dönüp yaklaşanla yüzleş", "strength", 14),
+]
+_STAT_DISPLAY = {"intelligence": "Zeka", "strength": "Güç"}
+
+
+def render_output(output_format: str, rng: random.Random) -> str:
+    """Canned narration in one of the formats models actually produce."""
+    if output_format == "mixed":
+        output_format = rng.choice(("text", "bold", "numbered"))
+    if output_format == "json":
+        return json.dumps({
+            "narration": _STORY,
+            "choices": [
+                {"id": chr(65 + i), "text": text, "skill_check_stat": stat, "skill_check_dc": dc}
+                for i, (text, stat, dc) in enumerate(_CHOICES)
+            ],
+        }, ensure_ascii=False)
+    lines = [_STORY, "", "Yeni Seçenekler:" if output_format != "bold" else "**Yeni Seçenekler:**"]
+    for i, (text, stat, dc) in enumerate(_CHOICES):
+        marker = f"{i + 1}." if output_format == "numbered" else f"{chr(65 + i)})"
+        if output_format == "bold":
+            marker = f"**{marker}**"
+        skill_check = f" ({_STAT_DISPLAY[stat]} DC{dc})" if stat else ""
+        lines.append(f"{marker} {text}{skill_check}")
+    return "\n".join(lines) + "\n"
+
+
+def sample_latency(args: argparse.Namespace, rng: random.Random) -> float:
+    """Seconds to wait before answering, drawn from the configured distribution."""
+    mean = args.latency_mean
+    if args.latency == "uniform":
+        return rng.uniform(max(mean - args.latency_spread, 0.0), mean + args.latency_spread)
+    if args.latency == "exponential":
+        return rng.expovariate(1 / mean) if mean > 0 else 0.0
+    if args.latency == "lognormal":
+        # Parametrised so the distribution's mean is `mean`; sigma controls the tail
+        sigma = args.latency_sigma
+        return rng.lognormvariate(math.log(mean) - sigma * sigma / 2, sigma) if mean > 0 else 0.0
+    return mean
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="Fake OpenRouter")
+    rng = random.Random(args.seed)
+    stats = {"requests": 0, "errors": 0, "streamed": 0}
+
+    @app.post("/api/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body: Dict[str, Any] = await request.json()
+        stats["requests"] += 1
+        await asyncio.sleep(sample_latency(args, rng))
+        if rng.random() < args.error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": {"message": "simulated upstream error", "code": args.error_status}},
+                                status_code=args.error_status)
+
+        output_format = "json" if body.get("response_format") else args.format
+        content = render_output(output_format, rng)
+        model = body.get("model", "fake/model")
+
+        if body.get("stream"):
+            stats["streamed"] += 1
+            return StreamingResponse(_stream_chunks(content, model, args.stream_chunk_chars, args.stream_chunk_delay),
+                                     media_type="text/event-stream")
+        return {
+            "id": f"fake-{stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(content) // 4, "total_tokens": len(content) // 4},
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+async def _stream_chunks(content: str, model: str, chunk_chars: int, chunk_delay: float):
+    yield ": OPENROUTER PROCESSING\n\n"
+    for start in range(0, len(content), chunk_chars):
+        chunk = {"model": model, "choices": [{"index": 0, "delta": {"content": content[start:start + chunk_chars]}}]}
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        if chunk_delay:
+            await asyncio.sleep(chunk_delay)
+    yield "data: [DONE]\n\n"
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Fake OpenRouter chat completions server for load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    add_stub_arguments(parser)
+    return parser
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> None:
+    """Stub behaviour options (shared with load_test, which passes them through)."""
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="lognormal", help="Response latency distribution")
+    parser.add_argument("--latency-mean", type=float, default=1.0, help="Mean response latency in seconds")
+    parser.add_argument("--latency-spread", type=float, default=0.5, help="Half-width of the uniform distribution")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Sigma of the lognormal distribution (tail weight)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with an error (0-1)")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of simulated errors")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="text", help="Narration format of the answers")
+    parser.add_argument("--stream-chunk-chars", type=int, default=12, help="Characters per streamed delta")
+    parser.add_argument("--stream-chunk-delay", type=float, default=0.01, help="Seconds between streamed deltas")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def main():
+    args = build_arg_parser().parse_args()
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Import-time breakdown of the backend (what a worker pays before it can serve a request).
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and summarizes its
+stderr: the slowest modules by cumulative and by self time, and the total per top-level
+package (fastapi, sqlalchemy, numpy, backend ...).
+
+Usage (from the project root):
+    python -m backend.tools.importtime
+    python -m backend.tools.importtime backend.services.ai_service --top 30
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple
+
+# "import time:       309 |     305743 |   fastapi"
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+
+
+class ImportEntry(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportEntry]:
+    """Entries of -X importtime output (the header and any other stderr lines are skipped)."""
+    entries = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append(ImportEntry(module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def measure_imports(module: str, env: Dict[str, str] = None) -> List[ImportEntry]:
+    """Imports `module` in a fresh interpreter (no bytecode writes) and returns its import timings."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-B", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def package_totals(entries: List[ImportEntry]) -> Dict[str, int]:
+    """Self time summed per top-level package; backend modules are kept per subpackage (backend.services ...)."""
+    totals: Dict[str, int] = {}
+    for entry in entries:
+        parts = entry.module.split(".")
+        package = ".".join(parts[:2]) if parts[0] == "backend" else parts[0]
+        totals[package] = totals.get(package, 0) + entry.self_us
+    return totals
+
+
+def _print_table(title: str, rows, value_title: str) -> None:
+    print(f"\n{title}")
+    print(f"  {value_title:>9}  modül")
+    for name, microseconds in rows:
+        print(f"  {microseconds / 1000:9.1f}  {name}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import-time breakdown of a backend module (-X importtime)")
+    parser.add_argument("module", nargs="?", default="backend.main")
+    parser.add_argument("--top", type=int, default=15, help="Rows per table")
+    args = parser.parse_args()
+
+    # Only warnings from the imported modules, not their startup info lines
+    env = dict(os.environ, LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"))
+    entries = measure_imports(args.module, env)
+    if not entries:
+        print("-X importtime çıktısı boş.")
+        return
+    total_us = sum(entry.self_us for entry in entries)
+    print(f"{args.module}: {len(entries)} modül, toplam {total_us / 1000:.1f} ms")
+
+    by_cumulative = sorted(entries, key=lambda entry: entry.cumulative_us, reverse=True)[:args.top]
+    _print_table("En yavaş (alt modüller dahil, ms):", [(e.module, e.cumulative_us) for e in by_cumulative], "kümülatif")
+    by_self = sorted(entries, key=lambda entry: entry.self_us, reverse=True)[:args.top]
+    _print_table("En yavaş (yalnızca kendisi, ms):", [(e.module, e.self_us) for e in by_self], "kendi")
+    packages = sorted(package_totals(entries).items(), key=lambda item: item[1], reverse=True)[:args.top]
+    _print_table("Paket başına (ms):", packages, "toplam")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Load test for the game API against a local fake OpenRouter.
+
+Starts backend/tools/fake_openrouter.py and the game app (uvicorn, throwaway SQLite
+file) as subprocesses, points the app at the stub via OPENROUTER_BASE_URL, then plays
+N concurrent sessions: /api/v1/start_game followed by --turns /api/v1/make_choice calls,
+each picking one of the returned choices. Reports throughput, p50/p95/p99 latency per
+endpoint, errors, and DB executor queue waits / lock errors from GET /stats/db.
+
+Usage (from the project root):
+    python -m backend.tools.load_test --sessions 50 --turns 10
+    python -m backend.tools.load_test --sessions 200 --latency-mean 2 --error-rate 0.02 --stream
+    python -m backend.tools.load_test --app-url http://127.0.0.1:8000 --sessions 20   # an already running app
+
+Extra app settings can be given as environment variables (e.g. DB_STORAGE_PROFILE=fast);
+they are passed through to the app process.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from .fake_openrouter import add_stub_arguments
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct), len(ordered) - 1)] if ordered else 0.0
+
+
+class LoadReport:
+    """Collects per-endpoint latencies and failures."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.failures: Dict[str, int] = defaultdict(int)
+        self.ai_errors = 0 # make_choice answered, but with the "Bir şeyler ters gitti" fallback
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.failures[endpoint] += 1
+
+    def print_summary(self, wall: float, db_before: Optional[dict], db_after: Optional[dict]) -> None:
+        total = sum(len(values) for values in self.latencies.values())
+        print(f"\nrequests: {total} in {wall:.2f}s -> {total / wall if wall else 0:.1f} req/s")
+        print(f"{'endpoint':<26} {'count':>6} {'fail':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+        for endpoint, values in self.latencies.items():
+            print(
+                f"{endpoint:<26} {len(values):>6} {self.failures[endpoint]:>5} "
+                f"{_percentile(values, 0.50) * 1000:>7.0f}ms {_percentile(values, 0.95) * 1000:>7.0f}ms "
+                f"{_percentile(values, 0.99) * 1000:>7.0f}ms {max(values) * 1000:>7.0f}ms"
+            )
+        print(f"turns answered with an AI error: {self.ai_errors}")
+        if db_before is not None and db_after is not None:
+            calls = db_after["calls"] - db_before["calls"]
+            queue_wait = db_after["queue_wait_total_s"] - db_before["queue_wait_total_s"]
+            exec_time = db_after["exec_total_s"] - db_before["exec_total_s"]
+            print(
+                f"db: {calls} calls, executor queue wait avg {queue_wait / calls * 1000 if calls else 0:.2f}ms "
+                f"(max {db_after['queue_wait_max_ms']:.1f}ms), call time avg {exec_time / calls * 1000 if calls else 0:.2f}ms "
+                f"(max {db_after['exec_max_ms']:.1f}ms, includes SQLite lock waits), "
+                f"lock errors {db_after['lock_errors'] - db_before['lock_errors']}"
+            )
+
+
+async def play_session(client: httpx.AsyncClient, report: LoadReport, args: argparse.Namespace, rng: random.Random) -> None:
+    started = time.perf_counter()
+    try:
+        response = await client.post("/api/v1/start_game", json={
+            "world_id": args.world, "selected_class_or_faction": args.faction, "player_name": "Yük Testi",
+        })
+        ok = response.status_code == 200 and "session_id" in response.json()
+    except httpx.HTTPError:
+        ok = False
+    report.record("start_game", time.perf_counter() - started, ok)
+    if not ok:
+        return
+    state = response.json()
+    session_id = state["session_id"]
+
+    for _turn in range(args.turns):
+        if args.think_time:
+            await asyncio.sleep(rng.uniform(0, args.think_time))
+        choices = [choice for choice in state.get("choices", []) if choice.get("id") != "IGNORE"]
+        choice = rng.choice(choices) if choices else {"id": "USER_ACTION", "text": "Etrafa bak."}
+        payload = {"session_id": session_id, "choice_id": choice["id"], "choice_text": choice["text"]}
+        endpoint = "make_choice/stream" if args.stream else "make_choice"
+        started = time.perf_counter()
+        try:
+            if args.stream:
+                state = await _make_choice_stream(client, payload)
+                ok = state is not None
+            else:
+                response = await client.post("/api/v1/make_choice", json=payload)
+                ok = response.status_code == 200
+                state = response.json() if ok else None
+        except httpx.HTTPError:
+            ok, state = False, None
+        report.record(endpoint, time.perf_counter() - started, ok)
+        if not ok:
+            return
+        if any(choice.get("id") == "IGNORE" for choice in state.get("choices", [])):
+            report.ai_errors += 1
+
+
+async def _make_choice_stream(client: httpx.AsyncClient, payload: dict) -> Optional[dict]:
+    """Reads the SSE stream to its final 'result' event."""
+    event_name = None
+    async with client.stream("POST", "/api/v1/make_choice/stream", json=payload) as response:
+        if response.status_code != 200:
+            return None
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                event_name = line[6:].strip()
+            elif line.startswith("data:") and event_name == "result":
+                return json.loads(line[5:])
+    return None
+
+
+async def fetch_db_stats(client: httpx.AsyncClient) -> Optional[dict]:
+    try:
+        response = await client.get("/stats/db")
+        return response.json() if response.status_code == 200 else None
+    except httpx.HTTPError:
+        return None
+
+
+async def run_load(args: argparse.Namespace, app_url: str) -> None:
+    report = LoadReport()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout, limits=limits) as client:
+        db_before = await fetch_db_stats(client)
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def limited(index: int):
+            async with semaphore:
+                await play_session(client, report, args, random.Random(args.seed + index))
+
+        wall_started = time.perf_counter()
+        await asyncio.gather(*(limited(i) for i in range(args.sessions)))
+        wall = time.perf_counter() - wall_started
+        db_after = await fetch_db_stats(client)
+    report.print_summary(wall, db_before, db_after)
+
+
+def _wait_until_ready(url: str, timeout: float = 30.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def _stub_command(args: argparse.Namespace) -> List[str]:
+    return [
+        sys.executable, "-m", "backend.tools.fake_openrouter", "--port", str(args.stub_port),
+        "--latency", args.latency, "--latency-mean", str(args.latency_mean),
+        "--latency-spread", str(args.latency_spread), "--latency-sigma", str(args.latency_sigma),
+        "--error-rate", str(args.error_rate), "--error-status", str(args.error_status),
+        "--format", args.format, "--stream-chunk-chars", str(args.stream_chunk_chars),
+        "--stream-chunk-delay", str(args.stream_chunk_delay), "--seed", str(args.seed),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive concurrent game sessions against a fake OpenRouter.")
+    parser.add_argument("--sessions", type=int, default=20, help="Simulated player sessions")
+    parser.add_argument("--turns", type=int, default=5, help="make_choice calls per session")
+    parser.add_argument("--concurrency", type=int, default=50, help="Sessions played at the same time")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Max random pause before each turn (s)")
+    parser.add_argument("--stream", action="store_true", help="Use /api/v1/make_choice/stream instead of /make_choice")
+    parser.add_argument("--world", default="dark_fantasy")
+    parser.add_argument("--faction", default="ashen_legion")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request client timeout (s)")
+    parser.add_argument("--app-url", default=None, help="Test an already running app instead of starting one")
+    parser.add_argument("--app-port", type=int, default=8098)
+    parser.add_argument("--stub-port", type=int, default=8099)
+    parser.add_argument("--app-log", action="store_true", help="Show the app's own output")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    if args.app_url:
+        asyncio.run(run_load(args, args.app_url))
+        return
+
+    processes: List[subprocess.Popen] = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            processes.append(subprocess.Popen(_stub_command(args), cwd=ROOT_DIR))
+            if not _wait_until_ready(f"http://127.0.0.1:{args.stub_port}/stats"):
+                sys.exit("Fake OpenRouter did not start.")
+
+            app_env = dict(os.environ)
+            app_env.update({
+                "OPENROUTER_BASE_URL": f"http://127.0.0.1:{args.stub_port}/api/v1",
+                "OPENROUTER_API_KEY": "load-test",
+                "DATABASE_URL": f"sqlite+pysqlite:///{os.path.join(tmp_dir, 'load_test.db')}",
+                "AI_CACHE_PATH": os.path.join(tmp_dir, "ai_cache.db"),
+            })
+            # The stub has no provider rate limits; keep the per-model token bucket out of the measurement unless set
+            app_env.setdefault("AI_RATE_LIMIT_PER_MINUTE", "0")
+            app_output = None if args.app_log else subprocess.DEVNULL
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1",
+                 "--port", str(args.app_port), "--log-level", "warning"],
+                cwd=ROOT_DIR, env=app_env, stdout=app_output, stderr=app_output,
+            ))
+            app_url = f"http://127.0.0.1:{args.app_port}"
+            if not _wait_until_ready(app_url + "/ready"):
+                sys.exit("Game app did not start (run with --app-log to see why).")
+
+            print(f"{args.sessions} sessions x {args.turns} turns, concurrency {args.concurrency}, "
+                  f"stub latency {args.latency} mean {args.latency_mean}s, error rate {args.error_rate}")
+            asyncio.run(run_load(args, app_url))
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+Headless playthrough simulator for balancing and capacity planning.
+
+Plays many games without the HTTP layer: each worker process gets its own SQLite file and calls
+game_service.initialize_game / process_player_action directly, with a pluggable narrator in place
+of the model and a choice policy in place of the player. Classes from CLASS_BASE_STATS are played
+round-robin. Reports, aggregated over all workers:
+  - skill checks per class: outcome counts and the realised success rate next to the mean
+    predicted success_chance (services/skill_odds.py)
+  - turns per session (a narrator may end a story by returning no choices)
+  - bytes per session in the database (turn_events payloads + the player_states row) and file size
+  - per-phase timings (rpg_phase_seconds: session load, context, ai, persist, ...)
+
+Narrators:
+  scripted         in-process random narration; skill-check DCs drawn from --dc-min..--dc-max
+  openrouter       the real ai_service (point OPENROUTER_BASE_URL at backend/tools/fake_openrouter.py)
+  module:function  any coroutine with get_ai_response's signature
+Policies: random, safest (highest success chance), riskiest, checks (prefer skill checks), or module:function
+taking (choices, rng) and returning one choice.
+
+Usage (from the project root):
+    python -m backend.tools.simulate --sessions 2000 --turns 30 --workers 8
+    python -m backend.tools.simulate --policy safest --dc-min 12 --dc-max 20 --json sim_report.json
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+SUCCESS_OUTCOMES = ("KRİTİK BAŞARI", "BAŞARILI")
+STAT_NAMES = ("strength", "dexterity", "constitution", "intelligence", "wisdom", "charisma")
+POLICIES = ("random", "safest", "riskiest", "checks")
+
+
+# --- Narrators ---
+
+def scripted_narrator(args: argparse.Namespace, rng: random.Random) -> Callable:
+    """Random narration with 2-4 choices, about --check-rate of them skill checks."""
+    async def narrate(prompt_text: str, player_context: dict = None) -> dict:
+        if args.narrator_latency:
+            await asyncio.sleep(rng.uniform(0, 2 * args.narrator_latency))
+        outcome = (player_context or {}).get("skill_check_outcome")
+        text = f"Simülasyon anlatımı ({outcome or 'eylem'}). " + "Yol ileriye doğru kıvrılıyor. " * rng.randint(3, 12)
+        if rng.random() < args.end_rate:
+            return {"text": text + "Hikaye burada sona eriyor.", "choices": [], "raw_ai_response": text}
+        choices = []
+        for i in range(rng.randint(2, 4)):
+            choice = {"id": chr(65 + i), "text": f"Seçenek {chr(65 + i)} ({rng.randint(1, 999)})"}
+            if rng.random() < args.check_rate:
+                choice["skill_check_stat"] = rng.choice(STAT_NAMES)
+                choice["skill_check_dc"] = rng.randint(args.dc_min, args.dc_max)
+            choices.append(choice)
+        return {"text": text, "choices": choices, "raw_ai_response": text}
+    return narrate
+
+
+def _load_callable(spec: str) -> Callable:
+    module_name, _, attribute = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+# --- Choice policies ---
+
+def choose(policy: str, choices: List[dict], rng: random.Random) -> dict:
+    if policy == "safest":
+        return max(choices, key=lambda choice: (choice.get("success_chance") or 1.0, rng.random()))
+    if policy == "riskiest":
+        return min(choices, key=lambda choice: (choice.get("success_chance") or 1.0, rng.random()))
+    if policy == "checks":
+        checks = [choice for choice in choices if choice.get("skill_check_stat")]
+        return rng.choice(checks or choices)
+    return rng.choice(choices)
+
+
+# --- Worker process ---
+
+def run_worker(worker_index: int, args: argparse.Namespace, db_dir: str) -> Dict[str, Any]:
+    """Plays this worker's share of the sessions against its own database; returns raw aggregates."""
+    # Configuration is read at import time, so the environment is set before backend modules load
+    os.environ["DATABASE_URL"] = f"sqlite+pysqlite:///{os.path.join(db_dir, f'sim_{worker_index}.db')}"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("SPECULATION_ENABLED", "false")
+    os.environ.setdefault("AI_CACHE_ENABLED", "false")
+    if args.narrator != "openrouter":
+        os.environ.setdefault("CONTEXT_SUMMARY_MODE", "extractive")
+        os.environ.setdefault("AI_RATE_LIMIT_PER_MINUTE", "0")
+    return asyncio.run(_run_worker(worker_index, args))
+
+
+async def _run_worker(worker_index: int, args: argparse.Namespace) -> Dict[str, Any]:
+    from sqlalchemy import text
+    from ..core import logging_setup, metrics
+    from ..data.characters import CLASS_BASE_STATS
+    from ..db import database, models, crud
+    from ..models.game_models import StartGamePayload
+    from ..services import game_service, ai_service
+    from ..services.session_cache import session_cache
+
+    logging_setup.configure_logging()
+    models.Base.metadata.create_all(bind=database.engine)
+    rng = random.Random(args.seed * 1000 + worker_index)
+    if args.narrator == "scripted":
+        game_service.get_ai_response = scripted_narrator(args, rng)
+    elif args.narrator != "openrouter":
+        game_service.get_ai_response = _load_callable(args.narrator)
+    policy = (lambda choices, rng: choose(args.policy, choices, rng)) if args.policy in POLICIES else _load_callable(args.policy)
+
+    classes = [(world_id, class_id) for world_id, world_classes in CLASS_BASE_STATS.items() for class_id in world_classes]
+    session_indexes = range(worker_index, args.sessions, args.workers)
+    checks: Dict[str, Counter] = defaultdict(Counter)
+    predicted: Dict[str, float] = defaultdict(float)
+    turns_per_session: List[int] = []
+    class_of_session: Dict[str, str] = {}
+
+    async def play(session_index: int) -> None:
+        world_id, class_id = classes[session_index % len(classes)]
+        class_key = f"{world_id}/{class_id}"
+        db = database.SessionLocal()
+        try:
+            state = await game_service.initialize_game(db, StartGamePayload(
+                world_id=world_id, selected_class_or_faction=class_id, player_name="Simülasyon"))
+            if "error" in state:
+                checks[class_key]["start_errors"] += 1
+                return
+            session_id = state["session_id"]
+            class_of_session[session_id] = class_key
+            choices = state["choices"]
+            turns = 0
+            while turns < args.turns and choices:
+                choice = policy(choices, rng)
+                response = await game_service.process_player_action(db, session_id, choice["id"], choice["text"])
+                if isinstance(response, dict):
+                    checks[class_key]["turn_errors"] += 1
+                    break
+                turns += 1
+                if response.skill_check_result is not None:
+                    checks[class_key][response.skill_check_result.outcome] += 1
+                    predicted[class_key] += choice.get("success_chance") or 0.0
+                choices = [choice.model_dump() for choice in response.choices if choice.id != "IGNORE"]
+            turns_per_session.append(turns)
+        finally:
+            db.close()
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(session_index: int) -> None:
+        async with semaphore:
+            await play(session_index)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited(i) for i in session_indexes))
+    wall = time.perf_counter() - started
+    await session_cache.flush()
+    if args.narrator == "openrouter":
+        await ai_service.close_http_client()
+
+    def measure_storage() -> Dict[str, int]:
+        db = database.SessionLocal()
+        try:
+            rows = db.execute(text(
+                "SELECT p.session_id, length(CAST(p.stats AS TEXT)) + length(CAST(p.inventory AS TEXT)) "
+                "+ length(CAST(p.skills AS TEXT)) + length(CAST(p.history AS TEXT)) "
+                "+ coalesce((SELECT sum(length(CAST(e.payload AS BLOB))) FROM turn_events e "
+                "WHERE e.session_id = p.session_id), 0) FROM player_states p"
+            )).all()
+            return {session_id: size or 0 for session_id, size in rows}
+        finally:
+            db.close()
+
+    bytes_by_session = await database.run_db(measure_storage)
+    database.shutdown_db_executor()
+    database.engine.dispose()
+    db_path = database.engine.url.database
+
+    bytes_per_class: Dict[str, List[int]] = defaultdict(list)
+    for session_id, size in bytes_by_session.items():
+        bytes_per_class[class_of_session.get(session_id, "?")].append(size)
+    return {
+        "checks": {class_key: dict(counter) for class_key, counter in checks.items()},
+        "predicted": dict(predicted),
+        "turns_per_session": turns_per_session,
+        "bytes_per_class": dict(bytes_per_class),
+        "db_file_bytes": os.path.getsize(db_path) if db_path and os.path.exists(db_path) else 0,
+        "phases": {labels[0]: totals for labels, totals in metrics.PHASE_SECONDS.totals().items()},
+        "wall": wall,
+    }
+
+
+# --- Aggregation ---
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct), len(ordered) - 1)] if ordered else 0.0
+
+
+def aggregate(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    checks: Dict[str, Counter] = defaultdict(Counter)
+    predicted: Dict[str, float] = defaultdict(float)
+    bytes_per_class: Dict[str, List[int]] = defaultdict(list)
+    phases: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
+    turns: List[int] = []
+    for result in results:
+        for class_key, counts in result["checks"].items():
+            checks[class_key].update(counts)
+        for class_key, value in result["predicted"].items():
+            predicted[class_key] += value
+        for class_key, sizes in result["bytes_per_class"].items():
+            bytes_per_class[class_key].extend(sizes)
+        for phase, (total, count) in result["phases"].items():
+            phases[phase][0] += total
+            phases[phase][1] += count
+        turns.extend(result["turns_per_session"])
+
+    classes = {}
+    for class_key in sorted(set(checks) | set(bytes_per_class)):
+        counts = checks[class_key]
+        attempts = sum(counts[outcome] for outcome in ("KRİTİK BAŞARI", "BAŞARILI", "BAŞARISIZ", "KRİTİK BAŞARISIZ"))
+        sizes = bytes_per_class[class_key]
+        classes[class_key] = {
+            "sessions": len(sizes),
+            "skill_checks": attempts,
+            "outcomes": {outcome: counts[outcome] for outcome in ("KRİTİK BAŞARI", "BAŞARILI", "BAŞARISIZ", "KRİTİK BAŞARISIZ")},
+            "success_rate": round(sum(counts[o] for o in SUCCESS_OUTCOMES) / attempts, 4) if attempts else None,
+            "predicted_success_rate": round(predicted[class_key] / attempts, 4) if attempts else None,
+            "bytes_per_session_avg": round(sum(sizes) / len(sizes)) if sizes else 0,
+            "errors": counts["start_errors"] + counts["turn_errors"],
+        }
+    all_sizes = [size for sizes in bytes_per_class.values() for size in sizes]
+    total_turns = sum(turns)
+    return {
+        "sessions": len(turns),
+        "turns": total_turns,
+        "turns_per_session": {"avg": round(total_turns / len(turns), 2) if turns else 0,
+                              "p50": _percentile(turns, 0.5), "max": max(turns, default=0)},
+        "bytes_per_session": {"avg": round(sum(all_sizes) / len(all_sizes)) if all_sizes else 0,
+                              "p95": _percentile(all_sizes, 0.95), "max": max(all_sizes, default=0)},
+        "bytes_per_turn": round(sum(all_sizes) / total_turns) if total_turns else 0,
+        "db_file_bytes": sum(result["db_file_bytes"] for result in results),
+        "wall_seconds_max": round(max((result["wall"] for result in results), default=0.0), 2),
+        "classes": classes,
+        "phases_ms": {phase: {"avg": round(total / count * 1000, 3), "count": count}
+                      for phase, (total, count) in sorted(phases.items()) if count},
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\nsessions: {report['sessions']}, turns: {report['turns']} in {report['wall_seconds_max']}s "
+          f"({report['turns'] / report['wall_seconds_max'] if report['wall_seconds_max'] else 0:.0f} turns/s)")
+    tps = report["turns_per_session"]
+    print(f"turns per session: avg {tps['avg']} p50 {tps['p50']} max {tps['max']}")
+    bps = report["bytes_per_session"]
+    print(f"bytes per session: avg {bps['avg']} p95 {bps['p95']} max {bps['max']} "
+          f"({report['bytes_per_turn']} per turn), database files {report['db_file_bytes'] / 1e6:.1f} MB")
+    print(f"\n{'class':<34} {'sess':>5} {'checks':>7} {'success':>8} {'predicted':>9} {'crit+':>6} {'crit-':>6} {'bytes':>7}")
+    for class_key, row in report["classes"].items():
+        success = f"{row['success_rate']:.1%}" if row["success_rate"] is not None else "-"
+        expected = f"{row['predicted_success_rate']:.1%}" if row["predicted_success_rate"] is not None else "-"
+        print(f"{class_key:<34} {row['sessions']:>5} {row['skill_checks']:>7} {success:>8} {expected:>9} "
+              f"{row['outcomes']['KRİTİK BAŞARI']:>6} {row['outcomes']['KRİTİK BAŞARISIZ']:>6} {row['bytes_per_session_avg']:>7}"
+              + (f"  errors {row['errors']}" if row["errors"] else ""))
+    print(f"\n{'phase':<16} {'avg ms':>9} {'count':>8}")
+    for phase, row in report["phases_ms"].items():
+        print(f"{phase:<16} {row['avg']:>9.3f} {row['count']:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Plays many games headless across processes and reports balance/capacity stats.")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=20, help="Max make_choice turns per session")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes, each with its own database")
+    parser.add_argument("--concurrency", type=int, default=8, help="Sessions played at the same time per worker")
+    parser.add_argument("--narrator", default="scripted", help="scripted | openrouter | module:function")
+    parser.add_argument("--policy", default="random", help=f"{' | '.join(POLICIES)} | module:function")
+    parser.add_argument("--check-rate", type=float, default=0.4, help="Scripted narrator: share of choices that are skill checks")
+    parser.add_argument("--dc-min", type=int, default=8)
+    parser.add_argument("--dc-max", type=int, default=18)
+    parser.add_argument("--end-rate", type=float, default=0.0, help="Scripted narrator: chance a turn ends the story")
+    parser.add_argument("--narrator-latency", type=float, default=0.0, help="Scripted narrator: mean simulated latency (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db-dir", default=None, help="Keep the worker databases here (default: a temporary directory)")
+    parser.add_argument("--json", default=None, help="Also write the report to this file")
+    args = parser.parse_args()
+    args.workers = max(min(args.workers, args.sessions), 1)
+
+    db_dir = args.db_dir or tempfile.mkdtemp(prefix="rpg_sim_")
+    os.makedirs(db_dir, exist_ok=True)
+    try:
+        # spawn + one task per process: every worker imports the backend with its own DATABASE_URL
+        with multiprocessing.get_context("spawn").Pool(args.workers, maxtasksperchild=1) as pool:
+            results = pool.starmap(run_worker, [(index, args, db_dir) for index in range(args.workers)])
+    finally:
+        if args.db_dir is None:
+            shutil.rmtree(db_dir, ignore_errors=True)
+
+    report = aggregate(results)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nreport written to {args.json}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -33,11 +33,15 @@ document.addEventListener('DOMContentLoaded', () => {
     const dieNumberDisplay = document.getElementById('die-number-display'); 
     const diceResultText = document.getElementById('dice-result-text');
 
-    const API_BASE_URL = 'http://127.0.0.1:8000'; 
+    // Same origin when the page is served by the backend; the file:// page talks to the local server
+    const API_BASE_URL = window.location.protocol.startsWith('http') ? '' : 'http://127.0.0.1:8000'; 
     const API_PREFIX = '/api/v1'; 
     let currentSessionId = null; 
     let currentOnConfirm = null; 
     let diceCycleInterval = null; 
+    let currentChoices = []; // Choices on screen; shown again if a turn fails so the player can retry it
+    // Choice whose request has not succeeded yet; clicking it again reuses its idempotency key
+    let pendingTurn = null;
 
     async function fetchStory(endpoint, payload = null) {
         const fullEndpoint = `${API_PREFIX}${endpoint}`;
@@ -73,6 +77,66 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // Streams /make_choice/stream (Server-Sent Events). onToken receives story text as it
+    // arrives; resolves with the final 'result' payload (same shape as /make_choice) or null.
+    async function streamStory(endpoint, payload, onToken) {
+        const fullEndpoint = `${API_PREFIX}${endpoint}`;
+        console.log(`Streaming: ${API_BASE_URL}${fullEndpoint}`);
+
+        try {
+            const response = await fetch(`${API_BASE_URL}${fullEndpoint}`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+                body: JSON.stringify(payload),
+            });
+            if (!response.ok || !response.body) {
+                let errorDetail = `HTTP error! status: ${response.status}`;
+                try {
+                    const errorJson = await response.json();
+                    errorDetail = errorJson.detail || errorDetail;
+                } catch (parseError) { /* Ignore */ }
+                throw new Error(errorDetail);
+            }
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let result = null;
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                let frameEnd;
+                while ((frameEnd = buffer.indexOf('\n\n')) !== -1) {
+                    const frame = buffer.slice(0, frameEnd);
+                    buffer = buffer.slice(frameEnd + 2);
+                    let eventName = 'message';
+                    let data = '';
+                    frame.split('\n').forEach(line => {
+                        if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                        else if (line.startsWith('data:')) data += line.slice(5).trim();
+                    });
+                    if (!data) continue;
+                    const parsed = JSON.parse(data);
+                    if (eventName === 'token') {
+                        onToken(parsed.text);
+                    } else if (eventName === 'result') {
+                        result = parsed;
+                    } else if (eventName === 'error') {
+                        throw new Error(parsed.error);
+                    }
+                }
+            }
+            return result;
+        } catch (error) {
+            console.error("API isteği başarısız:", error);
+            addMessageToChatLog(`Hata: ${error.message}`, "ai-error");
+            if (choicesContainer) {
+                choicesContainer.innerHTML = '';
+            }
+            return null;
+        }
+    }
+
     function addMessageToChatLog(text, senderType) { 
         if (!chatLog) return; 
         const messageDiv = document.createElement('div');
@@ -82,6 +146,7 @@ document.addEventListener('DOMContentLoaded', () => {
         if (chatLogContainer) {
             chatLogContainer.scrollTop = chatLogContainer.scrollHeight; 
         }
+        return messageDiv;
     }
 
     function addTypingIndicator() {
@@ -134,29 +199,45 @@ document.addEventListener('DOMContentLoaded', () => {
         characterInfoCard.style.display = 'block'; 
     }
 
-    function displayStory(responseData) {
+    function displayStory(responseData, streamedMessageDiv = null) {
         if (!responseData) return;
         if (responseData.player_info_for_card) {
             updateCharacterCard(responseData.player_info_for_card); 
         }
-        addMessageToChatLog(responseData.text, 'ai'); 
+        if (streamedMessageDiv) {
+            streamedMessageDiv.textContent = responseData.text; // Replace raw streamed text with the parsed story
+        } else {
+            addMessageToChatLog(responseData.text, 'ai'); 
+        }
+        renderChoices(responseData.choices || [], responseData.end_message);
+    }
+
+    function renderChoices(choices, endMessageText = null) {
+        currentChoices = choices;
         choicesContainer.innerHTML = ''; 
-        if (responseData.choices && responseData.choices.length > 0) {
-            responseData.choices.forEach(choice => {
+        if (choices.length > 0) {
+            choices.forEach(choice => {
                 const button = document.createElement('button');
                 let buttonText = choice.text;
                 if (choice.skill_check_stat && choice.skill_check_dc !== undefined) {
                     const displayStat = choice.skill_check_stat.charAt(0).toUpperCase() + choice.skill_check_stat.slice(1);
-                    buttonText += ` (${displayStat} DC${choice.skill_check_dc})`;
+                    const mode = { advantage: ', avantajlı', disadvantage: ', dezavantajlı' }[choice.skill_check_mode] || '';
+                    const chance = typeof choice.success_chance === 'number'
+                        ? `, %${Math.round(choice.success_chance * 100)} şans` : '';
+                    buttonText += ` (${displayStat} DC${choice.skill_check_dc}${mode}${chance})`;
                 }
                 button.textContent = buttonText;
+                if (typeof choice.critical_success_chance === 'number') {
+                    button.title = `Kritik başarı: %${Math.round(choice.critical_success_chance * 100)}, `
+                        + `kritik başarısızlık: %${Math.round(choice.critical_failure_chance * 100)}`;
+                }
                 button.dataset.choiceId = choice.id;
                 button.addEventListener('click', () => handleChoice(choice)); 
                 choicesContainer.appendChild(button);
             });
         } else {
             const endMessage = document.createElement('p');
-            endMessage.textContent = responseData.end_message || "Devam edecek...";
+            endMessage.textContent = endMessageText || "Devam edecek...";
             choicesContainer.appendChild(endMessage);
         }
     }
@@ -190,6 +271,30 @@ document.addEventListener('DOMContentLoaded', () => {
         diceResultText.innerHTML = outcomeHTML;
     }
 
+    function newIdempotencyKey() {
+        if (window.crypto && typeof window.crypto.randomUUID === 'function') return window.crypto.randomUUID();
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    }
+
+    // The same choice clicked again after a failed request (503, network error) keeps its key,
+    // so the server answers it from the first attempt instead of making a second AI call
+    function idempotencyKeyFor(choice) {
+        if (!pendingTurn || pendingTurn.sessionId !== currentSessionId
+                || pendingTurn.choiceId !== choice.id || pendingTurn.choiceText !== choice.text) {
+            pendingTurn = { sessionId: currentSessionId, choiceId: choice.id, choiceText: choice.text, key: newIdempotencyKey() };
+        }
+        return pendingTurn.key;
+    }
+
+    // After a failed turn the previous choices come back, so clicking the same one retries it
+    function finishTurn(succeeded, choicesBefore) {
+        if (succeeded) {
+            pendingTurn = null;
+        } else {
+            renderChoices(choicesBefore);
+        }
+    }
+
     async function handleChoice(choice) { 
         if (!currentSessionId) {
             addMessageToChatLog("Hata: Geçerli bir oyun oturumu bulunamadı!", "ai-error");
@@ -200,6 +305,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const choiceTextForLog = choice.text; 
 
         addMessageToChatLog(choiceTextForLog, 'player');
+        const choicesBefore = currentChoices;
         choicesContainer.innerHTML = '';
         setInputDisabledState(true); 
 
@@ -233,14 +339,35 @@ document.addEventListener('DOMContentLoaded', () => {
             session_id: currentSessionId,
             choice_id: choice.id, 
             choice_text: choice.text, 
+            idempotency_key: idempotencyKeyFor(choice),
         };
 
         const fetchDelay = isSkillCheck ? 1500 : 0; 
         
+        if (!isSkillCheck) {
+            // Regular choices stream the narration token by token
+            let streamedMessageDiv = null;
+            const responseData = await streamStory('/make_choice/stream', payload, (text) => {
+                if (!streamedMessageDiv) {
+                    removeTypingIndicator();
+                    streamedMessageDiv = addMessageToChatLog('', 'ai');
+                }
+                streamedMessageDiv.textContent += text;
+                if (chatLogContainer) chatLogContainer.scrollTop = chatLogContainer.scrollHeight;
+            });
+            removeTypingIndicator();
+            if (responseData) displayStory(responseData, streamedMessageDiv);
+            finishTurn(Boolean(responseData), choicesBefore);
+            setInputDisabledState(false);
+            if (playerCommandInput) playerCommandInput.focus();
+            return;
+        }
+
         setTimeout(async () => {
             const responseData = await fetchStory('/make_choice', payload); 
             removeTypingIndicator(); 
             clearInterval(diceCycleInterval); 
+            finishTurn(Boolean(responseData), choicesBefore);
 
             if (isSkillCheck && animatedDie) {
                 animatedDie.classList.remove('rolling-anticipation', 'rolling-cycle');
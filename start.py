@@ -1,5 +1,10 @@
 import subprocess
 import webbrowser
+import argparse
+import hashlib
+import signal
+import urllib.request
+import urllib.error
 import os
 import time
 import sys
@@ -7,28 +12,45 @@ import sys
 # Project paths
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
-FRONTEND_HTML_FILE = os.path.join(ROOT_DIR, "frontend", "index.html")
 REQUIREMENTS_FILE = os.path.join(BACKEND_DIR, "requirements.txt")
+# Hash of the requirements.txt that was last installed; pip only runs again when the file changes
+REQUIREMENTS_STAMP_FILE = os.path.join(BACKEND_DIR, ".requirements.sha256")
+# API key and other backend settings; read here once and inherited by the server processes
+DOTENV_FILE = os.path.join(BACKEND_DIR, ".env")
 
 # Server configuration
 HOST = "127.0.0.1"
 PORT = 8000
-FRONTEND_URL = f"http://{HOST}:{PORT}/" # This assumes we might serve frontend via FastAPI later
-# For now, we open the local file.
-LOCAL_FRONTEND_PATH = os.path.join("frontend", "index.html")
 
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "60")) # Seconds to wait for GET /ready
+# Seconds uvicorn lets in-flight requests (e.g. AI calls) finish after SIGTERM before closing them
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
 
-def check_and_install_dependencies():
-    """Checks for requirements.txt and installs dependencies."""
+
+def _requirements_hash() -> str:
+    with open(REQUIREMENTS_FILE, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def check_and_install_dependencies(force: bool = False):
+    """Checks for requirements.txt and installs dependencies (skipped if it has not changed since the last install)."""
     if not os.path.exists(REQUIREMENTS_FILE):
         print(f"Hata: {REQUIREMENTS_FILE} bulunamadı.")
         return False
-    
+
+    requirements_hash = _requirements_hash()
+    if not force and os.path.exists(REQUIREMENTS_STAMP_FILE):
+        with open(REQUIREMENTS_STAMP_FILE, encoding="utf-8") as f:
+            if f.read().strip() == requirements_hash:
+                print("Bağımlılıklar güncel, yükleme atlandı (zorlamak için --reinstall).")
+                return True
+
     print("Bağımlılıklar kontrol ediliyor ve yükleniyor...")
     try:
         # It's good practice to use the same Python interpreter that's running the script.
         subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", REQUIREMENTS_FILE], cwd=ROOT_DIR)
         print("Bağımlılıklar başarıyla yüklendi/kontrol edildi.")
+        with open(REQUIREMENTS_STAMP_FILE, "w", encoding="utf-8") as f:
+            f.write(requirements_hash)
         return True
     except subprocess.CalledProcessError as e:
         print(f"Bağımlılıklar yüklenirken hata oluştu: {e}")
@@ -37,9 +59,58 @@ def check_and_install_dependencies():
         print("Hata: 'pip' komutu bulunamadı. Python ve pip'in PATH'e eklendiğinden emin olun.")
         return False
 
-def start_backend_server():
+def load_env_file(path: str = DOTENV_FILE) -> bool:
+    """
+    Loads backend/.env into os.environ (variables already set win). The servers inherit the
+    environment, so every backend setting can live in .env and the app does not parse it on import.
+    """
+    if not os.path.exists(path):
+        return False
+    try:
+        from dotenv import load_dotenv # Only needed when there is a file to read
+    except ImportError:
+        print(".env okunamadı: python-dotenv yüklü değil.")
+        return False
+    return load_dotenv(dotenv_path=path)
+
+def worker_ports(port: int, workers: int) -> list:
+    """
+    Ports of the server processes in production mode: one single-process uvicorn per port, starting at `port`.
+    Turn serialization, idempotency keys (services/turn_coordinator.py) and the session cache are
+    per process, and uvicorn's own --workers share one socket without routing a session to the same
+    process. Separate ports keep every session on one process as long as the proxy in front of them
+    is sticky (e.g. nginx ip_hash); a browser pointed at one port directly stays there anyway.
+    """
+    return [port + index for index in range(workers)]
+
+def prepare_production_environment() -> dict:
+    """Environment for the uvicorn server in production mode (WAL storage, migrations run once by start.py)."""
+    env = dict(os.environ)
+    env.setdefault("DB_STORAGE_PROFILE", "balanced")
+    # Migrations run once here instead of on every server's startup
+    env["DB_INIT_ON_STARTUP"] = "false"
+    return env
+
+def initialize_database():
+    """Applies the schema migrations (backend/db/migrations.py) once, before the workers start (production mode)."""
+    sys.path.insert(0, ROOT_DIR)
+    from backend.db import database, migrations
+    migrations.migrate(database.engine)
+    database.engine.dispose()
+
+def build_frontend():
+    """Writes frontend/dist (content-hashed script/style, gzip/brotli variants) for the backend to serve."""
+    sys.path.insert(0, ROOT_DIR)
+    from backend.tools.build_frontend import build
+    try:
+        build()
+    except OSError as e:
+        # The backend falls back to serving frontend/ as is
+        print(f"Frontend derlenemedi, dosyalar derlenmeden sunulacak: {e}")
+
+def start_backend_server(host: str = HOST, port: int = PORT, production: bool = False, env: dict = None):
     """Starts the FastAPI backend server as a subprocess."""
-    print(f"FastAPI backend sunucusu başlatılıyor: {HOST}:{PORT}")
+    print(f"FastAPI backend sunucusu başlatılıyor: {host}:{port}")
     # Note: --reload might cause issues if start.py itself is reloaded.
     # For a production-like start script, --reload is often omitted or handled differently.
     # However, for development, it's convenient.
@@ -47,18 +118,21 @@ def start_backend_server():
         sys.executable,
         "-m", "uvicorn",
         "backend.main:app", # Changed to package path relative to ROOT_DIR
-        "--host", HOST,
-        "--port", str(PORT)
+        "--host", host,
+        "--port", str(port),
+        "--timeout-graceful-shutdown", str(GRACEFUL_TIMEOUT),
         # "--reload" # --reload can sometimes make it harder to manage the subprocess
     ]
-    
+    if production:
+        command += ["--no-access-log"]
+
     # Run uvicorn from the project root directory (ROOT_DIR)
     # so it can correctly interpret "backend.main:app"
     try:
-        server_process = subprocess.Popen(command, cwd=ROOT_DIR) # Changed cwd to ROOT_DIR
+        # Own session: a terminal Ctrl+C then reaches uvicorn only once, forwarded as SIGTERM by
+        # stop_backend_server (a second signal would make uvicorn skip the graceful drain)
+        server_process = subprocess.Popen(command, cwd=ROOT_DIR, env=env, start_new_session=True) # Changed cwd to ROOT_DIR
         print(f"Sunucu PID: {server_process.pid} üzerinde başlatıldı.")
-        # Give the server a moment to start
-        time.sleep(5) # Wait 5 seconds for the server to initialize
         return server_process
     except FileNotFoundError:
         print("Hata: 'uvicorn' komutu bulunamadı. 'pip install uvicorn' ile kurduğunuzdan emin olun.")
@@ -67,41 +141,121 @@ def start_backend_server():
         print(f"Sunucu başlatılırken bir hata oluştu: {e}")
         return None
 
-def open_browser():
-    """Opens the frontend HTML file in the default web browser."""
+def wait_until_ready(server_process, host: str, port: int, timeout: float = READY_TIMEOUT) -> bool:
+    """Polls GET /ready until the app has finished starting up (or the server process exits)."""
+    url = f"http://{host}:{port}/ready"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server_process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(url, timeout=1.0) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.1)
+    return False
+
+def wait_for_any_exit(server_processes, poll_interval: float = 0.5):
+    """Blocks until one of the server processes exits (the others are then stopped by the caller)."""
+    while all(server_process.poll() is None for server_process in server_processes):
+        time.sleep(poll_interval)
+
+def stop_backend_server(server_process):
+    """Asks uvicorn to shut down gracefully (SIGTERM: drain in-flight requests, run app shutdown); kills it if that hangs."""
+    if server_process.poll() is not None:
+        return
+    server_process.terminate()
     try:
-        # Construct the file URI
-        # For local files, it's better to use file:// URI
-        file_uri = f"file://{os.path.abspath(FRONTEND_HTML_FILE)}"
-        print(f"Tarayıcıda {file_uri} açılıyor...")
-        webbrowser.open(file_uri)
+        server_process.wait(timeout=GRACEFUL_TIMEOUT + 15)
+    except subprocess.TimeoutExpired:
+        print("Sunucu zamanında kapanmadı, zorla sonlandırılıyor.")
+        server_process.kill()
+        server_process.wait()
+
+def open_browser(host: str = HOST, port: int = PORT):
+    """Opens the game page served by the backend in the default web browser."""
+    try:
+        frontend_url = f"http://{host}:{port}/"
+        print(f"Tarayıcıda {frontend_url} açılıyor...")
+        webbrowser.open(frontend_url)
     except Exception as e:
         print(f"Tarayıcı açılırken bir hata oluştu: {e}")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Metin Tabanlı RPG sunucusunu başlatır.")
+    parser.add_argument("--prod", action="store_true",
+                        help="Üretim modu: bağımlılık yüklemesi yok, erişim logu yok, tarayıcı açılmaz")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")),
+                        help="Sunucu işlemi sayısı (üretim modu); her biri --port'tan başlayan ardışık portlardan birinde çalışır")
+    parser.add_argument("--host", default=os.getenv("HOST", HOST))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", str(PORT))))
+    parser.add_argument("--reinstall", action="store_true", help="Bağımlılıkları değişmemiş olsalar da yeniden yükle")
+    parser.add_argument("--no-browser", action="store_true", help="Tarayıcıyı açma")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers en az 1 olmalı")
+    if args.workers > 1 and not args.prod:
+        parser.error("--workers 1'den büyükse --prod gerekir (geliştirme modu tek işlemle çalışır)")
+    return args
+
 if __name__ == "__main__":
-    print("Metin Tabanlı RPG Başlatılıyor...")
-    
-    if not check_and_install_dependencies():
+    args = parse_args()
+    print("Metin Tabanlı RPG Başlatılıyor..." + (" (üretim modu)" if args.prod else ""))
+
+    if not args.prod and not check_and_install_dependencies(force=args.reinstall):
         print("Bağımlılık sorunu nedeniyle devam edilemiyor.")
         sys.exit(1)
-        
-    server_process = start_backend_server()
-    
-    if server_process:
-        open_browser()
-        print(f"\nOyun arayüzü tarayıcıda açıldı veya açılmaya çalışıldı.")
-        print(f"Backend sunucusu çalışıyor. Kapatmak için bu terminali (PID: {server_process.pid}) kapatın.")
-        try:
-            # Keep the script alive while the server is running,
-            # or exit and let the server run in the background.
-            # For simplicity, we'll let it run and user can Ctrl+C the Popen process.
-            server_process.wait() # Wait for server process to exit
-        except KeyboardInterrupt:
-            print("\nKullanıcı tarafından kesildi. Sunucu kapatılıyor...")
-            server_process.terminate() # Try to terminate gracefully
-            server_process.wait() # Wait for termination
-            print("Sunucu kapatıldı.")
-    else:
-        print("Backend sunucusu başlatılamadığı için tarayıcı açılmadı.")
+    load_env_file()
+
+    server_env = None
+    ports = [args.port]
+    if args.prod:
+        ports = worker_ports(args.port, args.workers)
+        server_env = prepare_production_environment()
+        os.environ.update({key: value for key, value in server_env.items() if key == "DB_STORAGE_PROFILE"})
+        initialize_database()
+    build_frontend()
+
+    server_processes = []
+    for port in ports:
+        server_process = start_backend_server(args.host, port, args.prod, server_env)
+        if not server_process:
+            print("Backend sunucusu başlatılamadığı için tarayıcı açılmadı.")
+            for started_process in server_processes:
+                stop_backend_server(started_process)
+            sys.exit(1)
+        server_processes.append(server_process)
+
+    def stop_all():
+        for server_process in server_processes:
+            stop_backend_server(server_process)
+
+    # SIGTERM (e.g. from a process manager) is handled like Ctrl+C: uvicorn drains in-flight requests first
+    def _handle_sigterm(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, _handle_sigterm)
+
+    try:
+        for server_process, port in zip(server_processes, ports):
+            if not wait_until_ready(server_process, args.host, port):
+                print(f"Sunucu hazır hale gelmedi ({args.host}:{port}).")
+                stop_all()
+                sys.exit(1)
+        print("Sunucu hazır." if len(ports) == 1 else
+              f"{len(ports)} sunucu hazır: {args.host}:{ports[0]}-{ports[-1]} (oturum bazlı yönlendiren bir proxy arkasında kullanın).")
+        if not (args.prod or args.no_browser):
+            open_browser(args.host, args.port)
+            print(f"\nOyun arayüzü tarayıcıda açıldı veya açılmaya çalışıldı.")
+        pids = ", ".join(str(server_process.pid) for server_process in server_processes)
+        print(f"Backend sunucusu çalışıyor. Kapatmak için Ctrl+C (PID: {pids}).")
+        # Keep the script alive while the servers are running; if one exits, the rest are stopped too
+        wait_for_any_exit(server_processes)
+        stop_all()
+    except KeyboardInterrupt:
+        print("\nKapatma isteği alındı. Sunucu devam eden istekleri bitirip kapatılıyor...")
+        stop_all()
+        print("Sunucu kapatıldı.")
 
     print("Başlatma scripti tamamlandı.")